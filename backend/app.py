@@ -1,15 +1,25 @@
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
 from flask_cors import CORS
 from config import Config
 from models import db
+from db_pool import ping_database, pool_stats
+from metrics import init_metrics, registry as metrics_registry
+from cache import aggregate_cache
+from ratelimit import rate_limiter
+from changefeed import change_feed
+from notifications import NotificationWorker
+from serializers import FastJSONProvider
 from routes.auth import auth_bp
 from routes.donors import donors_bp
 from routes.blood_requests import blood_request_bp
 from routes.admin import admin_bp
+from routes.changes import changes_bp
+from commands import manage
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    app.json = FastJSONProvider(app)
 
     CORS(app, resources={
         r"/api/*": {
@@ -21,10 +31,22 @@ def create_app():
 
     db.init_app(app)
 
+    if Config.METRICS_ENABLED:
+        init_metrics(app)
+
+    change_feed.init_app(app)
+
+    if Config.NOTIFY_WORKER_IN_PROCESS:
+        # Single-process deployments; otherwise run notify_worker.py.
+        NotificationWorker().start(app)
+
     app.register_blueprint(auth_bp)
     app.register_blueprint(donors_bp)
     app.register_blueprint(blood_request_bp)
     app.register_blueprint(admin_bp)
+    app.register_blueprint(changes_bp)
+
+    app.cli.add_command(manage)
 
     @app.route('/')
     def index():
@@ -36,10 +58,42 @@ def create_app():
 
     @app.route('/api/health')
     def health():
+        database, timings = ping_database(db.engine, app.config['DB_HEALTH_TIMEOUT'])
+        healthy = database == 'connected'
+
         return jsonify({
-            'status': 'healthy',
-            'database': 'connected'
-        })
+            'status': 'healthy' if healthy else 'unhealthy',
+            'database': database,
+            'database_timing': timings,
+            'pool': pool_stats(db.engine)
+        }), 200 if healthy else 503
+
+    @app.route('/api/metrics')
+    def metrics():
+        # Only exposed once a token is configured.
+        if not Config.METRICS_ENABLED or not Config.METRICS_TOKEN:
+            return jsonify({'error': 'Endpoint not found'}), 404
+        if request.headers.get('Authorization') != f'Bearer {Config.METRICS_TOKEN}':
+            return jsonify({'error': 'Not authorized'}), 401
+
+        pool = pool_stats(db.engine)
+        cache = aggregate_cache.stats()
+        extra = {
+            f'bloodlink_db_pool_{name}': ('gauge', f'Connection pool {name}.', pool[name])
+            for name in ('size', 'checkedin', 'checkedout', 'overflow', 'wait_avg_ms', 'wait_max_ms')
+            if name in pool
+        }
+        for name in ('checkouts', 'failed_checkouts'):
+            if name in pool:
+                extra[f'bloodlink_db_pool_{name}_total'] = ('counter', f'Connection pool {name}.', pool[name])
+        extra['bloodlink_cache_hits_total'] = ('counter', 'Aggregate cache hits.', cache['hits'])
+        extra['bloodlink_cache_misses_total'] = ('counter', 'Aggregate cache misses.', cache['misses'])
+        extra['bloodlink_rate_limited_total'] = ('counter', 'Requests refused by rate limits.', rate_limiter.limited)
+
+        return app.response_class(
+            metrics_registry.render(extra),
+            mimetype='text/plain; version=0.0.4'
+        )
 
     @app.errorhandler(404)
     def not_found(error):
@@ -0,0 +1,371 @@
+"""ASGI entry point for production serving.
+
+The read-heavy endpoints below are answered on an async SQLAlchemy engine so
+one worker can keep many database round trips in flight. Every other route
+(writes, auth, exports, reports, ...) falls through to the regular Flask app,
+which runs in a worker thread pool, so behaviour is unchanged.
+
+The change feed stream is also served here, so an open dashboard holds a
+coroutine instead of one of the Flask thread pool's workers.
+
+    python asgi.py
+    uvicorn asgi:app --workers 4 --limit-concurrency 500
+"""
+import asyncio
+from datetime import datetime
+from urllib.parse import parse_qsl
+
+from a2wsgi import WSGIMiddleware
+from sqlalchemy.ext.asyncio import create_async_engine
+from werkzeug.http import parse_etags, parse_date, http_date, quote_etag
+
+from app import create_app
+from cache import aggregate_cache
+from changefeed import (change_feed, ChangeStream, backlog_statement, oldest_statement, resume,
+                        parse_topics, parse_last_event_id, ChangeFeedError, TICKET_AUDIENCE)
+from conditional import ResultValidator, page_version
+from config import Config
+from listing import (DONOR_LIST, REQUEST_LIST, DONOR_STATS, DASHBOARD_STATS, STOCK_VERSION_STATEMENT,
+                     STOCK_ROWS_STATEMENT, stock_body)
+from metrics import start_request, finish_request
+from pagination import CursorError
+from serializers import dumps
+from token_auth import verify_token, verify_ticket, TokenError
+
+
+class Request:
+    def __init__(self, scope):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.query_string = scope.get('query_string', b'')
+        self.args = dict(parse_qsl(self.query_string.decode('utf-8', 'replace')))
+        self.headers = {
+            name.decode('latin-1').lower(): value.decode('latin-1')
+            for name, value in scope.get('headers', [])
+        }
+
+
+class JSONResponse:
+    def __init__(self, body, status=200, headers=None):
+        # Trailing newline matches Flask's jsonify output byte for byte.
+        self.body = body if isinstance(body, bytes) else (dumps(body) + '\n').encode('utf-8')
+        self.status = status
+        self.headers = dict(headers or {})
+        if status != 304:
+            self.headers['Content-Type'] = 'application/json'
+
+
+class StreamResponse:
+    """A response whose body is an async iterator of text chunks."""
+
+    def __init__(self, chunks, mimetype, headers=None):
+        self.chunks = chunks
+        self.status = 200
+        self.headers = {'Content-Type': f'{mimetype}; charset=utf-8', **(headers or {})}
+
+
+def error_response(message, status):
+    return JSONResponse({'error': message}, status)
+
+
+def authorize(request, user_types, ticket_audience=None):
+    """Mirror ``token_auth.authenticate`` for the async handlers."""
+    token = request.headers.get('authorization')
+    if token and token.startswith('Bearer '):
+        token = token[7:]
+    ticket = request.args.get('ticket') if ticket_audience and not token else None
+    if not token and not ticket:
+        return error_response('No token provided', 401)
+
+    try:
+        claims = verify_ticket(ticket, ticket_audience) if ticket else verify_token(token)
+    except TokenError as e:
+        return error_response(str(e), 401)
+
+    if claims.get('type') not in user_types:
+        return error_response('Not authorized', 403)
+    return None
+
+
+class Validator(ResultValidator):
+    """``conditional.ResultValidator`` reading this module's ``Request``; same ETags."""
+
+    def __init__(self, request, scope, last_modified, version, count=None):
+        super().__init__(scope, last_modified, version, request.query_string, count)
+        self.request = request
+
+    def not_modified(self):
+        if_none_match = self.request.headers.get('if-none-match')
+        if if_none_match:
+            return parse_etags(if_none_match).contains(self.etag)
+        since = parse_date(self.request.headers.get('if-modified-since'))
+        if since and self.last_modified:
+            return self.last_modified.replace(microsecond=0) <= since.replace(tzinfo=None)
+        return False
+
+    def headers(self):
+        headers = {'ETag': quote_etag(self.etag), 'Cache-Control': 'no-cache'}
+        if self.last_modified:
+            headers['Last-Modified'] = http_date(self.last_modified)
+        return headers
+
+    def not_modified_response(self):
+        return JSONResponse(b'', 304, self.headers())
+
+    def response(self, body):
+        return JSONResponse(body, 200, self.headers())
+
+
+async def read_total(conn, endpoint, conditions):
+    """Async ``listing.read_total``."""
+    for statement in endpoint.total_statements(conditions, conn.dialect.name):
+        value = (await conn.execute(statement)).scalar()
+        if value is not None:
+            return int(value)
+
+
+async def list_page(engine, request, endpoint):
+    """Async ``listing.list_response``."""
+    conditions, limit, cursor, total_wanted = endpoint.arguments(request.args)
+
+    async with engine.connect() as conn:
+        versions = (await conn.execute(endpoint.version_statement(conditions, limit, cursor))).all()
+        total = await read_total(conn, endpoint, conditions) if total_wanted else None
+        validator = Validator(request, endpoint.scope, *page_version(versions, total))
+        if validator.not_modified():
+            return validator.not_modified_response()
+
+        rows = (await conn.execute(endpoint.rows_statement(conditions, limit, cursor))).all()
+
+    return validator.response(endpoint.body(rows, limit, total))
+
+
+def lookup_cached(endpoint, query_string):
+    key = aggregate_cache.key(endpoint.name, endpoint.tags, query_string)
+    return key, aggregate_cache.lookup(key)
+
+
+async def cached_stats(engine, request, endpoint):
+    """Async ``listing.stats_response``, sharing ``aggregate_cache`` entries with Flask."""
+    key = None
+    if Config.CACHE_ENABLED:
+        # The Redis backend blocks; keep it off the event loop.
+        key, body = await asyncio.to_thread(lookup_cached, endpoint, request.query_string)
+        if body is not None:
+            return JSONResponse(body, 200, {'X-Cache': 'HIT'})
+
+    now = datetime.utcnow()
+    async with engine.connect() as conn:
+        rows = (await conn.execute(endpoint.statement(now))).all()
+
+    body = (dumps(endpoint.body(rows, now)) + '\n').encode('utf-8')
+    if key is None:
+        return JSONResponse(body)
+    await asyncio.to_thread(aggregate_cache.store, key, body)
+    return JSONResponse(body, 200, {'X-Cache': 'MISS'})
+
+
+async def donors_list(engine, request):
+    return await list_page(engine, request, DONOR_LIST)
+
+
+async def requests_list(engine, request):
+    return await list_page(engine, request, REQUEST_LIST)
+
+
+async def donor_stats_view(engine, request):
+    return await cached_stats(engine, request, DONOR_STATS)
+
+
+async def dashboard_stats_view(engine, request):
+    return await cached_stats(engine, request, DASHBOARD_STATS)
+
+
+async def blood_stock_view(engine, request):
+    error = authorize(request, ['admin'])
+    if error:
+        return error
+
+    async with engine.connect() as conn:
+        last_modified, count = (await conn.execute(STOCK_VERSION_STATEMENT)).one()
+        if not count:
+            # First read seeds the stock rows; leave that write to Flask.
+            return None
+        validator = Validator(request, 'blood-stock', last_modified, count, count)
+        if validator.not_modified():
+            return validator.not_modified_response()
+        rows = (await conn.execute(STOCK_ROWS_STATEMENT)).all()
+
+    return validator.response(stock_body(rows))
+
+
+async def change_stream_view(engine, request):
+    error = authorize(request, ['admin'], ticket_audience=TICKET_AUDIENCE)
+    if error:
+        return error
+    if not Config.CHANGE_FEED_ENABLED:
+        return error_response('Change feed is disabled', 404)
+
+    try:
+        topics = parse_topics(request.args.get('topics'))
+        last_event_id = parse_last_event_id(
+            request.headers.get('last-event-id', request.args.get('last_event_id'))
+        )
+    except ChangeFeedError as e:
+        return error_response(str(e), 400)
+
+    await asyncio.to_thread(change_feed.start)
+    position = change_feed.position()
+
+    backlog, reset = [], False
+    if last_event_id is not None:
+        async with engine.connect() as conn:
+            oldest = (await conn.execute(oldest_statement())).scalar()
+            rows = (await conn.execute(backlog_statement(last_event_id, topics))).all()
+        backlog, reset = resume(last_event_id, oldest, rows)
+
+    stream = ChangeStream(position, backlog, reset, topics)
+
+    async def chunks():
+        for frame in stream.opening():
+            yield frame
+        while not stream.expired():
+            result = await change_feed.wait_async(stream.position, Config.CHANGE_FEED_HEARTBEAT_SECONDS)
+            for frame in stream.frames(*result):
+                yield frame
+
+    return StreamResponse(chunks(), 'text/event-stream', {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+# Handlers may return None to hand the request to Flask.
+ASYNC_ROUTES = {
+    '/api/donors/': donors_list,
+    '/api/donors/stats': donor_stats_view,
+    '/api/blood-requests/': requests_list,
+    '/api/admin/dashboard/stats': dashboard_stats_view,
+    '/api/admin/blood-stock': blood_stock_view,
+    '/api/changes/stream': change_stream_view,
+}
+
+
+def cors_headers(request):
+    origin = request.headers.get('origin')
+    if origin in Config.CORS_ORIGINS:
+        return {'Access-Control-Allow-Origin': origin, 'Vary': 'Origin'}
+    return {}
+
+
+class AsgiApp:
+    def __init__(self, flask_app, database_url=None, engine_options=None):
+        self.flask_app = flask_app
+        self.wsgi = WSGIMiddleware(flask_app, workers=Config.ASGI_WSGI_THREADS)
+        self.database_url = database_url or Config.ASYNC_DATABASE_URL
+        self.engine_options = Config.ASYNC_ENGINE_OPTIONS if engine_options is None else engine_options
+        self._engine = None
+
+    @property
+    def engine(self):
+        # Created lazily so each server worker process gets its own pool.
+        if self._engine is None:
+            self._engine = create_async_engine(self.database_url, **self.engine_options)
+        return self._engine
+
+    async def dispose(self):
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = None
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+
+        handler = None
+        if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD'):
+            handler = ASYNC_ROUTES.get(scope['path'])
+
+        if handler is not None:
+            request = Request(scope)
+            stats, token = start_request(request.path, request.method) if Config.METRICS_ENABLED else (None, None)
+            try:
+                response = await handler(self.engine, request)
+            except CursorError as e:
+                response = error_response(str(e), 400)
+            except Exception as e:
+                response = error_response(str(e), 500)
+
+            if response is not None:
+                if stats is not None:
+                    duration = finish_request(stats, token, response.status)
+                    if Config.SERVER_TIMING_ENABLED:
+                        response.headers['Server-Timing'] = stats.server_timing(duration)
+                if isinstance(response, StreamResponse):
+                    return await self.stream(request, response, receive, send)
+                return await self.send(request, response, send)
+
+        return await self.wsgi(scope, receive, send)
+
+    async def send(self, request, response, send):
+        headers = {**response.headers, **cors_headers(request)}
+        if response.status != 304:
+            headers['Content-Length'] = str(len(response.body))
+        await send({
+            'type': 'http.response.start',
+            'status': response.status,
+            'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers.items()],
+        })
+        body = b'' if request.method == 'HEAD' or response.status == 304 else response.body
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def stream(self, request, response, receive, send):
+        headers = {**response.headers, **cors_headers(request)}
+        await send({
+            'type': 'http.response.start',
+            'status': response.status,
+            'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers.items()],
+        })
+        if request.method == 'HEAD':
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        async def pump():
+            async for chunk in response.chunks:
+                await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+
+        async def disconnected():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        tasks = [asyncio.ensure_future(pump()), asyncio.ensure_future(disconnected())]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+app = AsgiApp(create_app())
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(
+        'asgi:app',
+        host=Config.ASGI_HOST,
+        port=Config.ASGI_PORT,
+        workers=Config.ASGI_WORKERS,
+        limit_concurrency=Config.ASGI_LIMIT_CONCURRENCY,
+    )
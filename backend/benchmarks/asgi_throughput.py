@@ -0,0 +1,264 @@
+"""Throughput of the sync (threaded werkzeug) server against the ASGI server.
+
+Seeds a SQLite database, starts each server in a subprocess on the same data
+and drives the read endpoints with a fixed number of concurrent clients.
+Response caching is disabled so every request reaches the database.
+
+Local SQLite answers in microseconds, so there is no database wait for the
+async server to overlap. ``--latency-ms`` adds a fixed delay to every SQL
+statement, paid in whichever thread runs the statement (the request thread
+for the sync server, aiosqlite's connection thread for the ASGI server), to
+stand in for a network round trip to MySQL.
+
+    python -m benchmarks.asgi_throughput --donors 20000 --concurrency 64 --requests 2000
+    python -m benchmarks.asgi_throughput --latency-ms 5 --workers 2
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, date
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+ENDPOINTS = [
+    '/api/donors/?limit=50',
+    '/api/donors/?limit=50&blood_group=O%2B',
+    '/api/donors/stats',
+    '/api/blood-requests/?limit=50',
+    '/api/admin/dashboard/stats',
+    '/api/admin/blood-stock',
+]
+
+
+def install_latency(milliseconds):
+    delay = milliseconds / 1000
+    connect = sqlite3.connect
+    if getattr(connect, 'with_latency', False):
+        return
+
+    def connect_with_latency(*args, **kwargs):
+        connection = connect(*args, **kwargs)
+        connection.set_trace_callback(lambda statement: time.sleep(delay))
+        return connection
+
+    connect_with_latency.with_latency = True
+    # pysqlite connects through sqlite3.dbapi2, aiosqlite through sqlite3.
+    sqlite3.connect = sqlite3.dbapi2.connect = connect_with_latency
+
+
+if os.environ.get('BENCH_DB_LATENCY_MS'):
+    # Also runs in each uvicorn worker process, which re-imports this module.
+    install_latency(float(os.environ['BENCH_DB_LATENCY_MS']))
+
+
+def __getattr__(name):
+    if name == 'asgi_app':
+        from asgi import app
+        return app
+    raise AttributeError(name)
+
+
+def seed(database_uri, donors):
+    from config import Config
+
+    Config.SQLALCHEMY_DATABASE_URI = database_uri
+    Config.SQLALCHEMY_ENGINE_OPTIONS = {}
+
+    from app import create_app
+    from models import db, Donor, BloodRequest, BloodStock
+    from counters import rebuild_counters, BLOOD_GROUPS
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        now = datetime.utcnow()
+        db.session.execute(Donor.__table__.insert(), [{
+            'full_name': f'Donor {i}', 'age': 18 + i % 50, 'gender': 'female' if i % 2 else 'male',
+            'blood_group': BLOOD_GROUPS[i % 8], 'contact': f'555{i:07d}', 'email': f'donor{i}@example.com',
+            'city': f'City {i % 40}', 'password_hash': 'x', 'status': 'approved' if i % 4 else 'pending',
+            'is_eligible': True, 'last_donation_date': date(2024, 1, 1) + timedelta(days=i % 300),
+            'total_donations': i % 7, 'created_at': now - timedelta(seconds=i), 'updated_at': now,
+        } for i in range(donors)])
+        db.session.execute(BloodRequest.__table__.insert(), [{
+            'name': f'Patient {i}', 'contact': f'666{i:07d}', 'blood_group': BLOOD_GROUPS[i % 8],
+            'units': 1 + i % 3, 'hospital_name': 'General', 'city': f'City {i % 40}', 'status': 'pending',
+            'urgency': 'normal', 'created_at': now - timedelta(seconds=i), 'updated_at': now,
+        } for i in range(donors // 4)])
+        db.session.execute(BloodStock.__table__.insert(), [
+            {'blood_group': group, 'units_available': 10, 'units_reserved': 0, 'last_updated': now}
+            for group in BLOOD_GROUPS
+        ])
+        db.session.commit()
+        rebuild_counters()
+
+
+def admin_token():
+    import jwt
+    from config import Config
+
+    return jwt.encode({
+        'user_id': 1, 'email': 'admin@example.com', 'type': 'admin',
+        'exp': datetime.utcnow() + timedelta(hours=1)
+    }, Config.JWT_SECRET_KEY, algorithm='HS256')
+
+
+def serve(mode, port, workers, limit_concurrency):
+    if mode == 'sync':
+        from werkzeug.serving import make_server
+        from app import create_app
+
+        make_server('127.0.0.1', port, create_app(), threaded=True).serve_forever()
+    else:
+        import uvicorn
+
+        uvicorn.run('benchmarks.asgi_throughput:asgi_app', host='127.0.0.1', port=port, workers=workers,
+                    limit_concurrency=limit_concurrency, log_level='warning')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, port, env, workers, limit_concurrency):
+    command = [
+        sys.executable, '-m', 'benchmarks.asgi_throughput', '--serve', mode, str(port),
+        '--workers', str(workers), '--limit-concurrency', str(limit_concurrency),
+    ]
+    process = subprocess.Popen(command, cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f'{mode} server did not start')
+
+
+class Connection:
+    """Minimal keep-alive HTTP/1.1 client.
+
+    A raw stream per simulated client keeps the load generator cheap enough
+    that it is not the bottleneck when it shares the machine with the server.
+    """
+
+    def __init__(self, port, headers):
+        self.port = port
+        self.headers = ''.join(f'{name}: {value}\r\n' for name, value in headers.items())
+        self.reader = self.writer = None
+
+    async def get(self, path):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.port)
+        self.writer.write(f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n{self.headers}\r\n'.encode('latin-1'))
+        await self.writer.drain()
+
+        head = (await self.reader.readuntil(b'\r\n\r\n')).decode('latin-1').lower()
+        status = int(head.split(' ', 2)[1])
+        length = 0
+        for line in head.split('\r\n'):
+            if line.startswith('content-length:'):
+                length = int(line.split(':', 1)[1])
+        await self.reader.readexactly(length)
+
+        if 'connection: close' in head:
+            await self.close()
+        return status
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+async def drive(port, path, headers, concurrency, total):
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        connection = Connection(port, headers)
+        await connection.get(path)
+        for _ in remaining:
+            started = time.perf_counter()
+            status = await connection.get(path)
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors += 1
+        await connection.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'rps': total / elapsed,
+        'p50': latencies[len(latencies) // 2] * 1000,
+        'p95': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        'errors': errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--donors', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=1, help='ASGI worker processes')
+    parser.add_argument('--limit-concurrency', type=int, default=500)
+    parser.add_argument('--latency-ms', type=float, default=0, help='simulated per-statement database latency')
+    parser.add_argument('--serve', nargs=2, metavar=('MODE', 'PORT'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args.serve[0], int(args.serve[1]), args.workers, args.limit_concurrency)
+
+    database_uri = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'asgi_bench.db')
+    seed(database_uri, args.donors)
+
+    env = dict(os.environ, DATABASE_URL=database_uri, CACHE_ENABLED='false',
+               BENCH_DB_LATENCY_MS=str(args.latency_ms or ''))
+    env.pop('ASYNC_DATABASE_URL', None)
+    headers = {'Authorization': f'Bearer {admin_token()}'}
+
+    results = {}
+    for mode in ('sync', 'asgi'):
+        port = free_port()
+        process = start_server(mode, port, env, args.workers, args.limit_concurrency)
+        try:
+            for path in ENDPOINTS:
+                results[mode, path] = asyncio.run(
+                    drive(port, path, headers, args.concurrency, args.requests)
+                )
+        finally:
+            process.terminate()
+            process.wait()
+
+    print(f'{args.donors} donors, {args.requests} requests per endpoint, '
+          f'{args.concurrency} concurrent clients, {args.workers} ASGI worker(s), '
+          f'{args.latency_ms:g} ms simulated DB latency')
+    print(f'  {"endpoint":42} {"sync req/s":>10} {"asgi req/s":>10} {"sync p95":>9} {"asgi p95":>9}')
+    failed = False
+    for path in ENDPOINTS:
+        sync, asgi = results['sync', path], results['asgi', path]
+        failed = failed or sync['errors'] or asgi['errors']
+        print(f'  {path:42} {sync["rps"]:10.0f} {asgi["rps"]:10.0f} '
+              f'{sync["p95"]:7.1f}ms {asgi["p95"]:7.1f}ms')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,423 @@
+"""Latency benchmark for every API route.
+
+Builds the app with create_app() against a freshly seeded database, drives
+each route in the auth, donors, blood_requests, admin and changes blueprints,
+plus /api/health and /api/metrics, through the Flask test client from
+``--concurrency`` threads, and reports latency
+percentiles, throughput and SQL statements per request. ``--output`` writes
+the results as JSON; ``--compare`` diffs a run against an earlier file.
+
+    python -m benchmarks.endpoints --donors 5000 --requests 200 --concurrency 4
+    python -m benchmarks.endpoints --output before.json
+    python -m benchmarks.endpoints --compare before.json --output after.json
+    python -m benchmarks.endpoints --only donors --database-url mysql+pymysql://...
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+
+ADMIN_EMAIL = 'bench-admin@example.com'
+ADMIN_PASSWORD = 'bench-password'
+BLOOD_GROUPS = ['A+', 'A-', 'B+', 'B-', 'O+', 'O-', 'AB+', 'AB-']
+
+
+def build_app(database_url, bcrypt_rounds, cache):
+    Config.SQLALCHEMY_DATABASE_URI = database_url
+    if database_url.startswith('sqlite'):
+        Config.SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': 30}}
+    Config.BCRYPT_ROUNDS = bcrypt_rounds
+    Config.CACHE_ENABLED = cache
+    # Every benchmark request comes from one client; measure the handlers, not the throttle.
+    Config.RATE_LIMIT_ENABLED = False
+    # /api/metrics is only served with a token.
+    Config.METRICS_TOKEN = Config.METRICS_TOKEN or 'bench-metrics-token'
+
+    from app import create_app
+    return create_app()
+
+
+def location(i):
+    from geo import encode_geohash
+
+    # Spread over roughly 400 km x 400 km around New York.
+    latitude, longitude = 39 + (i * 37 % 400) / 100, -76 + (i * 53 % 500) / 100
+    return {'latitude': latitude, 'longitude': longitude, 'geohash': encode_geohash(latitude, longitude)}
+
+
+def seed(app, donors, requests):
+    """Seed donors, requests, donations, stock and notifications; return id pools for write routes."""
+    from models import db, Admin, Donor, BloodRequest, Donation, BloodStock, Notification
+    from counters import rebuild_counters
+    from eligibility import recompute_eligibility
+    from search import rebuild_search_index
+    from triage import recompute_priorities
+    from hashing import hash_password
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        now = datetime.utcnow()
+        password_hash = hash_password('donor-password')
+
+        db.session.add(Admin(username='bench', email=ADMIN_EMAIL, full_name='Bench Admin',
+                             password_hash=hash_password(ADMIN_PASSWORD)))
+        db.session.execute(Donor.__table__.insert(), [{
+            'full_name': f'Donor {i}', 'age': 18 + i % 50, 'gender': 'female' if i % 2 else 'male',
+            'blood_group': BLOOD_GROUPS[i % 8], 'contact': f'555{i:07d}', 'email': f'donor{i}@example.com',
+            'city': f'City {i % 40}', 'password_hash': password_hash, **location(i),
+            'status': 'approved' if i % 5 else 'pending', 'is_eligible': True,
+            'last_donation_date': date(2024, 1, 1) + timedelta(days=i % 300) if i % 3 else None,
+            'total_donations': 1, 'created_at': now - timedelta(minutes=i), 'updated_at': now,
+        } for i in range(donors)])
+        db.session.execute(Donation.__table__.insert(), [{
+            'donor_id': i + 1, 'location': f'Center {i % 10}', 'units': 1, 'status': 'completed',
+            'donation_date': date(2024, 1, 1) + timedelta(days=i % 300), 'notes': '',
+            'created_at': now - timedelta(minutes=i),
+        } for i in range(donors)])
+
+        # Separate request pools so routes that consume their target do not
+        # collide: read/update, approve then fulfil, reject, delete, bulk
+        # approve, bulk reject, and claimed by the benchmark admin for release.
+        pools = ('read', 'approve', 'reject', 'delete', 'bulk_approve', 'bulk_reject', 'release')
+        claimed = range(pools.index('release') * requests, (pools.index('release') + 1) * requests)
+        db.session.execute(BloodRequest.__table__.insert(), [{
+            'name': f'Patient {i}', 'contact': f'666{i:07d}', 'blood_group': BLOOD_GROUPS[i % 8],
+            'units': 1, 'hospital_name': 'Bench Hospital', 'city': f'City {i % 40}', 'status': 'pending',
+            'latitude': location(i)['latitude'], 'longitude': location(i)['longitude'],
+            'urgency': ('normal', 'normal', 'urgent', 'critical')[i % 4], 'donor_id': (i % donors) + 1 if donors else None,
+            'claimed_by': 1 if i in claimed else None,
+            'claimed_until': now + timedelta(days=1) if i in claimed else None,
+            'created_at': now - timedelta(minutes=i), 'updated_at': now,
+        } for i in range(requests * len(pools))])
+        db.session.execute(BloodStock.__table__.insert(), [{
+            'blood_group': group, 'units_available': requests * 10, 'units_reserved': 0, 'last_updated': now,
+        } for group in BLOOD_GROUPS])
+        # Dead notifications, one per retry.
+        db.session.execute(Notification.__table__.insert(), [{
+            'channel': 'email', 'kind': 'donor_call', 'recipient': f'donor{i}@example.com',
+            'subject': 'Blood needed', 'body': 'Bench notification', 'status': 'dead', 'attempts': 6,
+            'next_attempt_at': now - timedelta(minutes=i), 'last_error': 'bench', 'created_at': now,
+        } for i in range(requests)])
+        db.session.commit()
+        rebuild_counters()
+        recompute_eligibility()
+        rebuild_search_index()
+        recompute_priorities()
+
+        ids = [row_id for row_id, in db.session.query(BloodRequest.id).order_by(BloodRequest.id)]
+        return {
+            **{name: ids[index * requests:(index + 1) * requests] for index, name in enumerate(pools)},
+            'notifications': [row_id for row_id, in db.session.query(Notification.id).order_by(Notification.id)],
+        }
+
+
+def mint_token(user_id, user_type, offset=0):
+    import jwt
+
+    return jwt.encode({
+        'user_id': user_id,
+        'email': f'{user_type}{user_id}@example.com',
+        'type': user_type,
+        # The offset keeps tokens minted for logout distinct from each other.
+        'exp': datetime.utcnow() + timedelta(hours=1, seconds=offset)
+    }, Config.JWT_SECRET_KEY, algorithm='HS256')
+
+
+def scenarios(donors, pools, admin_token, donor_token):
+    """(name, build) pairs in run order; build(i) returns (method, url, kwargs)."""
+    admin = {'Authorization': f'Bearer {admin_token}'}
+    owner = {'Authorization': f'Bearer {donor_token}'}
+
+    def donor_id(i):
+        return i % donors + 1
+
+    def request_id(pool, i):
+        ids = pools[pool]
+        return ids[i % len(ids)]
+
+    metrics = {'Authorization': f'Bearer {Config.METRICS_TOKEN}'}
+
+    today = datetime.utcnow().date()
+    csv_body = 'donor_id,units,donation_date,location\n' + ''.join(
+        f'{donor_id(i)},1,{today.isoformat()},Bulk Center\n' for i in range(100)
+    )
+
+    return [
+        # auth
+        ('POST /api/auth/register', lambda i: ('POST', '/api/auth/register', {'json': {
+            'fullName': f'New Donor {i}', 'age': 30, 'gender': 'female', 'bloodGroup': 'O+',
+            'contact': f'777{i:07d}', 'email': f'new{i}-{time.time_ns()}@example.com',
+            'city': 'City 1', 'password': 'donor-password'}})),
+        ('POST /api/auth/login', lambda i: ('POST', '/api/auth/login', {'json': {
+            'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD, 'role': 'admin'}})),
+        ('GET /api/auth/verify', lambda i: ('GET', '/api/auth/verify', {'headers': admin})),
+        ('POST /api/auth/logout', lambda i: ('POST', '/api/auth/logout', {
+            'headers': {'Authorization': f'Bearer {mint_token(1, "donor", offset=i)}'}})),
+
+        # donors
+        ('GET /api/donors/', lambda i: ('GET', '/api/donors/?limit=50', {})),
+        ('GET /api/donors/?blood_group', lambda i: ('GET', '/api/donors/?limit=50&blood_group=O%2B&city=City+3', {})),
+        ('GET /api/donors/stats', lambda i: ('GET', '/api/donors/stats', {})),
+        ('GET /api/donors/search', lambda i: ('GET', f'/api/donors/search?q=donor+{i % 100}', {'headers': admin})),
+        ('GET /api/donors/nearby', lambda i: ('GET', '/api/donors/nearby?city=New+York&radius_km=50', {'headers': admin})),
+        ('GET /api/donors/search (contact)', lambda i: ('GET', f'/api/donors/search?q={i % 1000:03d}', {'headers': admin})),
+        ('GET /api/donors/<id>', lambda i: ('GET', f'/api/donors/{donor_id(i)}', {'headers': admin})),
+        ('GET /api/donors/<id> (owner)', lambda i: ('GET', '/api/donors/1', {'headers': owner})),
+        ('GET /api/donors/<id>/donations', lambda i: ('GET', f'/api/donors/{donor_id(i)}/donations', {'headers': admin})),
+        ('PUT /api/donors/<id>', lambda i: ('PUT', f'/api/donors/{donor_id(i)}', {
+            'headers': admin, 'json': {'city': f'City {i % 40}'}})),
+        ('POST /api/donors/<id>/approve', lambda i: ('POST', f'/api/donors/{donor_id(i)}/approve', {'headers': admin})),
+        ('POST /api/donors/<id>/reject', lambda i: ('POST', f'/api/donors/{donor_id(i)}/reject', {'headers': admin})),
+        ('POST /api/donors/bulk/approve', lambda i: ('POST', '/api/donors/bulk/approve', {
+            'headers': admin, 'json': {'ids': [donor_id(i * 10 + k) for k in range(10)]}})),
+        ('POST /api/donors/bulk/reject', lambda i: ('POST', '/api/donors/bulk/reject', {
+            'headers': admin, 'json': {'ids': [donor_id(i * 10 + k) for k in range(10)]}})),
+        ('POST /api/donors/<id>/donations', lambda i: ('POST', f'/api/donors/{donor_id(i)}/donations', {
+            'headers': admin, 'json': {'location': 'Bench Center', 'units': 1}})),
+        ('POST /api/donors/donations/bulk', lambda i: ('POST', '/api/donors/donations/bulk', {
+            'headers': admin, 'data': csv_body, 'content_type': 'text/csv'})),
+
+        # blood_requests
+        ('POST /api/blood-requests/', lambda i: ('POST', '/api/blood-requests/', {'json': {
+            'name': f'Walk-in {i}', 'contact': '5550000000', 'bloodGroup': BLOOD_GROUPS[i % 8],
+            'units': 1, 'hospitalName': 'Bench Hospital', 'city': 'City 1'}})),
+        ('GET /api/blood-requests/', lambda i: ('GET', '/api/blood-requests/?limit=50', {'headers': admin})),
+        ('GET /api/blood-requests/?status', lambda i: ('GET', '/api/blood-requests/?limit=50&status=pending', {'headers': admin})),
+        ('GET /api/blood-requests/<id>', lambda i: ('GET', f'/api/blood-requests/{request_id("read", i)}', {'headers': admin})),
+        ('GET /api/blood-requests/<id>/matches', lambda i: ('GET', f'/api/blood-requests/{request_id("read", i)}/matches', {'headers': admin})),
+        ('GET /api/blood-requests/<id>/nearby', lambda i: ('GET', f'/api/blood-requests/{request_id("read", i)}/nearby?radius_km=50', {'headers': admin})),
+        ('GET /api/blood-requests/donor/<id>', lambda i: ('GET', '/api/blood-requests/donor/1', {'headers': owner})),
+        ('PUT /api/blood-requests/<id>', lambda i: ('PUT', f'/api/blood-requests/{request_id("read", i)}', {
+            'headers': admin, 'json': {'urgency': 'urgent' if i % 2 else 'normal'}})),
+
+        # admin
+        ('GET /api/admin/dashboard/stats', lambda i: ('GET', '/api/admin/dashboard/stats', {'headers': admin})),
+        ('GET /api/admin/donors/pending', lambda i: ('GET', '/api/admin/donors/pending', {'headers': admin})),
+        ('GET /api/admin/requests/pending', lambda i: ('GET', '/api/admin/requests/pending', {'headers': admin})),
+        ('GET /api/admin/requests/queue', lambda i: ('GET', '/api/admin/requests/queue?limit=20', {'headers': admin})),
+        ('POST /api/admin/requests/queue/claim', lambda i: ('POST', '/api/admin/requests/queue/claim', {
+            'headers': admin, 'json': {'count': 1}})),
+        ('POST /api/admin/requests/<id>/release', lambda i: ('POST', f'/api/admin/requests/{request_id("release", i)}/release', {'headers': admin})),
+        ('GET /api/admin/blood-stock', lambda i: ('GET', '/api/admin/blood-stock', {'headers': admin})),
+        ('PUT /api/admin/blood-stock/<id>', lambda i: ('PUT', f'/api/admin/blood-stock/{i % 8 + 1}', {
+            'headers': admin, 'json': {'units_available': 10000 + i}})),
+        ('POST /api/admin/requests/<id>/approve', lambda i: ('POST', f'/api/admin/requests/{request_id("approve", i)}/approve', {'headers': admin})),
+        ('POST /api/admin/requests/<id>/fulfil', lambda i: ('POST', f'/api/admin/requests/{request_id("approve", i)}/fulfil', {'headers': admin})),
+        ('POST /api/admin/requests/<id>/reject', lambda i: ('POST', f'/api/admin/requests/{request_id("reject", i)}/reject', {'headers': admin})),
+        ('POST /api/admin/requests/bulk/approve', lambda i: ('POST', '/api/admin/requests/bulk/approve', {
+            'headers': admin, 'json': {'ids': [request_id('bulk_approve', i)]}})),
+        ('POST /api/admin/requests/bulk/reject', lambda i: ('POST', '/api/admin/requests/bulk/reject', {
+            'headers': admin, 'json': {'ids': [request_id('bulk_reject', i)]}})),
+        ('GET /api/admin/blood-stock/ledger', lambda i: ('GET', '/api/admin/blood-stock/ledger', {'headers': admin})),
+        ('GET /api/admin/export/donors', lambda i: ('GET', '/api/admin/export/donors?format=ndjson&status=pending', {'headers': admin})),
+        ('GET /api/admin/reports/monthly', lambda i: ('GET', '/api/admin/reports/monthly', {'headers': admin})),
+        ('GET /api/admin/reports', lambda i: ('GET', '/api/admin/reports?granularity=week', {'headers': admin})),
+        ('GET /api/admin/notifications', lambda i: ('GET', '/api/admin/notifications?status=dead&limit=50', {'headers': admin})),
+        ('POST /api/admin/notifications/<id>/retry', lambda i: ('POST', f'/api/admin/notifications/{pools["notifications"][i % len(pools["notifications"])]}/retry', {'headers': admin})),
+        ('GET /api/admin/cache/stats', lambda i: ('GET', '/api/admin/cache/stats', {'headers': admin})),
+
+        # changes: time to the opening frame, replaying the backlog since event 0
+        ('GET /api/changes/stream', lambda i: ('GET', '/api/changes/stream?last_event_id=0', {'headers': admin})),
+
+        # app
+        ('GET /api/health', lambda i: ('GET', '/api/health', {})),
+        ('GET /api/metrics', lambda i: ('GET', '/api/metrics', {'headers': metrics})),
+
+        ('DELETE /api/blood-requests/<id>', lambda i: ('DELETE', f'/api/blood-requests/{request_id("delete", i)}', {'headers': admin})),
+    ]
+
+
+class StatementCounter:
+    """Counts SQL statements per thread via the engine's cursor events."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self._local = threading.local()
+        event.listen(engine, 'before_cursor_execute', self._count)
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        self._local.count = getattr(self._local, 'count', 0) + 1
+
+    def reset(self):
+        self._local.count = 0
+
+    def value(self):
+        return getattr(self._local, 'count', 0)
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))
+    return values[index]
+
+
+def read_body(response):
+    # An event stream never ends; take its opening frame and hang up.
+    if response.mimetype == 'text/event-stream':
+        next(iter(response.response), None)
+        response.close()
+    else:
+        response.get_data()
+
+
+def run_scenario(app, counter, build, total, concurrency):
+    samples = []
+    statuses = {}
+    lock = threading.Lock()
+    sequence = itertools.count()
+
+    def worker():
+        client = app.test_client()
+        while True:
+            i = next(sequence)
+            if i >= total:
+                return
+            method, url, kwargs = build(i)
+            counter.reset()
+            started = time.perf_counter()
+            response = client.open(url, method=method, **kwargs)
+            read_body(response)
+            elapsed = time.perf_counter() - started
+            statements = counter.value()
+            with lock:
+                samples.append((elapsed, statements))
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies = sorted(elapsed for elapsed, _ in samples)
+    statements = [count for _, count in samples]
+    errors = sum(count for status, count in statuses.items() if status >= 400)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'status_codes': {str(status): count for status, count in sorted(statuses.items())},
+        'throughput_rps': round(len(samples) / wall, 2) if wall else 0.0,
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'sql_per_request': round(sum(statements) / len(statements), 2) if statements else 0.0,
+        'sql_max': max(statements) if statements else 0,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    header = f'  {"endpoint":44} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"sql/req":>8} {"err":>5}'
+    if baseline:
+        header += f' {"p95 vs base":>12} {"sql vs base":>12}'
+    print(header)
+
+    for name, result in results.items():
+        line = (f'  {name:44} {result["throughput_rps"]:8.1f} {result["p50_ms"]:8.2f} '
+                f'{result["p95_ms"]:8.2f} {result["p99_ms"]:8.2f} {result["sql_per_request"]:8.2f} '
+                f'{result["errors"]:5d}')
+        before = (baseline or {}).get(name)
+        if before:
+            p95_change = (result['p95_ms'] / before['p95_ms'] - 1) * 100 if before['p95_ms'] else 0.0
+            sql_change = result['sql_per_request'] - before['sql_per_request']
+            line += f' {p95_change:+11.1f}% {sql_change:+12.2f}'
+        elif baseline:
+            line += f' {"new":>12}'
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--donors', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=100, help='requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=4, help='client threads per endpoint')
+    parser.add_argument('--only', help='run endpoints whose name contains this text')
+    parser.add_argument('--database-url')
+    parser.add_argument('--bcrypt-rounds', type=int, default=4,
+                        help='work factor for seeded and benchmarked passwords (production uses %d)' % Config.BCRYPT_ROUNDS)
+    parser.add_argument('--no-cache', action='store_true', help='disable the aggregate response cache')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--compare', help='JSON results from an earlier run to diff against')
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'endpoints_bench.db')
+    app = build_app(database_url, args.bcrypt_rounds, not args.no_cache)
+    pools = seed(app, args.donors, args.requests)
+
+    from models import db
+    from token_auth import token_cache
+
+    with app.app_context():
+        counter = StatementCounter(db.engine)
+
+    plan = scenarios(args.donors, pools, mint_token(1, 'admin'), mint_token(1, 'donor'))
+    if args.only:
+        plan = [(name, build) for name, build in plan if args.only in name]
+
+    results = {}
+    for name, build in plan:
+        token_cache.clear()
+        results[name] = run_scenario(app, counter, build, args.requests, args.concurrency)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+
+    dialect = database_url.split(':', 1)[0]
+    print(f'{args.donors} donors, {args.requests} requests x {args.concurrency} threads per endpoint ({dialect})')
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'meta': {
+                    'started_at': datetime.utcnow().isoformat(),
+                    'revision': git_revision(),
+                    'python': platform.python_version(),
+                    'platform': platform.platform(),
+                    'database': dialect,
+                    'donors': args.donors,
+                    'requests': args.requests,
+                    'concurrency': args.concurrency,
+                    'bcrypt_rounds': args.bcrypt_rounds,
+                    'cache': not args.no_cache,
+                },
+                'results': results,
+            }, f, indent=2, sort_keys=True)
+        print(f'Results written to {args.output}')
+
+    unexpected = [name for name, result in results.items() if result['status_codes'].get('500')]
+    if unexpected:
+        print('Server errors in: ' + ', '.join(unexpected))
+    sys.exit(1 if unexpected else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Serialization microbenchmark for the donor list path.
+
+Compares hydrating ORM objects + to_dict() + the stdlib encoder (the old
+list-endpoint path) against column projection + serializers.dumps, and checks
+that both produce identical bytes. Every fifth donor has a non-ASCII name and
+city, so the check also covers the ``\\uXXXX`` escapes added after orjson.
+
+    python -m benchmarks.serialization --rows 10000 --repeat 5
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+
+
+def seed(rows):
+    from models import db, Donor
+
+    db.drop_all()
+    db.create_all()
+    now = datetime.utcnow()
+    groups = ['A+', 'A-', 'B+', 'B-', 'O+', 'O-', 'AB+', 'AB-']
+    names = ['Zoë Núñez', 'Łukasz Żółć', '李小龍', 'Ahmed 🩸']
+    cities = ['São Paulo', 'Zürich', '東京', 'Kraków']
+    db.session.execute(Donor.__table__.insert(), [{
+        'full_name': f'{names[i % 4]} {i}' if i % 5 == 0 else f'Donor {i}',
+        'age': 18 + i % 50, 'gender': 'female' if i % 2 else 'male',
+        'blood_group': groups[i % 8], 'contact': f'555{i:07d}', 'email': f'donor{i}@example.com',
+        'city': cities[i % 4] if i % 5 == 0 else f'City {i % 40}', 'password_hash': 'x', 'status': 'approved', 'is_eligible': True,
+        'last_donation_date': date(2024, 1, 1) + timedelta(days=i % 300) if i % 3 else None,
+        'total_donations': i % 7, 'created_at': now - timedelta(seconds=i), 'updated_at': now,
+    } for i in range(rows)])
+    db.session.commit()
+
+
+def orm_path():
+    from models import Donor
+
+    donors = Donor.query.order_by(Donor.created_at.desc(), Donor.id.desc()).all()
+    payload = {'donors': [donor.to_dict() for donor in donors]}
+    return json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=True)
+
+
+def projection_path():
+    from models import Donor
+    from serializers import DONOR_COLUMNS, rows_to_dicts, dumps
+
+    rows = Donor.query.with_entities(*DONOR_COLUMNS).order_by(Donor.created_at.desc(), Donor.id.desc()).all()
+    return dumps({'donors': rows_to_dicts(rows)})
+
+
+def best_of(fn, repeat):
+    from models import db
+
+    timings = []
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        output = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    Config.SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'serialization_bench.db')
+    Config.SQLALCHEMY_ENGINE_OPTIONS = {}
+
+    from app import create_app
+    from serializers import orjson
+
+    app = create_app()
+    with app.app_context():
+        seed(args.rows)
+
+        orm_time, orm_output = best_of(orm_path, args.repeat)
+        fast_time, fast_output = best_of(projection_path, args.repeat)
+
+    per_10k = 10000 / args.rows
+    print(f'{args.rows} donors, best of {args.repeat} (encoder: {"orjson" if orjson else "json"})')
+    print(f'  ORM + to_dict + json : {orm_time * 1000 * per_10k:8.1f} ms / 10k rows')
+    print(f'  projection + dumps   : {fast_time * 1000 * per_10k:8.1f} ms / 10k rows')
+    print(f'  speedup              : {orm_time / fast_time:8.2f}x')
+    print(f'  identical output     : {orm_output == fast_output}')
+    sys.exit(0 if orm_output == fast_output else 1)
+
+
+if __name__ == '__main__':
+    main()
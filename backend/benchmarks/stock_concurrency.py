@@ -0,0 +1,141 @@
+"""Concurrent approval benchmark for the blood stock reservation engine.
+
+Creates a database with a limited amount of stock and more pending requests
+than it can satisfy, then approves them all from parallel threads and checks
+that stock never goes negative and the ledger balances.
+
+    python -m benchmarks.stock_concurrency --requests 400 --threads 16
+    python -m benchmarks.stock_concurrency --database-url mysql+pymysql://...
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+
+
+def build_app(database_url):
+    Config.SQLALCHEMY_DATABASE_URI = database_url
+    if database_url.startswith('sqlite'):
+        Config.SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': 30}}
+
+    from app import create_app
+    return create_app()
+
+
+def seed(app, blood_groups, stock_per_group, requests_per_group, units):
+    from models import db, BloodStock, BloodRequest
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        for group in blood_groups:
+            db.session.add(BloodStock(blood_group=group, units_available=stock_per_group, units_reserved=0))
+            for i in range(requests_per_group):
+                db.session.add(BloodRequest(
+                    name=f'Patient {i}', contact='0000000000', blood_group=group,
+                    units=units, hospital_name='Bench Hospital', city='Bench', status='pending'
+                ))
+        db.session.commit()
+        return [r.id for r in BloodRequest.query.all()]
+
+
+def run(app, request_ids, threads):
+    from models import db
+    from stock import reserve_for_request, StockError
+
+    results = {'approved': 0, 'refused': 0, 'errors': 0}
+    lock = threading.Lock()
+    queue = list(request_ids)
+
+    def worker():
+        while True:
+            with lock:
+                if not queue:
+                    return
+                request_id = queue.pop()
+            with app.app_context():
+                try:
+                    reserve_for_request(request_id)
+                    db.session.commit()
+                    outcome = 'approved'
+                except StockError:
+                    db.session.rollback()
+                    outcome = 'refused'
+                except Exception as e:
+                    db.session.rollback()
+                    print(f'  error on request {request_id}: {e}')
+                    outcome = 'errors'
+            with lock:
+                results[outcome] += 1
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return results, time.perf_counter() - started
+
+
+def verify(app, blood_groups, stock_per_group, units):
+    from models import db, BloodStock, BloodRequest, StockLedger
+
+    ok = True
+    with app.app_context():
+        for group in blood_groups:
+            stock = BloodStock.query.filter_by(blood_group=group).first()
+            approved = BloodRequest.query.filter_by(blood_group=group, status='approved').count()
+            ledger_available = db.session.query(
+                db.func.coalesce(db.func.sum(StockLedger.available_change), 0)
+            ).filter_by(blood_group=group).scalar()
+
+            expected_available = stock_per_group - approved * units
+            checks = [
+                stock.units_available >= 0,
+                stock.units_available == expected_available,
+                stock.units_reserved == approved * units,
+                stock_per_group + ledger_available == stock.units_available,
+            ]
+            status = 'ok' if all(checks) else 'OVERSOLD/MISMATCH'
+            ok = ok and all(checks)
+            print(f'  {group:>3}: approved={approved:<5} available={stock.units_available:<5} '
+                  f'reserved={stock.units_reserved:<5} {status}')
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--requests', type=int, default=400, help='pending requests per blood group')
+    parser.add_argument('--stock', type=int, default=250, help='initial units per blood group')
+    parser.add_argument('--units', type=int, default=2, help='units per request')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--groups', default='A+,O+,B+,AB-')
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if not database_url:
+        database_url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'stock_bench.db')
+
+    blood_groups = args.groups.split(',')
+    app = build_app(database_url)
+    request_ids = seed(app, blood_groups, args.stock, args.requests, args.units)
+
+    print(f'Approving {len(request_ids)} requests with {args.threads} threads on {database_url.split("://")[0]}')
+    results, elapsed = run(app, request_ids, args.threads)
+    print(f'  approved={results["approved"]} refused={results["refused"]} errors={results["errors"]}')
+    print(f'  {elapsed:.2f}s, {len(request_ids) / elapsed:.0f} approvals/s')
+
+    ok = verify(app, blood_groups, args.stock, args.units) and results['errors'] == 0
+    print('PASS: no stock oversold' if ok else 'FAIL')
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
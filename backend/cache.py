@@ -0,0 +1,217 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from config import Config
+
+# Tables whose writes invalidate cached aggregates.
+TRACKED_TABLES = {'donors', 'blood_requests', 'donations', 'daily_rollups'}
+
+
+class MemoryCache:
+    """Process-local TTL + LRU cache."""
+
+    def __init__(self, max_entries):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generations = {}
+        self.max_entries = max_entries
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def generations(self, tags):
+        with self._lock:
+            return [self._generations.get(tag, 0) for tag in tags]
+
+    def bump(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self):
+        return len(self._entries)
+
+
+class RedisCache:
+    """Shared cache for multi-worker deployments; requires the redis package."""
+
+    def __init__(self, url, prefix='bloodlink:cache:'):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def get(self, key):
+        return self._client.get(self._prefix + key)
+
+    def set(self, key, value, ttl):
+        self._client.set(self._prefix + key, value, ex=max(1, int(ttl)))
+
+    def generations(self, tags):
+        values = self._client.mget([f'{self._prefix}gen:{tag}' for tag in tags])
+        return [int(value or 0) for value in values]
+
+    def bump(self, tags):
+        pipeline = self._client.pipeline()
+        for tag in tags:
+            pipeline.incr(f'{self._prefix}gen:{tag}')
+        pipeline.execute()
+
+    def clear(self):
+        for key in self._client.scan_iter(self._prefix + '*'):
+            self._client.delete(key)
+
+    def size(self):
+        return None
+
+
+class AggregateCache:
+    """Caches aggregate responses, invalidated by generation counters.
+
+    Every entry's key embeds the current generation of each table it depends
+    on. A commit that touches one of those tables bumps its generation, so
+    stale entries are never read again and age out through TTL/LRU.
+    """
+
+    def __init__(self):
+        self._backend = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            if Config.CACHE_BACKEND == 'redis':
+                self._backend = RedisCache(Config.CACHE_REDIS_URL)
+            else:
+                self._backend = MemoryCache(Config.CACHE_MAX_ENTRIES)
+        return self._backend
+
+    def key(self, name, tags, query_string=None):
+        if query_string is None:
+            query_string = request.query_string
+        generations = self.backend.generations(tags)
+        stamp = '.'.join(f'{tag}{gen}' for tag, gen in zip(tags, generations))
+        return f"{name}:{stamp}:{query_string.decode('utf-8', 'replace')}"
+
+    def count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def lookup(self, key):
+        """The cached response body for ``key``, or None; counts the hit or miss."""
+        body = self.backend.get(key)
+        self.count(hit=body is not None)
+        return body
+
+    def store(self, key, body):
+        self.backend.set(key, body, Config.CACHE_TTL)
+
+    def invalidate(self, tags):
+        if tags:
+            self.backend.bump(sorted(tags))
+            with self._lock:
+                self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': Config.CACHE_BACKEND,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'invalidations': self.invalidations,
+                'entries': self.backend.size(),
+            }
+
+
+aggregate_cache = AggregateCache()
+
+
+def cached_aggregate(name, tags):
+    """Cache a view's 200 JSON response until one of ``tags`` is written."""
+    tags = tuple(sorted(tags))
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not Config.CACHE_ENABLED:
+                return view(*args, **kwargs)
+
+            key = aggregate_cache.key(name, tags)
+            body = aggregate_cache.lookup(key)
+            if body is not None:
+                response = current_app.response_class(body, mimetype='application/json')
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                aggregate_cache.store(key, response.get_data())
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+def _pending(session):
+    return session.info.setdefault('cache_invalidations', set())
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_flushed_tables(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__tablename__', None)
+        if table in TRACKED_TABLES:
+            _pending(session).add(table)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_executed_tables(orm_execute_state):
+    # Set-based INSERT/UPDATE/DELETE statements bypass the flush.
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        name = getattr(table, 'name', None)
+        if name in TRACKED_TABLES:
+            _pending(orm_execute_state.session).add(name)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed(session):
+    tables = session.info.pop('cache_invalidations', None)
+    if tables:
+        aggregate_cache.invalidate(tables)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_invalidations(session):
+    session.info.pop('cache_invalidations', None)
@@ -0,0 +1,344 @@
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, or_, select
+from sqlalchemy.orm import Session
+from config import Config
+from models import db, ChangeEvent
+from serializers import dumps
+
+log = logging.getLogger('bloodlink.changefeed')
+
+# Tables whose writes are published; the table name is the event's topic.
+TOPICS = ('donors', 'blood_requests', 'donations', 'blood_stock')
+
+ACTIONS = {'insert': 'created', 'update': 'updated', 'delete': 'deleted'}
+
+EVENT_COLUMNS = [ChangeEvent.id, ChangeEvent.topic, ChangeEvent.action, ChangeEvent.entity_id, ChangeEvent.created_at]
+
+# A transaction can take an id and commit after one that took a later id, so
+# ids skipped by a poll are looked for again for this long.
+GAP_TIMEOUT = 10.0
+MAX_GAPS = 1000
+
+POLL_BATCH = 500
+PRUNE_INTERVAL = 300
+
+RETRY_MS = 3000
+# Audience of the ?ticket= a stream is opened with (see token_auth.issue_ticket).
+TICKET_AUDIENCE = 'change-stream'
+HEARTBEAT = ': keepalive\n\n'
+RESET = 'event: reset\ndata: {}\n\n'
+
+
+class ChangeFeedError(ValueError):
+    pass
+
+
+def format_event(row):
+    data = dumps({
+        'id': row.id, 'topic': row.topic, 'action': row.action,
+        'entity_id': row.entity_id, 'created_at': row.created_at,
+    })
+    return f'id: {row.id}\nevent: {row.topic}\ndata: {data}\n\n'
+
+
+def parse_topics(value):
+    topics = {topic.strip() for topic in (value or '').split(',') if topic.strip()}
+    unknown = topics - set(TOPICS)
+    if unknown:
+        raise ChangeFeedError(f"Unknown topic(s): {', '.join(sorted(unknown))}")
+    return topics
+
+
+def parse_last_event_id(value):
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ChangeFeedError('Last-Event-ID must be an integer')
+
+
+def backlog_statement(last_event_id, topics):
+    """Events after ``last_event_id``, one past the replay limit."""
+    query = select(*EVENT_COLUMNS).where(ChangeEvent.id > last_event_id)
+    if topics:
+        query = query.where(ChangeEvent.topic.in_(topics))
+    return query.order_by(ChangeEvent.id).limit(Config.CHANGE_FEED_BACKLOG_MAX + 1)
+
+
+def oldest_statement():
+    return select(func.min(ChangeEvent.id))
+
+
+def resume(last_event_id, oldest, rows):
+    """Replay for a reconnecting client: ``(rows, reset)``.
+
+    ``reset`` tells the client to reload everything, because events it missed
+    were pruned or there are more than ``CHANGE_FEED_BACKLOG_MAX`` of them.
+    """
+    if (oldest is not None and oldest > last_event_id + 1) or len(rows) > Config.CHANGE_FEED_BACKLOG_MAX:
+        return [], True
+    return rows, False
+
+
+class ChangeFeed:
+    """Fans committed change events out to the streams of this process.
+
+    One thread reads new rows from ``change_events`` (a primary key range)
+    every ``CHANGE_FEED_POLL_INTERVAL`` seconds, or at once when this process
+    commits a change, and keeps the latest ``CHANGE_FEED_BUFFER_SIZE`` in
+    memory. Streams only wait on that buffer, so the database sees the same
+    small query however many dashboards are open.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._events = deque()
+        self._seq = 0
+        self._last_id = 0
+        self._gaps = {}
+        self._waiters = set()
+        self._wake = threading.Event()
+        self._thread = None
+        self._app = None
+        self._pruned_at = 0.0
+
+    def init_app(self, app):
+        self._app = app
+
+    def start(self):
+        """Start polling on the first subscriber; a no-op afterwards."""
+        if self._thread is not None:
+            return
+        with self._cond:
+            if self._thread is None:
+                app = self._app
+                with app.app_context():
+                    self._last_id = db.session.execute(select(func.max(ChangeEvent.id))).scalar() or 0
+                self._thread = threading.Thread(target=self._run, args=(app,), name='change-feed', daemon=True)
+                self._thread.start()
+
+    def notify(self):
+        self._wake.set()
+
+    def position(self):
+        with self._cond:
+            return self._seq
+
+    def read(self, position):
+        """Buffered events after ``position``: ``(rows, position, lost)``.
+
+        ``lost`` means events after ``position`` already left the buffer.
+        """
+        with self._cond:
+            return self._read(position)
+
+    def _read(self, position):
+        if position >= self._seq:
+            return [], position, False
+        first = self._seq - len(self._events) + 1
+        rows = list(itertools.islice(self._events, max(position + 1 - first, 0), None))
+        return rows, self._seq, position + 1 < first
+
+    def wait(self, position, timeout):
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > position, timeout)
+            return self._read(position)
+
+    async def wait_async(self, position, timeout):
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._cond:
+            if self._seq > position:
+                return self._read(position)
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._cond:
+                self._waiters.discard(waiter)
+        return self.read(position)
+
+    def _publish(self, rows):
+        with self._cond:
+            self._events.extend(rows)
+            self._seq += len(rows)
+            while len(self._events) > Config.CHANGE_FEED_BUFFER_SIZE:
+                self._events.popleft()
+            self._cond.notify_all()
+            waiters = list(self._waiters)
+        for loop, ready in waiters:
+            try:
+                loop.call_soon_threadsafe(ready.set)
+            except RuntimeError:
+                # The stream's event loop has closed.
+                pass
+
+    def _run(self, app):
+        while True:
+            self._wake.wait(Config.CHANGE_FEED_POLL_INTERVAL)
+            self._wake.clear()
+            try:
+                with app.app_context():
+                    self.poll()
+                    if time.monotonic() - self._pruned_at >= PRUNE_INTERVAL:
+                        self._pruned_at = time.monotonic()
+                        prune_change_events()
+            except Exception:
+                log.exception('Change feed poll failed')
+
+    def poll(self):
+        """Publish events committed since the last poll; returns how many."""
+        published = 0
+        while True:
+            now = time.monotonic()
+            self._gaps = {row_id: seen for row_id, seen in self._gaps.items() if now - seen < GAP_TIMEOUT}
+            condition = ChangeEvent.id > self._last_id
+            if self._gaps:
+                condition = or_(condition, ChangeEvent.id.in_(self._gaps))
+            rows = db.session.execute(
+                select(*EVENT_COLUMNS).where(condition).order_by(ChangeEvent.id).limit(POLL_BATCH)
+            ).all()
+            db.session.rollback()
+
+            for row in rows:
+                if self._gaps.pop(row.id, None) is None and row.id > self._last_id:
+                    for missing in range(self._last_id + 1, min(row.id, self._last_id + 1 + MAX_GAPS)):
+                        self._gaps[missing] = now
+                    self._last_id = row.id
+            if rows:
+                self._publish(rows)
+                published += len(rows)
+            if len(rows) < POLL_BATCH:
+                return published
+
+
+change_feed = ChangeFeed()
+
+
+def prune_change_events():
+    """Delete events older than ``CHANGE_FEED_RETENTION_HOURS``.
+
+    The newest event is always kept, so a gap before the oldest remaining id
+    shows a reconnecting client that it missed pruned events.
+    """
+    table = ChangeEvent.__table__
+    newest = db.session.execute(select(func.max(table.c.id))).scalar()
+    if newest is None:
+        return 0
+    cutoff = datetime.utcnow() - timedelta(hours=Config.CHANGE_FEED_RETENTION_HOURS)
+    result = db.session.execute(table.delete().where(table.c.created_at < cutoff, table.c.id < newest))
+    db.session.commit()
+    return result.rowcount
+
+
+class ChangeStream:
+    """Server-Sent Events frames for one client, from its replayed ``backlog`` on.
+
+    Shared by the Flask and ASGI endpoints, which only differ in how they
+    wait on the feed. Ends after ``CHANGE_FEED_MAX_STREAM_SECONDS`` so workers
+    are recycled; browsers reconnect with ``Last-Event-ID`` on their own.
+    """
+
+    def __init__(self, position, backlog, reset, topics):
+        self.position = position
+        self.backlog = backlog
+        self.reset = reset
+        self.topics = topics
+        self.replayed = {row.id for row in backlog}
+        self.deadline = time.monotonic() + Config.CHANGE_FEED_MAX_STREAM_SECONDS
+        self.last_write = time.monotonic()
+
+    def opening(self):
+        frames = [f'retry: {RETRY_MS}\n\n']
+        if self.reset:
+            frames.append(RESET)
+        frames.extend(format_event(row) for row in self.backlog)
+        return frames
+
+    def expired(self):
+        return time.monotonic() >= self.deadline
+
+    def frames(self, rows, position, lost):
+        self.position = position
+        frames = [RESET] if lost else []
+        frames.extend(
+            format_event(row) for row in rows
+            if row.id not in self.replayed and (not self.topics or row.topic in self.topics)
+        )
+        now = time.monotonic()
+        if frames:
+            self.last_write = now
+        elif now - self.last_write >= Config.CHANGE_FEED_HEARTBEAT_SECONDS:
+            self.last_write = now
+            frames.append(HEARTBEAT)
+        return frames
+
+
+def stream_changes(stream, feed=None):
+    feed = feed or change_feed
+    yield from stream.opening()
+    while not stream.expired():
+        yield from stream.frames(*feed.wait(stream.position, Config.CHANGE_FEED_HEARTBEAT_SECONDS))
+
+
+def _pending(session):
+    return session.info.setdefault('change_events', {})
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_flushed_changes(session, flush_context):
+    if not Config.CHANGE_FEED_ENABLED:
+        return
+    for action, objects in (('created', session.new), ('updated', session.dirty), ('deleted', session.deleted)):
+        for obj in objects:
+            topic = getattr(obj, '__tablename__', None)
+            if topic in TOPICS and (action != 'updated' or session.is_modified(obj, include_collections=False)):
+                _pending(session)[topic, action, obj.id] = None
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_executed_changes(orm_execute_state):
+    # Set-based statements bypass the flush; they are published per table.
+    if not Config.CHANGE_FEED_ENABLED:
+        return
+    for kind, action in ACTIONS.items():
+        if getattr(orm_execute_state, f'is_{kind}'):
+            name = getattr(getattr(orm_execute_state.statement, 'table', None), 'name', None)
+            if name in TOPICS:
+                _pending(orm_execute_state.session)[name, action, None] = None
+
+
+@event.listens_for(Session, 'before_commit')
+def _write_changes(session):
+    if not Config.CHANGE_FEED_ENABLED:
+        return
+    # Flush first so the changes the commit itself flushes are recorded too.
+    session.flush()
+    changes = session.info.pop('change_events', None)
+    if changes:
+        now = datetime.utcnow()
+        session.connection().execute(ChangeEvent.__table__.insert(), [
+            {'topic': topic, 'action': action, 'entity_id': entity_id, 'created_at': now}
+            for topic, action, entity_id in changes
+        ])
+        session.info['change_events_written'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_feed(session):
+    if session.info.pop('change_events_written', False):
+        change_feed.notify()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop('change_events', None)
+    session.info.pop('change_events_written', None)
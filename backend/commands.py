@@ -0,0 +1,57 @@
+import click
+from flask.cli import AppGroup
+from models import db
+from counters import rebuild_counters
+from eligibility import recompute_eligibility
+from search import rebuild_search_index
+from rollups import refresh_rollups
+from triage import recompute_priorities
+
+manage = AppGroup('manage', help='Rebuild derived data from the source tables.')
+
+
+def run(message, action):
+    click.echo(message)
+    try:
+        return action()
+    except Exception as e:
+        db.session.rollback()
+        raise click.ClickException(str(e))
+
+
+@manage.command('reconcile-counters')
+def reconcile_counters():
+    """Rebuild the statistics counters."""
+    count = run('Rebuilding statistics counters from source tables...', rebuild_counters)
+    click.echo(f'Counters rebuilt successfully ({count} counters)')
+
+
+@manage.command('recompute-eligibility')
+def recompute_eligibility_command():
+    """Recompute donors.eligible_from after changing the cooldown or age limits."""
+    changed = run('Recomputing donor eligibility...', recompute_eligibility)
+    click.echo(f'Eligibility recomputed ({changed} donor(s) changed)')
+
+
+@manage.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Refill the donor search index from the donors table."""
+    count = run('Rebuilding donor search index...', rebuild_search_index)
+    click.echo(f'Search index rebuilt ({count} donor(s) indexed)')
+
+
+@manage.command('refresh-rollups')
+@click.option('--full', is_flag=True, help='Rebuild every day instead of only the changed ones.')
+def refresh_rollups_command(full):
+    """Bring the daily report rollups up to date."""
+    refreshed = run('Rebuilding daily rollups...' if full else 'Refreshing daily rollups...',
+                    lambda: refresh_rollups(full=full))
+    for source, days in refreshed.items():
+        click.echo(f'  {source}: {days} day(s) recomputed')
+
+
+@manage.command('recompute-priorities')
+def recompute_priorities_command():
+    """Recompute request queue positions for new urgency weights."""
+    changed = run('Recomputing blood request queue priorities...', recompute_priorities)
+    click.echo(f'Queue priorities recomputed ({changed} pending request(s) updated)')
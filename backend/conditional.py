@@ -0,0 +1,60 @@
+import hashlib
+from flask import request, make_response
+
+
+def compute_etag(scope, last_modified, version, query_string):
+    fingerprint = '|'.join([
+        scope,
+        last_modified.isoformat() if last_modified else '',
+        str(version),
+        query_string.decode('utf-8', 'replace'),
+    ])
+    return hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()
+
+
+def page_version(rows, total=None):
+    """``(last_modified, version)`` of a page from its ``(id, updated_at)`` rows.
+
+    The ids catch rows entering or leaving the page, the newest timestamp
+    catches edits to rows on it, and ``total`` is included when the response
+    carries one.
+    """
+    last_modified = max((updated_at for _, updated_at in rows if updated_at), default=None)
+    version = ','.join(str(row_id) for row_id, _ in rows)
+    return last_modified, version if total is None else f'{version};{total}'
+
+
+class ResultValidator:
+    """ETag / Last-Modified for a response, settled before its rows are read.
+
+    ``version`` is whatever changes when the body would: a row count, or
+    the ids on a page (see ``page_version``). With the newest update
+    timestamp and the request's query string it gives the ETag, so an
+    unchanged poll can be answered with 304 before any rows are fetched or
+    encoded.
+    """
+
+    def __init__(self, scope, last_modified, version, query_string=None, count=None):
+        if query_string is None:
+            query_string = request.query_string
+        self.count = count
+        self.last_modified = last_modified
+        self.etag = compute_etag(scope, last_modified, version, query_string)
+
+    def not_modified(self):
+        if request.if_none_match:
+            return request.if_none_match.contains(self.etag)
+        if request.if_modified_since and self.last_modified:
+            return self.last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+        return False
+
+    def apply(self, response):
+        response.set_etag(self.etag)
+        if self.last_modified:
+            response.last_modified = self.last_modified
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    def not_modified_response(self):
+        return self.apply(make_response('', 304))
+
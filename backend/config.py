@@ -1,5 +1,6 @@
 import os
 from dotenv import load_dotenv
+from db_pool import engine_options, async_database_url, async_engine_options
 
 load_dotenv()
 
@@ -12,10 +13,130 @@ class Config:
     DB_PASSWORD = os.getenv('DB_PASSWORD', '')
     DB_NAME = os.getenv('DB_NAME', 'blood_donation_db')
 
-    SQLALCHEMY_DATABASE_URI = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    SQLALCHEMY_DATABASE_URI = os.getenv(
+        'DATABASE_URL',
+        f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 10))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+    DB_HEALTH_TIMEOUT = float(os.getenv('DB_HEALTH_TIMEOUT', 2))
+
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(
+        SQLALCHEMY_DATABASE_URI, DB_POOL_SIZE, DB_MAX_OVERFLOW,
+        DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING
+    )
+
+    # ASGI serving mode (asgi.py): read endpoints on an async engine.
+    ASYNC_DATABASE_URL = os.getenv('ASYNC_DATABASE_URL', async_database_url(SQLALCHEMY_DATABASE_URI))
+    ASYNC_DB_POOL_SIZE = int(os.getenv('ASYNC_DB_POOL_SIZE', 10))
+    ASYNC_DB_MAX_OVERFLOW = int(os.getenv('ASYNC_DB_MAX_OVERFLOW', 20))
+
+    ASYNC_ENGINE_OPTIONS = async_engine_options(
+        ASYNC_DATABASE_URL, ASYNC_DB_POOL_SIZE, ASYNC_DB_MAX_OVERFLOW,
+        DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING
+    )
+
+    ASGI_HOST = os.getenv('ASGI_HOST', '0.0.0.0')
+    ASGI_PORT = int(os.getenv('ASGI_PORT', 8000))
+    ASGI_WORKERS = int(os.getenv('ASGI_WORKERS', os.cpu_count() or 1))
+    ASGI_LIMIT_CONCURRENCY = int(os.getenv('ASGI_LIMIT_CONCURRENCY', 500))
+    ASGI_WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', 16))
+
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production')
     JWT_ACCESS_TOKEN_EXPIRES = int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES', 3600))
+    TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+    BCRYPT_WORKERS = int(os.getenv('BCRYPT_WORKERS', os.cpu_count() or 1))
+    BCRYPT_QUEUE_SIZE = int(os.getenv('BCRYPT_QUEUE_SIZE', 32))
+    BCRYPT_RETRY_AFTER = int(os.getenv('BCRYPT_RETRY_AFTER', 2))
+
+    PAGE_SIZE_DEFAULT = int(os.getenv('PAGE_SIZE_DEFAULT', 50))
+    PAGE_SIZE_MAX = int(os.getenv('PAGE_SIZE_MAX', 500))
+
+    BULK_CHUNK_SIZE = int(os.getenv('BULK_CHUNK_SIZE', 1000))
+    MODERATION_MAX_IDS = int(os.getenv('MODERATION_MAX_IDS', 10000))
+
+    SEARCH_MIN_TERM_LENGTH = int(os.getenv('SEARCH_MIN_TERM_LENGTH', 2))
+    SEARCH_MAX_TERMS = int(os.getenv('SEARCH_MAX_TERMS', 5))
+    SEARCH_MAX_CANDIDATES = int(os.getenv('SEARCH_MAX_CANDIDATES', 5000))
+
+    DONATION_COOLDOWN_DAYS = int(os.getenv('DONATION_COOLDOWN_DAYS', 56))
+    DONOR_MIN_AGE = int(os.getenv('DONOR_MIN_AGE', 18))
+    DONOR_MAX_AGE = int(os.getenv('DONOR_MAX_AGE', 65))
+    MATCH_INDEX_TTL = int(os.getenv('MATCH_INDEX_TTL', 300))
+
+    GAZETTEER_PATH = os.getenv('GAZETTEER_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'cities.csv'))
+    GAZETTEER_FUZZY_CUTOFF = float(os.getenv('GAZETTEER_FUZZY_CUTOFF', 0.85))
+    GEOHASH_PRECISION = int(os.getenv('GEOHASH_PRECISION', 9))
+    GEO_MAX_CELLS = int(os.getenv('GEO_MAX_CELLS', 32))
+    GEO_DEFAULT_RADIUS_KM = float(os.getenv('GEO_DEFAULT_RADIUS_KM', 25))
+    GEO_MAX_RADIUS_KM = float(os.getenv('GEO_MAX_RADIUS_KM', 200))
+
+    # Hours of waiting a request's urgency or its group's low stock is worth
+    # in the triage queue; urgencies not listed count as zero.
+    QUEUE_URGENCY_HOURS = {
+        'critical': float(os.getenv('QUEUE_CRITICAL_HOURS', 48)),
+        'urgent': float(os.getenv('QUEUE_URGENT_HOURS', 12)),
+    }
+    QUEUE_SCARCITY_HOURS = float(os.getenv('QUEUE_SCARCITY_HOURS', 24))
+    QUEUE_LOW_STOCK_UNITS = int(os.getenv('QUEUE_LOW_STOCK_UNITS', 10))
+    QUEUE_CLAIM_SECONDS = int(os.getenv('QUEUE_CLAIM_SECONDS', 900))
+    QUEUE_CLAIM_MAX = int(os.getenv('QUEUE_CLAIM_MAX', 50))
+
+    ROLLUP_REFRESH_INTERVAL = int(os.getenv('ROLLUP_REFRESH_INTERVAL', 60))
+    ROLLUP_LAG_SECONDS = int(os.getenv('ROLLUP_LAG_SECONDS', 300))
+    REPORT_MAX_DAYS = int(os.getenv('REPORT_MAX_DAYS', 3660))
+
+    CACHE_ENABLED = os.getenv('CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory')
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_TTL = int(os.getenv('CACHE_TTL', 60))
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 256))
+
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+    SERVER_TIMING_ENABLED = os.getenv('SERVER_TIMING_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 500))
+
+    CHANGE_FEED_ENABLED = os.getenv('CHANGE_FEED_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    CHANGE_FEED_POLL_INTERVAL = float(os.getenv('CHANGE_FEED_POLL_INTERVAL', 0.5))
+    CHANGE_FEED_BUFFER_SIZE = int(os.getenv('CHANGE_FEED_BUFFER_SIZE', 1000))
+    CHANGE_FEED_BACKLOG_MAX = int(os.getenv('CHANGE_FEED_BACKLOG_MAX', 1000))
+    CHANGE_FEED_RETENTION_HOURS = float(os.getenv('CHANGE_FEED_RETENTION_HOURS', 24))
+    CHANGE_FEED_HEARTBEAT_SECONDS = float(os.getenv('CHANGE_FEED_HEARTBEAT_SECONDS', 15))
+    CHANGE_FEED_MAX_STREAM_SECONDS = float(os.getenv('CHANGE_FEED_MAX_STREAM_SECONDS', 600))
+    CHANGE_FEED_SYNC_STREAMS = int(os.getenv('CHANGE_FEED_SYNC_STREAMS', 4))
+    CHANGE_FEED_TICKET_SECONDS = int(os.getenv('CHANGE_FEED_TICKET_SECONDS', 60))
+
+    NOTIFY_ENABLED = os.getenv('NOTIFY_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    NOTIFY_CHANNELS = [c.strip() for c in os.getenv('NOTIFY_CHANNELS', 'email,sms').split(',') if c.strip()]
+    NOTIFY_SENDER = os.getenv('NOTIFY_SENDER', 'console')
+    NOTIFY_FILE_PATH = os.getenv('NOTIFY_FILE_PATH', 'notifications.log')
+    NOTIFY_MAX_DONORS = int(os.getenv('NOTIFY_MAX_DONORS', 20))
+    NOTIFY_WORKER_IN_PROCESS = os.getenv('NOTIFY_WORKER_IN_PROCESS', 'false').lower() in ('1', 'true', 'yes')
+    NOTIFY_BATCH_SIZE = int(os.getenv('NOTIFY_BATCH_SIZE', 100))
+    NOTIFY_POLL_INTERVAL = float(os.getenv('NOTIFY_POLL_INTERVAL', 2))
+    NOTIFY_LEASE_SECONDS = int(os.getenv('NOTIFY_LEASE_SECONDS', 60))
+    NOTIFY_MAX_ATTEMPTS = int(os.getenv('NOTIFY_MAX_ATTEMPTS', 6))
+    NOTIFY_BACKOFF_SECONDS = float(os.getenv('NOTIFY_BACKOFF_SECONDS', 30))
+    NOTIFY_BACKOFF_MAX_SECONDS = float(os.getenv('NOTIFY_BACKOFF_MAX_SECONDS', 3600))
+    NOTIFY_RETENTION_DAYS = int(os.getenv('NOTIFY_RETENTION_DAYS', 30))
+
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+    RATE_LIMIT_REDIS_URL = os.getenv('RATE_LIMIT_REDIS_URL', CACHE_REDIS_URL)
+    RATE_LIMIT_LOGIN_IP = os.getenv('RATE_LIMIT_LOGIN_IP', '20/60')
+    RATE_LIMIT_LOGIN_EMAIL = os.getenv('RATE_LIMIT_LOGIN_EMAIL', '5/300')
+    RATE_LIMIT_REGISTER_IP = os.getenv('RATE_LIMIT_REGISTER_IP', '10/3600')
+    RATE_LIMIT_REGISTER_EMAIL = os.getenv('RATE_LIMIT_REGISTER_EMAIL', '3/3600')
+    RATE_LIMIT_TRUSTED_PROXIES = int(os.getenv('RATE_LIMIT_TRUSTED_PROXIES', 0))
+    RATE_LIMIT_MAX_KEYS = int(os.getenv('RATE_LIMIT_MAX_KEYS', 100000))
+    RATE_LIMIT_SWEEP_SECONDS = float(os.getenv('RATE_LIMIT_SWEEP_SECONDS', 60))
 
     CORS_ORIGINS = ["http://localhost:5173", "http://localhost:3000", "http://127.0.0.1:5173"]
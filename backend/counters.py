@@ -0,0 +1,243 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+from models import db, Donor, BloodRequest, Donation, StatCounter
+
+RECENT_DAYS = 30
+
+BLOOD_GROUPS = ['A+', 'A-', 'B+', 'B-', 'O+', 'O-', 'AB+', 'AB-']
+
+
+def day_key(prefix, value):
+    return f'{prefix}:{(value or datetime.utcnow()).strftime("%Y-%m-%d")}'
+
+
+def recent_day_keys(prefix, days=RECENT_DAYS, now=None):
+    now = now or datetime.utcnow()
+    return [day_key(prefix, now - timedelta(days=i)) for i in range(days + 1)]
+
+
+def _old_value(obj, attr):
+    history = inspect(obj).attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(obj, attr)
+
+
+def _donor_keys(status, blood_group):
+    keys = ['donors_total', f'donors_status:{status}']
+    if status == 'approved':
+        keys.append(f'donors_approved_group:{blood_group}')
+    return keys
+
+
+def _request_keys(status):
+    return ['requests_total', f'requests_status:{status}']
+
+
+def collect_deltas(session):
+    deltas = Counter()
+
+    for obj in session.new:
+        if isinstance(obj, Donor):
+            for key in _donor_keys(obj.status, obj.blood_group):
+                deltas[key] += 1
+            deltas[day_key('donors_created', obj.created_at)] += 1
+        elif isinstance(obj, BloodRequest):
+            for key in _request_keys(obj.status):
+                deltas[key] += 1
+            deltas[day_key('requests_created', obj.created_at)] += 1
+        elif isinstance(obj, Donation):
+            deltas['donations_total'] += 1
+            deltas[day_key('donations_created', obj.created_at)] += 1
+
+    for obj in session.dirty:
+        if isinstance(obj, Donor):
+            state = inspect(obj)
+            if state.attrs.status.history.has_changes() or state.attrs.blood_group.history.has_changes():
+                for key in _donor_keys(_old_value(obj, 'status'), _old_value(obj, 'blood_group')):
+                    deltas[key] -= 1
+                for key in _donor_keys(obj.status, obj.blood_group):
+                    deltas[key] += 1
+        elif isinstance(obj, BloodRequest):
+            if inspect(obj).attrs.status.history.has_changes():
+                for key in _request_keys(_old_value(obj, 'status')):
+                    deltas[key] -= 1
+                for key in _request_keys(obj.status):
+                    deltas[key] += 1
+
+    for obj in session.deleted:
+        if isinstance(obj, Donor):
+            for key in _donor_keys(_old_value(obj, 'status'), _old_value(obj, 'blood_group')):
+                deltas[key] -= 1
+            deltas[day_key('donors_created', obj.created_at)] -= 1
+        elif isinstance(obj, BloodRequest):
+            for key in _request_keys(_old_value(obj, 'status')):
+                deltas[key] -= 1
+            deltas[day_key('requests_created', obj.created_at)] -= 1
+        elif isinstance(obj, Donation):
+            deltas['donations_total'] -= 1
+            deltas[day_key('donations_created', obj.created_at)] -= 1
+
+    return {key: delta for key, delta in deltas.items() if delta}
+
+
+def _upsert_statement(dialect_name, key, delta):
+    table = StatCounter.__table__
+    if dialect_name == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table).values(name=key, value=delta)
+        return stmt.on_duplicate_key_update(value=table.c.value + stmt.inserted.value)
+    if dialect_name in ('sqlite', 'postgresql'):
+        if dialect_name == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table).values(name=key, value=delta)
+        return stmt.on_conflict_do_update(
+            index_elements=[table.c.name],
+            set_={'value': table.c.value + stmt.excluded.value}
+        )
+    return None
+
+
+def apply_deltas(connection, deltas):
+    table = StatCounter.__table__
+    # Sorted keys give every transaction the same lock order on counter rows.
+    for key in sorted(deltas):
+        stmt = _upsert_statement(connection.dialect.name, key, deltas[key])
+        if stmt is not None:
+            connection.execute(stmt)
+            continue
+        result = connection.execute(
+            table.update().where(table.c.name == key).values(value=table.c.value + deltas[key])
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(name=key, value=deltas[key]))
+
+
+def record_status_change(connection, prefix, old_status, new_status, count=1):
+    # For set-based UPDATEs that bypass the ORM flush hook.
+    if old_status != new_status and count:
+        apply_deltas(connection, {
+            f'{prefix}:{old_status}': -count,
+            f'{prefix}:{new_status}': count
+        })
+
+
+def record_donor_status_changes(connection, changes, new_status):
+    """Counter deltas for a set-based donor status UPDATE.
+
+    ``changes`` counts the updated rows by their ``(old_status, blood_group)``.
+    """
+    deltas = Counter()
+    for (old_status, blood_group), count in changes.items():
+        for key in _donor_keys(old_status, blood_group):
+            deltas[key] -= count
+        for key in _donor_keys(new_status, blood_group):
+            deltas[key] += count
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if deltas:
+        apply_deltas(connection, deltas)
+
+
+@event.listens_for(Session, 'after_flush')
+def _update_counters(session, flush_context):
+    deltas = collect_deltas(session)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+def counters_statement(names):
+    return select(StatCounter.name, StatCounter.value).where(StatCounter.name.in_(names))
+
+
+def counter_values(names, rows):
+    values = {name: 0 for name in names}
+    values.update({name: value for name, value in rows})
+    return values
+
+
+def read_counters(names):
+    return counter_values(names, db.session.execute(counters_statement(names)).all())
+
+
+def blood_group_distribution(values):
+    prefix = 'donors_approved_group:'
+    return {
+        name[len(prefix):]: value for name, value in values.items()
+        if name.startswith(prefix) and value
+    }
+
+
+def group_keys():
+    return [f'donors_approved_group:{group}' for group in BLOOD_GROUPS]
+
+
+def donor_stats_keys():
+    return ['donors_total', 'donors_status:approved', 'donors_status:pending'] + group_keys()
+
+
+def donor_stats(counters):
+    return {
+        'total_donors': counters['donors_total'],
+        'approved_donors': counters['donors_status:approved'],
+        'pending_donors': counters['donors_status:pending'],
+        'blood_group_distribution': blood_group_distribution(counters)
+    }
+
+
+def dashboard_stats_keys(now=None):
+    return [
+        'donors_total', 'requests_total', 'requests_status:approved',
+        'requests_status:pending', 'donations_total'
+    ] + recent_day_keys('donors_created', now=now) + recent_day_keys('requests_created', now=now) + group_keys()
+
+
+def dashboard_stats(counters, now=None):
+    return {
+        'total_donors': counters['donors_total'],
+        'total_requests': counters['requests_total'],
+        'approved_requests': counters['requests_status:approved'],
+        'pending_requests': counters['requests_status:pending'],
+        'total_donations': counters['donations_total'],
+        'recent_donors': sum(counters[key] for key in recent_day_keys('donors_created', now=now)),
+        'recent_requests': sum(counters[key] for key in recent_day_keys('requests_created', now=now)),
+        'blood_group_distribution': blood_group_distribution(counters)
+    }
+
+
+def rebuild_counters():
+    """Recompute every counter from the source tables, replacing what is stored."""
+    deltas = Counter()
+
+    for status, blood_group, count in db.session.query(
+        Donor.status, Donor.blood_group, db.func.count(Donor.id)
+    ).group_by(Donor.status, Donor.blood_group):
+        for key in _donor_keys(status, blood_group):
+            deltas[key] += count
+
+    for status, count in db.session.query(
+        BloodRequest.status, db.func.count(BloodRequest.id)
+    ).group_by(BloodRequest.status):
+        for key in _request_keys(status):
+            deltas[key] += count
+
+    deltas['donations_total'] = Donation.query.count()
+
+    for prefix, model in (('donors_created', Donor),
+                          ('requests_created', BloodRequest),
+                          ('donations_created', Donation)):
+        day = db.func.date(model.created_at)
+        for value, count in db.session.query(day, db.func.count(model.id)).group_by(day):
+            if value is not None:
+                if isinstance(value, str):
+                    value = datetime.strptime(value, '%Y-%m-%d')
+                deltas[day_key(prefix, value)] += count
+
+    db.session.query(StatCounter).delete(synchronize_session=False)
+    db.session.flush()
+    apply_deltas(db.session.connection(), {k: v for k, v in deltas.items() if v})
+    db.session.commit()
+    return len(deltas)
@@ -0,0 +1,140 @@
+import threading
+import time
+from sqlalchemy.pool import QueuePool
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.failed_checkouts = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            with self._stats_lock:
+                self.failed_checkouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+
+def engine_options(database_uri, pool_size, max_overflow, pool_timeout, pool_recycle, pre_ping):
+    if database_uri.startswith('sqlite'):
+        return {'pool_pre_ping': pre_ping}
+    return {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': pool_timeout,
+        'pool_recycle': pool_recycle,
+        'pool_pre_ping': pre_ping,
+    }
+
+
+# Sync driver -> asyncio driver for the ASGI read path.
+ASYNC_DRIVERS = {
+    'mysql+pymysql': 'mysql+aiomysql',
+    'mysql': 'mysql+aiomysql',
+    'sqlite': 'sqlite+aiosqlite',
+    'sqlite+pysqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'postgresql+psycopg2': 'postgresql+asyncpg',
+}
+
+
+def async_database_url(database_uri):
+    scheme, sep, rest = database_uri.partition('://')
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+def async_engine_options(database_uri, pool_size, max_overflow, pool_timeout, pool_recycle, pre_ping):
+    options = {'pool_pre_ping': pre_ping}
+    # In-memory SQLite uses a single static connection; file databases get a
+    # real pool so overflow connections (one thread each with aiosqlite)
+    # are not opened and closed on every burst.
+    if not (database_uri.startswith('sqlite') and (':memory:' in database_uri or database_uri.endswith('://'))):
+        options.update({
+            'pool_size': pool_size,
+            'max_overflow': max_overflow,
+            'pool_timeout': pool_timeout,
+            'pool_recycle': pool_recycle,
+        })
+    return options
+
+
+def pool_stats(engine):
+    pool = engine.pool
+    stats = {'class': type(pool).__name__}
+
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        method = getattr(pool, name, None)
+        if callable(method):
+            stats[name] = method()
+
+    if isinstance(pool, InstrumentedQueuePool):
+        with pool._stats_lock:
+            stats.update({
+                'checkouts': pool.checkouts,
+                'failed_checkouts': pool.failed_checkouts,
+                'wait_avg_ms': round(pool.wait_total / pool.checkouts * 1000, 3) if pool.checkouts else 0.0,
+                'wait_max_ms': round(pool.wait_max * 1000, 3),
+            })
+    return stats
+
+
+def ping_timeouts(dialect_name, timeout):
+    """Driver arguments that make connecting and reading give up after ``timeout`` seconds."""
+    if dialect_name == 'mysql':
+        return {'connect_timeout': timeout, 'read_timeout': timeout, 'write_timeout': timeout}
+    if dialect_name == 'postgresql':
+        return {'connect_timeout': max(1, round(timeout)), 'options': f'-c statement_timeout={int(timeout * 1000)}'}
+    if dialect_name == 'sqlite':
+        return {'timeout': timeout}
+    return {}
+
+
+def ping_database(engine, timeout):
+    """Run ``SELECT 1`` on a fresh connection, giving up after ``timeout`` seconds.
+
+    The connection is opened outside the pool with the driver's own connect
+    and read timeouts, so a database that stops answering fails the call
+    instead of leaving a thread or a pooled connection stuck behind it.
+    """
+    cargs, cparams = engine.dialect.create_connect_args(engine.url)
+    cparams.update(ping_timeouts(engine.dialect.name, timeout))
+    started = time.perf_counter()
+    connection = None
+    try:
+        connection = engine.dialect.connect(*cargs, **cparams)
+        connected = time.perf_counter()
+        cursor = connection.cursor()
+        cursor.execute('SELECT 1')
+        cursor.fetchall()
+        cursor.close()
+        finished = time.perf_counter()
+    except Exception as e:
+        if time.perf_counter() - started >= timeout:
+            return 'timeout', {'error': f'No response within {timeout}s'}
+        return 'unavailable', {'error': str(e)}
+    finally:
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+    return 'connected', {
+        'connect_ms': round((connected - started) * 1000, 3),
+        'ping_ms': round((finished - connected) * 1000, 3),
+    }
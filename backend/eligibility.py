@@ -0,0 +1,92 @@
+from datetime import date, datetime, timedelta
+from sqlalchemy import Boolean, Date, and_, case, event, func, literal, true
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.functions import FunctionElement
+from config import Config
+from models import db, Donor, ALWAYS_ELIGIBLE
+
+
+class date_add_days(FunctionElement):
+    """``date + days`` for a DATE expression, compiled per dialect."""
+    type = Date()
+    name = 'date_add_days'
+    inherit_cache = True
+
+
+@compiles(date_add_days)
+def _date_add_days(element, compiler, **kw):
+    day, days = element.clauses
+    return f'({compiler.process(day, **kw)} + {compiler.process(days, **kw)})'
+
+
+@compiles(date_add_days, 'mysql')
+def _date_add_days_mysql(element, compiler, **kw):
+    day, days = element.clauses
+    return f'DATE_ADD({compiler.process(day, **kw)}, INTERVAL {compiler.process(days, **kw)} DAY)'
+
+
+@compiles(date_add_days, 'sqlite')
+def _date_add_days_sqlite(element, compiler, **kw):
+    day, days = element.clauses
+    return f"date({compiler.process(day, **kw)}, '+' || {compiler.process(days, **kw)} || ' days')"
+
+
+def eligible_from_for(status, is_eligible, age, last_donation_date):
+    """First date a donor may give blood, or None if they cannot donate at all."""
+    if status != 'approved' or is_eligible is False:
+        return None
+    if age is None or not Config.DONOR_MIN_AGE <= age <= Config.DONOR_MAX_AGE:
+        return None
+    if last_donation_date is None:
+        return ALWAYS_ELIGIBLE
+    return last_donation_date + timedelta(days=Config.DONATION_COOLDOWN_DAYS)
+
+
+def eligible_from_expression(donors, last_donation_date=None, status=None):
+    """SQL ``eligible_from_for``; the arguments override the columns an UPDATE also sets."""
+    last_donation_date = donors.c.last_donation_date if last_donation_date is None else last_donation_date
+    status = donors.c.status if status is None else literal(status)
+    can_donate = and_(
+        status == 'approved',
+        func.coalesce(donors.c.is_eligible, true()) == true(),
+        donors.c.age.between(Config.DONOR_MIN_AGE, Config.DONOR_MAX_AGE),
+    )
+    return case(
+        (~can_donate, None),
+        (last_donation_date.is_(None), literal(ALWAYS_ELIGIBLE, Date())),
+        else_=date_add_days(last_donation_date, Config.DONATION_COOLDOWN_DAYS),
+    )
+
+
+def eligible_now(today=None):
+    """Condition for donors who can donate on ``today``; an index range scan."""
+    return Donor.eligible_from <= (today or date.today())
+
+
+def _differs(column, expression):
+    # NULL-safe inequality, so rows that are already correct are not rewritten.
+    return ~func.coalesce(column == expression, and_(column.is_(None), expression.is_(None)), type_=Boolean)
+
+
+def recompute_eligibility():
+    """Recompute ``eligible_from`` for every donor in one UPDATE; returns the rows changed."""
+    donors = Donor.__table__
+    expression = eligible_from_expression(donors)
+    result = db.session.execute(
+        donors.update()
+        .where(_differs(donors.c.eligible_from, expression))
+        .values(eligible_from=expression, updated_at=datetime.utcnow()),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+@event.listens_for(Session, 'before_flush')
+def _stamp_eligible_from(session, flush_context, instances):
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Donor):
+            value = eligible_from_for(obj.status, obj.is_eligible, obj.age, obj.last_donation_date)
+            if obj.eligible_from != value:
+                obj.eligible_from = value
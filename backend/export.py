@@ -0,0 +1,66 @@
+import csv
+import io
+from datetime import date
+from flask import request
+from sqlalchemy import select
+from models import db, Donor, BloodRequest, Donation
+from filters import filter_conditions, DONOR_FILTERS, REQUEST_FILTERS, DONATION_FILTERS
+from serializers import DONOR_COLUMNS, REQUEST_COLUMNS, DONATION_COLUMNS, dumps
+
+EXPORT_BATCH_SIZE = 1000
+
+DATASETS = {
+    'donors': (Donor, DONOR_COLUMNS, DONOR_FILTERS),
+    'requests': (BloodRequest, REQUEST_COLUMNS, REQUEST_FILTERS),
+    'donations': (Donation, DONATION_COLUMNS, DONATION_FILTERS),
+}
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def export_statement(model, columns, fields):
+    # Explicit conditions: filter_by() cannot pick an entity for projections
+    # that mix ORM attributes with labelled expressions.
+    stmt = select(*columns).where(*filter_conditions(model, fields, request.args))
+    return stmt.order_by(model.id).execution_options(
+        yield_per=EXPORT_BATCH_SIZE,
+        stream_results=True
+    )
+
+
+def _batches(stmt):
+    result = db.session.execute(stmt)
+    for partition in result.partitions():
+        yield [row._asdict() for row in partition]
+
+
+def stream_ndjson(stmt):
+    for batch in _batches(stmt):
+        yield ''.join(dumps(row, sort_keys=False) + '\n' for row in batch)
+
+
+def _csv_value(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def stream_csv(stmt, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.key for column in columns])
+    for batch in _batches(stmt):
+        writer.writerows([_csv_value(value) for value in row.values()] for row in batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_export(model, columns, fields, fmt):
+    stmt = export_statement(model, columns, fields)
+    if fmt == 'csv':
+        return stream_csv(stmt, columns)
+    return stream_ndjson(stmt)
@@ -0,0 +1,8 @@
+DONOR_FILTERS = ['status', 'blood_group', 'city']
+REQUEST_FILTERS = ['status', 'blood_group']
+DONATION_FILTERS = ['donor_id', 'status', 'location']
+
+
+def filter_conditions(model, fields, args):
+    """Exact-match filters from the query string ``args`` as a list of SQL conditions."""
+    return [getattr(model, field) == args[field] for field in fields if args.get(field)]
@@ -0,0 +1,238 @@
+import csv
+import difflib
+import math
+import threading
+from functools import lru_cache
+from sqlalchemy import event, inspect, select, union_all
+from sqlalchemy.orm import Session
+from config import Config
+from eligibility import eligible_now
+from models import db, Donor, BloodRequest
+from search import normalize, prefix_range
+from serializers import DONOR_COLUMNS
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.2
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+class GeoError(ValueError):
+    pass
+
+
+def encode_geohash(latitude, longitude, precision=None):
+    precision = precision or Config.GEOHASH_PRECISION
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = value = 0
+    return ''.join(chars)
+
+
+def decode_geohash(cell):
+    """Centre (latitude, longitude) of a geohash cell."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in cell:
+        value = _BASE32.index(char)
+        for shift in range(4, -1, -1):
+            interval = lon_range if even else lat_range
+            middle = (interval[0] + interval[1]) / 2
+            if value >> shift & 1:
+                interval[0] = middle
+            else:
+                interval[1] = middle
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lon_range[0] + lon_range[1]) / 2
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """Great-circle (haversine) distance."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """Geohash prefixes whose cells together cover the circle.
+
+    Picks the finest precision at which the circle's bounding box spans no
+    more than ``GEO_MAX_CELLS`` cells, so a search is a handful of index
+    ranges. Boxes crossing the antimeridian are clipped to it.
+    """
+    dlat = radius_km / KM_PER_DEGREE
+    dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+    south, north = max(latitude - dlat, -90.0), min(latitude + dlat, 90.0)
+    west, east = max(longitude - dlon, -180.0), min(longitude + dlon, 180.0)
+
+    for precision in range(Config.GEOHASH_PRECISION, 0, -1):
+        lat_bits = 5 * precision // 2
+        lat_step = 180.0 / 2 ** lat_bits
+        lon_step = 360.0 / 2 ** (5 * precision - lat_bits)
+        rows = range(int((south + 90) / lat_step), int(min(north + 90, 179.999999) / lat_step) + 1)
+        cols = range(int((west + 180) / lon_step), int(min(east + 180, 359.999999) / lon_step) + 1)
+        if len(rows) * len(cols) <= Config.GEO_MAX_CELLS or precision == 1:
+            return sorted({
+                encode_geohash(-90 + (row + 0.5) * lat_step, -180 + (col + 0.5) * lon_step, precision)
+                for row in rows for col in cols
+            })
+
+
+def _place_key(name):
+    words = normalize(name)
+    if words and words[0] == 'saint':
+        words[0] = 'st'
+    return ' '.join(words)
+
+
+class Gazetteer:
+    """Offline city name -> coordinates lookup from a bundled CSV.
+
+    Names are matched case- and accent-insensitively, optionally qualified
+    by region ("Portland, ME"); unqualified duplicates resolve to the first
+    row. Unknown names fall back to the closest spelling above
+    ``GAZETTEER_FUZZY_CUTOFF``.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._places = None
+
+    def places(self):
+        if self._places is None:
+            with self._lock:
+                if self._places is None:
+                    places = {}
+                    with open(self.path, newline='', encoding='utf-8') as f:
+                        for row in csv.DictReader(f):
+                            point = (float(row['latitude']), float(row['longitude']))
+                            name = _place_key(row['name'])
+                            places.setdefault(name, point)
+                            places.setdefault(f"{name} {_place_key(row['region'])}", point)
+                    self._places = places
+        return self._places
+
+    def resolve(self, name):
+        return self._resolve(_place_key(name))
+
+    @lru_cache(maxsize=4096)
+    def _resolve(self, key):
+        if not key:
+            return None
+        places = self.places()
+        if key in places:
+            return places[key]
+        close = difflib.get_close_matches(key, places, n=1, cutoff=Config.GAZETTEER_FUZZY_CUTOFF)
+        return places[close[0]] if close else None
+
+
+gazetteer = Gazetteer(Config.GAZETTEER_PATH)
+
+
+def parse_coordinates(data, latitude_key='latitude', longitude_key='longitude'):
+    """Optional (latitude, longitude) from a request mapping; both or neither."""
+    latitude, longitude = data.get(latitude_key), data.get(longitude_key)
+    if latitude in (None, '') and longitude in (None, ''):
+        return None
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        raise GeoError(f'{latitude_key} and {longitude_key} must both be numbers')
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise GeoError(f'{latitude_key}/{longitude_key} out of range')
+    return latitude, longitude
+
+
+def parse_radius(args):
+    try:
+        radius = float(args.get('radius_km') or Config.GEO_DEFAULT_RADIUS_KM)
+    except ValueError:
+        raise GeoError('radius_km must be a number')
+    if not 0 < radius <= Config.GEO_MAX_RADIUS_KM:
+        raise GeoError(f'radius_km must be between 0 and {Config.GEO_MAX_RADIUS_KM:g}')
+    return radius
+
+
+def _candidates_within(latitude, longitude, radius_km, groups, today):
+    # One SELECT per cell so every branch is an index range; SQLite will not
+    # use the index for an OR of ranges. (status, blood_group, geohash,
+    # eligible_from) covers the query, and the stored geohash locates each
+    # donor to a few metres without reading the row.
+    rows = db.session.execute(union_all(*(
+        select(Donor.id, Donor.geohash).where(
+            Donor.status == 'approved',
+            Donor.blood_group.in_(groups),
+            prefix_range(Donor.geohash, cell),
+            eligible_now(today),
+        )
+        for cell in covering_cells(latitude, longitude, radius_km)
+    ))).all()
+
+    found = []
+    for donor_id, cell in rows:
+        distance = distance_km(latitude, longitude, *decode_geohash(cell))
+        if distance <= radius_km:
+            found.append((distance, donor_id))
+    return found
+
+
+def nearby_donors(latitude, longitude, radius_km, groups, limit, today=None):
+    """Donors of ``groups`` who can donate today within ``radius_km``, nearest first.
+
+    Returns ``(rows, distances)``. The search starts at an eighth of the
+    radius and doubles until it has ``limit`` donors, so dense areas read
+    only the nearest few cells; each pass is an index range per covering
+    geohash cell. Full rows are loaded for the final page only.
+    """
+    search_km = min(radius_km, max(radius_km / 8, 1.0))
+    while True:
+        found = _candidates_within(latitude, longitude, search_km, groups, today)
+        if len(found) >= limit or search_km >= radius_km:
+            break
+        search_km = min(search_km * 2, radius_km)
+
+    ids = [donor_id for _, donor_id in sorted(found)[:limit]]
+    if not ids:
+        return [], []
+    rows = db.session.execute(select(*DONOR_COLUMNS).where(Donor.id.in_(ids))).all()
+
+    located = sorted(
+        (distance_km(latitude, longitude, row.latitude, row.longitude), row.id, row) for row in rows
+    )
+    return [row for _, _, row in located], [distance for distance, _, _ in located]
+
+
+@event.listens_for(Session, 'before_flush')
+def _locate(session, flush_context, instances):
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, (Donor, BloodRequest)):
+            continue
+
+        state = inspect(obj)
+        placed = state.attrs.latitude.history.has_changes() or state.attrs.longitude.history.has_changes()
+        if not placed and (obj.latitude is None or state.attrs.city.history.has_changes()):
+            # No explicit coordinates: fall back to the city's.
+            obj.latitude, obj.longitude = gazetteer.resolve(obj.city) or (None, None)
+
+        if isinstance(obj, Donor):
+            located = obj.latitude is not None and obj.longitude is not None
+            cell = encode_geohash(obj.latitude, obj.longitude) if located else None
+            if obj.geohash != cell:
+                obj.geohash = cell
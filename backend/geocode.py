@@ -0,0 +1,44 @@
+from app import create_app
+from geo import gazetteer, encode_geohash
+from models import db, Donor, BloodRequest
+from sqlalchemy import select
+from datetime import datetime
+import sys
+
+def geocode():
+    app = create_app()
+
+    with app.app_context():
+        try:
+            print("Geocoding donors and blood requests from the city gazetteer...")
+            for model in (Donor, BloodRequest):
+                table = model.__table__
+                cities = db.session.execute(
+                    select(table.c.city).where(table.c.latitude.is_(None)).distinct()
+                ).scalars().all()
+
+                located = unknown = 0
+                for city in cities:
+                    point = gazetteer.resolve(city)
+                    if point is None:
+                        unknown += 1
+                        continue
+                    values = {'latitude': point[0], 'longitude': point[1], 'updated_at': datetime.utcnow()}
+                    if model is Donor:
+                        values['geohash'] = encode_geohash(*point)
+                    result = db.session.execute(
+                        table.update()
+                        .where(table.c.city == city, table.c.latitude.is_(None))
+                        .values(**values)
+                    )
+                    db.session.commit()
+                    located += result.rowcount
+
+                print(f"  {table.name}: {located} row(s) located, {unknown} unknown city name(s)")
+        except Exception as e:
+            print(f"\nError geocoding: {e}")
+            db.session.rollback()
+            sys.exit(1)
+
+if __name__ == '__main__':
+    geocode()
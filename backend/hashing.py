@@ -0,0 +1,80 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import bcrypt
+from config import Config
+
+
+class HashingBusy(Exception):
+    pass
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+
+def _verify(password, password_hash):
+    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+
+
+class HashingPool:
+    """Runs bcrypt in a dedicated process pool with a bounded backlog.
+
+    At most ``BCRYPT_QUEUE_SIZE`` jobs may be queued or running at once;
+    further submissions raise ``HashingBusy`` immediately instead of tying up
+    the request thread. With ``BCRYPT_WORKERS = 0`` bcrypt runs inline.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._slots = None
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=Config.BCRYPT_WORKERS)
+                self._slots = threading.BoundedSemaphore(Config.BCRYPT_QUEUE_SIZE)
+
+    def run(self, fn, *args):
+        if Config.BCRYPT_WORKERS <= 0:
+            return fn(*args)
+
+        self._ensure_started()
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy('Password hashing queue is full')
+
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+hashing_pool = HashingPool()
+
+
+def hash_password(password):
+    return hashing_pool.run(_hash, password, Config.BCRYPT_ROUNDS)
+
+
+def verify_password(password, password_hash):
+    return hashing_pool.run(_verify, password, password_hash)
+
+
+def hash_rounds(password_hash):
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def needs_rehash(password_hash):
+    return hash_rounds(password_hash) != Config.BCRYPT_ROUNDS
@@ -0,0 +1,165 @@
+import csv
+import io
+import json
+from datetime import datetime
+from itertools import islice
+from sqlalchemy import select, func, case
+from config import Config
+from models import db, Donor, Donation
+from counters import apply_deltas, day_key
+from eligibility import eligible_from_expression
+from matching import record_index_changes
+
+
+class IngestError(ValueError):
+    pass
+
+
+def iter_rows(stream, content_type):
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    if 'csv' in content_type:
+        for number, row in enumerate(csv.DictReader(text), start=1):
+            yield number, row
+    elif 'ndjson' in content_type or 'jsonl' in content_type or 'json-seq' in content_type:
+        for number, line in enumerate(text, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield number, IngestError(f'Invalid JSON: {e}')
+                continue
+            yield number, row if isinstance(row, dict) else IngestError('Row must be a JSON object')
+    else:
+        raise IngestError('Content-Type must be text/csv or application/x-ndjson')
+
+
+def parse_row(row):
+    if isinstance(row, Exception):
+        raise row
+
+    try:
+        donor_id = int(row.get('donor_id'))
+    except (TypeError, ValueError):
+        raise IngestError('donor_id must be an integer')
+
+    try:
+        units = int(row.get('units') or 1)
+    except (TypeError, ValueError):
+        raise IngestError('units must be an integer')
+    if units < 1:
+        raise IngestError('units must be positive')
+
+    try:
+        donation_date = datetime.strptime(str(row.get('donation_date') or ''), '%Y-%m-%d').date()
+    except ValueError:
+        raise IngestError('donation_date must be YYYY-MM-DD')
+
+    location = (row.get('location') or '').strip()
+    if not location:
+        raise IngestError('location is required')
+
+    return {
+        'donor_id': donor_id,
+        'location': location[:100],
+        'units': units,
+        'status': row.get('status') or 'completed',
+        'donation_date': donation_date,
+        'notes': row.get('notes') or '',
+    }
+
+
+def ingest_chunk(chunk, errors):
+    parsed = []
+    for number, row in chunk:
+        try:
+            parsed.append((number, parse_row(row)))
+        except IngestError as e:
+            errors.append({'row': number, 'error': str(e)})
+
+    if not parsed:
+        return 0
+
+    donor_ids = {values['donor_id'] for _, values in parsed}
+    known = set(db.session.execute(
+        select(Donor.id).where(Donor.id.in_(donor_ids))
+    ).scalars())
+
+    now = datetime.utcnow()
+    rows = []
+    per_donor = {}
+    for number, values in parsed:
+        if values['donor_id'] not in known:
+            errors.append({'row': number, 'error': f"Donor {values['donor_id']} not found"})
+            continue
+        values['created_at'] = now
+        rows.append(values)
+        per_donor[values['donor_id']] = per_donor.get(values['donor_id'], 0) + 1
+
+    if not rows:
+        return 0
+
+    db.session.execute(Donation.__table__.insert(), rows)
+
+    donors = Donor.__table__
+    donations = Donation.__table__
+    last_donation_date = (
+        select(func.max(donations.c.donation_date))
+        .where(donations.c.donor_id == donors.c.id)
+        .scalar_subquery()
+    )
+    db.session.execute(
+        donors.update()
+        .where(donors.c.id.in_(per_donor))
+        .values(
+            total_donations=func.coalesce(donors.c.total_donations, 0) + case(per_donor, value=donors.c.id, else_=0),
+            last_donation_date=last_donation_date,
+            # From the subquery, not the column: MySQL would see the new value
+            # in a later SET clause, SQLite the old one.
+            eligible_from=eligible_from_expression(donors, last_donation_date),
+            updated_at=now
+        ),
+        execution_options={'synchronize_session': False}
+    )
+    record_index_changes(db.session, rows=[
+        dict(row._mapping) for row in db.session.execute(
+            select(
+                donors.c.id, donors.c.blood_group, donors.c.city, donors.c.latitude, donors.c.longitude,
+                donors.c.eligible_from, donors.c.last_donation_date
+            ).where(donors.c.id.in_(per_donor))
+        )
+    ])
+
+    apply_deltas(db.session.connection(), {
+        'donations_total': len(rows),
+        day_key('donations_created', now): len(rows)
+    })
+    return len(rows)
+
+
+def ingest_donations(stream, content_type):
+    """Insert donations from a CSV/NDJSON stream, one transaction per chunk.
+
+    Rows that fail validation are reported by their 1-based row number and
+    skipped; valid rows in the same chunk are still inserted.
+    """
+    rows = iter_rows(stream, content_type)
+    inserted = 0
+    errors = []
+
+    while True:
+        chunk = list(islice(rows, Config.BULK_CHUNK_SIZE))
+        if not chunk:
+            break
+        reported = len(errors)
+        try:
+            inserted += ingest_chunk(chunk, errors)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            del errors[reported:]
+            errors.extend({'row': number, 'error': f'Chunk failed: {e}'} for number, _ in chunk)
+
+    errors.sort(key=lambda error: error['row'])
+    return {'inserted': inserted, 'failed': len(errors), 'errors': errors}
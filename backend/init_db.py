@@ -1,5 +1,7 @@
 from app import create_app
 from models import db, Admin, BloodStock
+from counters import rebuild_counters
+from search import rebuild_search_index
 import sys
 
 def initialize_database():
@@ -42,6 +44,12 @@ def initialize_database():
             db.session.commit()
             print("\nBlood stock initialized for all blood groups")
 
+            rebuild_counters()
+            print("Statistics counters initialized")
+
+            rebuild_search_index()
+            print("Donor search index initialized")
+
             print("\n" + "="*50)
             print("DATABASE INITIALIZATION COMPLETE!")
             print("="*50)
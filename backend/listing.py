@@ -0,0 +1,124 @@
+"""Queries and response bodies shared by the Flask views and ``asgi.py``.
+
+The donor and request lists, the counter-backed stats and the blood stock
+are served both by Flask routes and by the async handlers in asgi.py. The
+statements here are Core selects that run unchanged on ``db.session`` or an
+async connection, so both servers issue the same SQL and return the same
+bodies and ETags; each side only supplies the I/O.
+"""
+from datetime import datetime
+from flask import request, jsonify
+from sqlalchemy import select, func, text
+from conditional import ResultValidator, page_version
+from counters import (counters_statement, counter_values, donor_stats_keys, donor_stats,
+                      dashboard_stats_keys, dashboard_stats)
+from filters import filter_conditions, DONOR_FILTERS, REQUEST_FILTERS
+from models import db, Donor, BloodRequest, BloodStock
+from pagination import get_page_limit, wants_total, page_statement, build_page
+from serializers import DONOR_COLUMNS, REQUEST_COLUMNS, STOCK_COLUMNS, rows_to_dicts
+
+
+class ListEndpoint:
+    """A keyset-paged, filterable list: ``GET /api/donors/`` and friends."""
+
+    def __init__(self, model, columns, fields, scope, key):
+        self.model = model
+        self.columns = columns
+        self.fields = fields
+        self.scope = scope
+        self.key = key
+
+    def arguments(self, args):
+        """``(conditions, limit, cursor, wants_total)`` from the query string."""
+        conditions = filter_conditions(self.model, self.fields, args)
+        return conditions, get_page_limit(args), args.get('cursor'), wants_total(args)
+
+    def version_statement(self, conditions, limit, cursor):
+        # The page's ids and update times: what conditional.page_version hashes.
+        statement = select(self.model.id, self.model.updated_at).where(*conditions)
+        return page_statement(statement, self.model, limit, cursor)
+
+    def rows_statement(self, conditions, limit, cursor):
+        return page_statement(select(*self.columns).where(*conditions), self.model, limit, cursor)
+
+    def total_statements(self, conditions, dialect_name):
+        """Statements to try in turn for the total; the first non-NULL answer is used.
+
+        For an unfiltered MySQL table the InnoDB row estimate avoids a full
+        index scan; everything else is an exact count.
+        """
+        statements = [select(func.count()).select_from(self.model).where(*conditions)]
+        if not conditions and dialect_name == 'mysql':
+            statements.insert(0, text(
+                "SELECT table_rows FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = :name"
+            ).bindparams(name=self.model.__tablename__))
+        return statements
+
+    def body(self, rows, limit, total):
+        rows, page = build_page(rows, limit, total)
+        return {self.key: rows_to_dicts(rows), **page}
+
+
+DONOR_LIST = ListEndpoint(Donor, DONOR_COLUMNS, DONOR_FILTERS, 'donors', 'donors')
+REQUEST_LIST = ListEndpoint(BloodRequest, REQUEST_COLUMNS, REQUEST_FILTERS, 'blood-requests', 'requests')
+
+
+class StatsEndpoint:
+    """Stats read from ``stat_counters`` and cached in ``aggregate_cache`` under ``name``."""
+
+    def __init__(self, name, tags, keys, build):
+        self.name = name
+        self.tags = tuple(sorted(tags))
+        self._keys = keys
+        self._build = build
+
+    def statement(self, now):
+        return counters_statement(self._keys(now))
+
+    def body(self, rows, now):
+        return self._build(counter_values(self._keys(now), rows), now)
+
+
+DONOR_STATS = StatsEndpoint(
+    'donor_stats', ['donors'], lambda now: donor_stats_keys(), lambda counters, now: donor_stats(counters)
+)
+DASHBOARD_STATS = StatsEndpoint(
+    'dashboard_stats', ['donors', 'blood_requests', 'donations'], dashboard_stats_keys, dashboard_stats
+)
+
+# Whole-table validator for the eight stock rows, and the rows themselves.
+STOCK_VERSION_STATEMENT = select(func.max(BloodStock.last_updated), func.count()).select_from(BloodStock)
+STOCK_ROWS_STATEMENT = select(*STOCK_COLUMNS).order_by(BloodStock.id)
+
+
+def stock_body(rows):
+    return {'stock': rows_to_dicts(rows)}
+
+
+def read_total(session, endpoint, conditions):
+    for statement in endpoint.total_statements(conditions, session.get_bind().dialect.name):
+        value = session.execute(statement).scalar()
+        if value is not None:
+            return int(value)
+
+
+def list_response(endpoint):
+    """Flask view body for ``endpoint``: a 304, or the page with its validators."""
+    conditions, limit, cursor, total_wanted = endpoint.arguments(request.args)
+
+    versions = db.session.execute(endpoint.version_statement(conditions, limit, cursor)).all()
+    total = read_total(db.session, endpoint, conditions) if total_wanted else None
+    validator = ResultValidator(endpoint.scope, *page_version(versions, total))
+    if validator.not_modified():
+        return validator.not_modified_response()
+
+    rows = db.session.execute(endpoint.rows_statement(conditions, limit, cursor)).all()
+    return validator.apply(jsonify(endpoint.body(rows, limit, total))), 200
+
+
+def stats_response(endpoint):
+    """Flask view body for ``endpoint``, to be wrapped in ``cached_aggregate``."""
+    now = datetime.utcnow()
+    rows = db.session.execute(endpoint.statement(now)).all()
+    return jsonify(endpoint.body(rows, now)), 200
@@ -0,0 +1,229 @@
+import heapq
+import threading
+import time
+from datetime import date, timedelta
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from config import Config
+from eligibility import eligible_now
+from geo import distance_km
+from models import db, Donor
+
+# Recipient blood group -> donor groups whose red cells it can receive.
+COMPATIBLE_DONORS = {
+    'O-': ['O-'],
+    'O+': ['O+', 'O-'],
+    'A-': ['A-', 'O-'],
+    'A+': ['A+', 'A-', 'O+', 'O-'],
+    'B-': ['B-', 'O-'],
+    'B+': ['B+', 'B-', 'O+', 'O-'],
+    'AB-': ['AB-', 'A-', 'B-', 'O-'],
+    'AB+': ['AB+', 'AB-', 'A+', 'A-', 'B+', 'B-', 'O+', 'O-'],
+}
+
+# Approximate share of the donor population per group (percent). Rarer
+# groups are ranked last so they are held back for recipients who need them.
+BLOOD_GROUP_FREQUENCY = {
+    'O+': 37.4, 'A+': 35.7, 'B+': 8.5, 'O-': 6.6,
+    'A-': 6.3, 'AB+': 3.4, 'B-': 1.5, 'AB-': 0.6,
+}
+
+
+def normalize_city(city):
+    return (city or '').strip().lower()
+
+
+class DonorIndex:
+    """In-process index of donors who can donate, bucketed by blood group.
+
+    Only donors whose ``eligible_from`` falls before the next rebuild are loaded.
+    Each group has a bucket of donors eligible today and one of donors whose
+    cooldown ends later; the second is promoted when the date changes.
+
+    The index is maintained from committed ``Donor`` changes in this process
+    and rebuilt from the database every ``MATCH_INDEX_TTL`` seconds so writes
+    made by other workers are picked up.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._donors = {}
+        self._built_at = None
+        self._today = None
+
+    def _key(self, donor):
+        return donor['blood_group'], donor['eligible_from'] <= self._today
+
+    def _remove(self, donor_id):
+        donor = self._donors.pop(donor_id, None)
+        if donor:
+            key = self._key(donor)
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(donor_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def _put(self, donor):
+        self._remove(donor['id'])
+        if donor['eligible_from'] is None or donor['eligible_from'] > self.horizon():
+            return
+        self._donors[donor['id']] = donor
+        self._buckets.setdefault(self._key(donor), set()).add(donor['id'])
+
+    def _advance(self, today):
+        # Move donors whose cooldown has ended into their group's eligible bucket.
+        if today <= self._today:
+            return
+        waiting = [self._donors[i] for (_, eligible), ids in self._buckets.items() if not eligible for i in ids]
+        for donor in waiting:
+            self._remove(donor['id'])
+        self._today = today
+        for donor in waiting:
+            self._put(donor)
+
+    def horizon(self):
+        return date.today() + timedelta(days=Config.MATCH_INDEX_TTL // 86400 + 1)
+
+    def rebuild(self):
+        rows = db.session.query(
+            Donor.id, Donor.blood_group, Donor.city, Donor.latitude, Donor.longitude,
+            Donor.eligible_from, Donor.last_donation_date
+        ).filter(eligible_now(self.horizon())).all()
+
+        with self._lock:
+            self._buckets = {}
+            self._donors = {}
+            self._today = date.today()
+            for row in rows:
+                self._put(dict(row._mapping))
+            self._built_at = time.monotonic()
+
+    def ensure_fresh(self):
+        if self._built_at is None or time.monotonic() - self._built_at > Config.MATCH_INDEX_TTL:
+            self.rebuild()
+
+    def apply(self, upserts, deletes):
+        if self._built_at is None:
+            return
+        with self._lock:
+            for donor in upserts:
+                self._put(donor)
+            for donor_id in deletes:
+                self._remove(donor_id)
+
+    def candidates(self, recipient_group, today=None):
+        """Donors eligible on ``today`` who can give to ``recipient_group``."""
+        with self._lock:
+            self._advance(today or date.today())
+            result = []
+            for group in COMPATIBLE_DONORS.get(recipient_group, []):
+                result.extend(self._donors[i] for i in self._buckets.get((group, True), ()))
+            return result
+
+
+donor_index = DonorIndex()
+
+
+def _snapshot(donor):
+    return {
+        'id': donor.id,
+        'blood_group': donor.blood_group,
+        'city': donor.city,
+        'latitude': donor.latitude,
+        'longitude': donor.longitude,
+        'eligible_from': donor.eligible_from,
+        'last_donation_date': donor.last_donation_date,
+    }
+
+
+def _pending(session):
+    return session.info.setdefault('donor_index_changes', ({}, set()))
+
+
+def record_index_changes(session, rows=(), deleted=()):
+    """Queue index changes for donors written by set-based statements.
+
+    ``rows`` carry the ``_snapshot`` fields. Applied when the session commits.
+    """
+    upserts, deletes = _pending(session)
+    for row in rows:
+        upserts[row['id']] = dict(row)
+        deletes.discard(row['id'])
+    for donor_id in deleted:
+        upserts.pop(donor_id, None)
+        deletes.add(donor_id)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_donor_changes(session, flush_context):
+    upserts, deletes = _pending(session)
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Donor) and obj.id is not None:
+            upserts[obj.id] = _snapshot(obj)
+            deletes.discard(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, Donor):
+            upserts.pop(obj.id, None)
+            deletes.add(obj.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_donor_changes(session):
+    pending = session.info.pop('donor_index_changes', None)
+    if pending:
+        upserts, deletes = pending
+        donor_index.apply(upserts.values(), deletes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_donor_changes(session):
+    session.info.pop('donor_index_changes', None)
+
+
+def find_matches(blood_request, limit=None):
+    """Rank eligible donors who can give to ``blood_request``.
+
+    Candidates come from the in-memory index and are re-checked against the
+    database in a single primary-key lookup before being returned. With a
+    ``limit`` only the best ``limit`` are selected (a heap, not a full sort).
+    """
+    donor_index.ensure_fresh()
+
+    today = date.today()
+    candidates = donor_index.candidates(blood_request.blood_group, today)
+
+    request_city = normalize_city(blood_request.city)
+    located = blood_request.latitude is not None and blood_request.longitude is not None
+
+    def distance(d):
+        if not located or d['latitude'] is None or d['longitude'] is None:
+            return None
+        return distance_km(blood_request.latitude, blood_request.longitude, d['latitude'], d['longitude'])
+
+    def sort_key(d):
+        # Same city, or within the default search radius, counts as local;
+        # nearer donors then win ties within each tier.
+        km = distance(d)
+        local = normalize_city(d['city']) == request_city or (km is not None and km <= Config.GEO_DEFAULT_RADIUS_KM)
+        return (
+            not local,
+            d['blood_group'] != blood_request.blood_group,
+            -BLOOD_GROUP_FREQUENCY.get(d['blood_group'], 0),
+            km if km is not None else float('inf'),
+            d['last_donation_date'] or date.min,
+            d['id'],
+        )
+
+    if limit is not None:
+        candidates = heapq.nsmallest(limit, candidates, key=sort_key)
+    else:
+        candidates.sort(key=sort_key)
+
+    ids = [d['id'] for d in candidates]
+    if not ids:
+        return []
+
+    donors = {donor.id: donor for donor in Donor.query.filter(Donor.id.in_(ids), eligible_now(today)).all()}
+    return [donors[i] for i in ids if i in donors]
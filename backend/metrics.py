@@ -0,0 +1,205 @@
+import contextvars
+import logging
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from config import Config
+
+slow_query_log = logging.getLogger('bloodlink.slow_query')
+request_log = logging.getLogger('bloodlink.requests')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class RequestStats:
+    __slots__ = ('endpoint', 'method', 'started', 'sql_count', 'sql_time')
+
+    def __init__(self, endpoint, method):
+        self.endpoint = endpoint
+        self.method = method
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+
+    def server_timing(self, duration):
+        return (f'app;dur={duration * 1000:.2f}, '
+                f'db;dur={self.sql_time * 1000:.2f};desc="{self.sql_count} queries"')
+
+
+# A context variable rather than flask.g so the same tracking works for the
+# ASGI handlers, whose queries run on asyncio tasks.
+_current = contextvars.ContextVar('request_stats', default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield bound, total
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{name}="{escape(value)}"' for name, value in labels.items())
+
+
+class MetricsRegistry:
+    """Per-process request and SQL metrics, rendered in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}
+            self.latency = {}
+            self.statements = {}
+            self.sql_count = {}
+            self.sql_time = {}
+            self.slow_queries = {}
+
+    def record(self, stats, status, duration):
+        key = (stats.endpoint, stats.method)
+        with self._lock:
+            self.requests[key + (status,)] = self.requests.get(key + (status,), 0) + 1
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(duration)
+            self.statements.setdefault(key, Histogram(STATEMENT_BUCKETS)).observe(stats.sql_count)
+            self.sql_count[key] = self.sql_count.get(key, 0) + stats.sql_count
+            self.sql_time[key] = self.sql_time.get(key, 0.0) + stats.sql_time
+
+    def record_slow_query(self, endpoint):
+        with self._lock:
+            self.slow_queries[endpoint] = self.slow_queries.get(endpoint, 0) + 1
+
+    def render(self, extra=None):
+        """Render all metrics; ``extra`` maps name -> (type, help, value)."""
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        def histograms(name, values, help_text):
+            family(name, 'histogram', help_text)
+            for (endpoint, method), histogram in sorted(values.items()):
+                for bound, count in histogram.cumulative():
+                    lines.append(f'{name}_bucket{{{_labels(endpoint=endpoint, method=method, le=bound)}}} {count}')
+                lines.append(f'{name}_bucket{{{_labels(endpoint=endpoint, method=method, le="+Inf")}}} {histogram.count}')
+                lines.append(f'{name}_sum{{{_labels(endpoint=endpoint, method=method)}}} {histogram.sum:.6f}')
+                lines.append(f'{name}_count{{{_labels(endpoint=endpoint, method=method)}}} {histogram.count}')
+
+        def counters(name, values, help_text):
+            family(name, 'counter', help_text)
+            for (endpoint, method), value in sorted(values.items()):
+                lines.append(f'{name}{{{_labels(endpoint=endpoint, method=method)}}} {value:g}')
+
+        with self._lock:
+            family('bloodlink_http_requests_total', 'counter', 'HTTP requests by endpoint, method and status.')
+            for (endpoint, method, status), value in sorted(self.requests.items()):
+                labels = _labels(endpoint=endpoint, method=method, status=status)
+                lines.append(f'bloodlink_http_requests_total{{{labels}}} {value}')
+
+            histograms('bloodlink_http_request_duration_seconds', self.latency, 'Request latency.')
+            histograms('bloodlink_sql_statements_per_request', self.statements,
+                       'SQL statements executed per request.')
+            counters('bloodlink_sql_statements_total', self.sql_count, 'SQL statements executed.')
+            counters('bloodlink_sql_duration_seconds_total', self.sql_time, 'Time spent executing SQL.')
+
+            family('bloodlink_slow_queries_total', 'counter', 'Statements slower than SLOW_QUERY_MS.')
+            for endpoint, value in sorted(self.slow_queries.items()):
+                lines.append(f'bloodlink_slow_queries_total{{{_labels(endpoint=endpoint)}}} {value}')
+
+        for name, (kind, help_text, value) in sorted((extra or {}).items()):
+            family(name, kind, help_text)
+            lines.append(f'{name} {value:g}')
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def start_request(endpoint, method):
+    stats = RequestStats(endpoint, method)
+    return stats, _current.set(stats)
+
+
+def finish_request(stats, token, status):
+    """Record a finished request and return its duration in seconds."""
+    try:
+        _current.reset(token)
+    except ValueError:
+        # Finished in a different context than it started (e.g. a test client).
+        _current.set(None)
+    duration = time.perf_counter() - stats.started
+    registry.record(stats, status, duration)
+    if status >= 500:
+        request_log.warning('%s %s returned %s in %.1f ms after %d queries',
+                            stats.method, stats.endpoint, status, duration * 1000, stats.sql_count)
+    return duration
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_query(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _end_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    stats = _current.get()
+
+    if stats is not None:
+        stats.sql_count += 1
+        stats.sql_time += elapsed
+
+    if Config.SLOW_QUERY_MS and elapsed * 1000 >= Config.SLOW_QUERY_MS:
+        endpoint = stats.endpoint if stats else 'background'
+        registry.record_slow_query(endpoint)
+        slow_query_log.warning('Slow query (%.1f ms) in %s: %s', elapsed * 1000, endpoint,
+                               ' '.join(statement.split())[:1000])
+
+
+@event.listens_for(Engine, 'handle_error')
+def _discard_failed_query(exception_context):
+    started = exception_context.connection.info.get('query_started') if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def init_metrics(app):
+    from flask import request, g
+
+    @app.before_request
+    def _start():
+        rule = request.url_rule.rule if request.url_rule else 'unmatched'
+        g.request_stats, g.request_stats_token = start_request(rule, request.method)
+
+    @app.after_request
+    def _finish(response):
+        stats = g.pop('request_stats', None)
+        if stats is None:
+            return response
+        duration = finish_request(stats, g.pop('request_stats_token'), response.status_code)
+        if Config.SERVER_TIMING_ENABLED:
+            response.headers['Server-Timing'] = stats.server_timing(duration)
+        return response
@@ -0,0 +1,64 @@
+from app import create_app
+from models import db
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateColumn
+import sys
+
+def migrate_indexes():
+    app = create_app()
+
+    with app.app_context():
+        try:
+            inspector = inspect(db.engine)
+            existing_tables = set(inspector.get_table_names())
+            created = 0
+            added = []
+
+            for table in db.metadata.sorted_tables:
+                if table.name not in existing_tables:
+                    print(f"Skipping {table.name} (table does not exist yet, run init_db.py)")
+                    continue
+
+                columns = {column['name']: column for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    length = getattr(column.type, 'length', None)
+                    current = getattr(columns[column.name]['type'], 'length', None) if column.name in columns else None
+                    if db.engine.dialect.name == 'mysql' and length and current and current < length:
+                        print(f"Widening {table.name}.{column.name} to {length}...")
+                        ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+                        with db.engine.begin() as conn:
+                            conn.exec_driver_sql(f"ALTER TABLE {table.name} MODIFY COLUMN {ddl}")
+                        added.append(f"{table.name}.{column.name}")
+                        continue
+                    if column.name in columns or not column.nullable:
+                        continue
+                    print(f"Adding column {column.name} to {table.name}...")
+                    ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+                    with db.engine.begin() as conn:
+                        conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+                    added.append(f"{table.name}.{column.name}")
+
+                existing = {index['name'] for index in inspector.get_indexes(table.name)}
+                for index in sorted(table.indexes, key=lambda i: i.name):
+                    if index.name in existing:
+                        continue
+                    print(f"Creating index {index.name} on {table.name}...")
+                    index.create(bind=db.engine)
+                    created += 1
+
+            print(f"\nIndex migration complete ({len(added)} column(s) added or widened, {created} index(es) created)")
+            if 'donors.eligible_from' in added:
+                print("Run flask --app app manage recompute-eligibility to populate donors.eligible_from")
+            if 'donors.latitude' in added or 'blood_requests.latitude' in added:
+                print("Run geocode.py to fill in donor and request locations")
+            if 'daily_rollups.dimension' in added:
+                print("Run flask --app app manage refresh-rollups --full to rebuild breakdowns truncated at the old width")
+            if 'blood_requests.priority_at' in added:
+                print("Run flask --app app manage recompute-priorities to place pending requests in the triage queue")
+
+        except Exception as e:
+            print(f"\nError migrating indexes: {e}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    migrate_indexes()
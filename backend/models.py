@@ -1,11 +1,36 @@
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
-import bcrypt
+from datetime import date, datetime
+from sqlalchemy.dialects import mysql
+from hashing import hash_password, verify_password, needs_rehash
 
 db = SQLAlchemy()
 
+# eligible_from for donors who have never donated: eligible since forever.
+# MySQL's documented minimum DATE, so the value round-trips on every backend.
+# Internal only; the API reports it as null.
+ALWAYS_ELIGIBLE = date(1000, 1, 1)
+
+
+def binary_string(length):
+    # MySQL's default collation is case-insensitive and sorts punctuation
+    # first; prefix ranges need code-point order, which SQLite uses anyway.
+    return db.String(length).with_variant(
+        mysql.VARCHAR(length, charset='utf8mb4', collation='utf8mb4_bin'), 'mysql'
+    )
+
 class Donor(db.Model):
     __tablename__ = 'donors'
+    __table_args__ = (
+        db.Index('ix_donors_created_at', 'created_at', 'id'),
+        db.Index('ix_donors_status_created_at', 'status', 'created_at', 'id'),
+        db.Index('ix_donors_status_group_created_at', 'status', 'blood_group', 'created_at', 'id'),
+        db.Index('ix_donors_status_group_city_created_at', 'status', 'blood_group', 'city', 'created_at', 'id'),
+        db.Index('ix_donors_group_created_at', 'blood_group', 'created_at', 'id'),
+        db.Index('ix_donors_city_created_at', 'city', 'created_at', 'id'),
+        db.Index('ix_donors_updated_at', 'updated_at'),
+        db.Index('ix_donors_eligible_from', 'eligible_from'),
+        db.Index('ix_donors_status_group_geohash', 'status', 'blood_group', 'geohash', 'eligible_from'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     full_name = db.Column(db.String(100), nullable=False)
@@ -15,21 +40,30 @@ class Donor(db.Model):
     contact = db.Column(db.String(20), nullable=False)
     email = db.Column(db.String(100), unique=True, nullable=False)
     city = db.Column(db.String(50), nullable=False)
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+    # Maintained by geo.py from latitude/longitude.
+    geohash = db.Column(binary_string(12), nullable=True)
     password_hash = db.Column(db.String(255), nullable=False)
     status = db.Column(db.String(20), default='pending')
     is_eligible = db.Column(db.Boolean, default=True)
     last_donation_date = db.Column(db.Date, nullable=True)
     total_donations = db.Column(db.Integer, default=0)
+    # Maintained by eligibility.py; NULL when the donor cannot donate at all.
+    eligible_from = db.Column(db.Date, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     donations = db.relationship('Donation', backref='donor', lazy=True, cascade='all, delete-orphan')
 
     def set_password(self, password):
-        self.password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
+        return verify_password(password, self.password_hash)
+
+    def password_needs_rehash(self):
+        return needs_rehash(self.password_hash)
 
     def to_dict(self):
         return {
@@ -41,16 +75,31 @@ class Donor(db.Model):
             'contact': self.contact,
             'email': self.email,
             'city': self.city,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
             'status': self.status,
             'is_eligible': self.is_eligible,
             'last_donation_date': self.last_donation_date.isoformat() if self.last_donation_date else None,
             'total_donations': self.total_donations,
+            'eligible_from': (
+                self.eligible_from.isoformat()
+                if self.eligible_from and self.eligible_from != ALWAYS_ELIGIBLE else None
+            ),
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
 
 class BloodRequest(db.Model):
     __tablename__ = 'blood_requests'
+    __table_args__ = (
+        db.Index('ix_blood_requests_created_at', 'created_at', 'id'),
+        db.Index('ix_blood_requests_status_created_at', 'status', 'created_at', 'id'),
+        db.Index('ix_blood_requests_status_group_created_at', 'status', 'blood_group', 'created_at', 'id'),
+        db.Index('ix_blood_requests_group_created_at', 'blood_group', 'created_at', 'id'),
+        db.Index('ix_blood_requests_donor_created_at', 'donor_id', 'created_at'),
+        db.Index('ix_blood_requests_updated_at', 'updated_at'),
+        db.Index('ix_blood_requests_queue', 'status', 'blood_group', 'priority_at', 'id', 'claimed_until'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name = db.Column(db.String(100), nullable=False)
@@ -59,10 +108,17 @@ class BloodRequest(db.Model):
     units = db.Column(db.Integer, nullable=False)
     hospital_name = db.Column(db.String(100), nullable=False)
     city = db.Column(db.String(50), nullable=False)
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
     message = db.Column(db.Text, nullable=True)
     status = db.Column(db.String(20), default='pending')
     urgency = db.Column(db.String(20), default='normal')
     donor_id = db.Column(db.Integer, db.ForeignKey('donors.id'), nullable=True)
+    priority_at = db.Column(db.DateTime, nullable=True)
+    claimed_by = db.Column(db.Integer, db.ForeignKey('admins.id'), nullable=True)
+    claimed_until = db.Column(db.DateTime, nullable=True)
+    # Set by each queue claim so it can read back exactly the rows it won.
+    claim_token = db.Column(db.String(36), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -75,16 +131,25 @@ class BloodRequest(db.Model):
             'units': self.units,
             'hospital_name': self.hospital_name,
             'city': self.city,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
             'message': self.message,
             'status': self.status,
             'urgency': self.urgency,
             'donor_id': self.donor_id,
+            'claimed_by': self.claimed_by,
+            'claimed_until': self.claimed_until.isoformat() if self.claimed_until else None,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
 
 class Donation(db.Model):
     __tablename__ = 'donations'
+    __table_args__ = (
+        db.Index('ix_donations_donor_date', 'donor_id', 'donation_date'),
+        db.Index('ix_donations_donation_date', 'donation_date'),
+        db.Index('ix_donations_created_at', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     donor_id = db.Column(db.Integer, db.ForeignKey('donors.id'), nullable=False)
@@ -120,10 +185,13 @@ class Admin(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     def set_password(self, password):
-        self.password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
+        return verify_password(password, self.password_hash)
+
+    def password_needs_rehash(self):
+        return needs_rehash(self.password_hash)
 
     def to_dict(self):
         return {
@@ -152,3 +220,136 @@ class BloodStock(db.Model):
             'units_reserved': self.units_reserved,
             'last_updated': self.last_updated.isoformat() if self.last_updated else None
         }
+
+
+class StatCounter(db.Model):
+    __tablename__ = 'stat_counters'
+
+    name = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class DonorSearchToken(db.Model):
+    """Normalized search tokens for donor lookup, maintained by search.py."""
+    __tablename__ = 'donor_search_tokens'
+    __table_args__ = (
+        db.Index('ix_donor_search_tokens_donor', 'donor_id', 'token', 'field'),
+    )
+
+    token = db.Column(binary_string(64), primary_key=True)
+    donor_id = db.Column(db.Integer, db.ForeignKey('donors.id', ondelete='CASCADE'), primary_key=True)
+    field = db.Column(db.String(10), primary_key=True)
+
+
+class StockLedger(db.Model):
+    __tablename__ = 'stock_ledger'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    blood_group = db.Column(db.String(5), nullable=False, index=True)
+    action = db.Column(db.String(20), nullable=False)
+    available_change = db.Column(db.Integer, nullable=False, default=0)
+    reserved_change = db.Column(db.Integer, nullable=False, default=0)
+    request_id = db.Column(db.Integer, db.ForeignKey('blood_requests.id', ondelete='SET NULL'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'blood_group': self.blood_group,
+            'action': self.action,
+            'available_change': self.available_change,
+            'reserved_change': self.reserved_change,
+            'request_id': self.request_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class ChangeEvent(db.Model):
+    """Outbox of committed writes for the change feed, maintained by changefeed.py."""
+    __tablename__ = 'change_events'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    topic = db.Column(db.String(20), nullable=False)
+    action = db.Column(db.String(10), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'topic': self.topic,
+            'action': self.action,
+            'entity_id': self.entity_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class Notification(db.Model):
+    """Outbox of messages to deliver, drained by notifications.NotificationWorker."""
+    __tablename__ = 'notifications'
+    __table_args__ = (
+        db.Index('ix_notifications_status_next_attempt', 'status', 'next_attempt_at', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    channel = db.Column(db.String(10), nullable=False)
+    kind = db.Column(db.String(30), nullable=False)
+    recipient = db.Column(db.String(100), nullable=True)
+    subject = db.Column(db.String(200), nullable=True)
+    body = db.Column(db.Text, nullable=True)
+    request_id = db.Column(db.Integer, db.ForeignKey('blood_requests.id', ondelete='SET NULL'), nullable=True)
+    status = db.Column(db.String(10), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.String(500), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    # Set by each claim so the worker can read back exactly the rows it won.
+    claim_token = db.Column(db.String(36), nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'channel': self.channel,
+            'kind': self.kind,
+            'recipient': self.recipient,
+            'subject': self.subject,
+            'body': self.body,
+            'request_id': self.request_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None
+        }
+
+
+class DailyRollup(db.Model):
+    __tablename__ = 'daily_rollups'
+
+    day = db.Column(db.Date, primary_key=True)
+    metric = db.Column(db.String(32), primary_key=True)
+    # 'name:value'; fits the longest dimension source (Donation.location).
+    dimension = db.Column(db.String(128), primary_key=True, default='')
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class RollupState(db.Model):
+    __tablename__ = 'rollup_state'
+
+    source = db.Column(db.String(32), primary_key=True)
+    high_water = db.Column(db.DateTime, nullable=False)
+    refreshed_at = db.Column(db.DateTime, nullable=False)
+
+
+class RollupDirtyDay(db.Model):
+    """Days that lost a row (deleted or moved), recomputed by the next rollups refresh."""
+    __tablename__ = 'rollup_dirty_days'
+    __table_args__ = (
+        db.Index('ix_rollup_dirty_days_source_id', 'source', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    source = db.Column(db.String(32), nullable=False)
+    day = db.Column(db.Date, nullable=False)
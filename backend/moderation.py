@@ -0,0 +1,247 @@
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import select
+from config import Config
+from counters import record_donor_status_changes, record_status_change
+from eligibility import eligible_from_expression, eligible_from_for
+from filters import filter_conditions
+from matching import record_index_changes
+from models import db, Donor, BloodRequest, BloodStock
+from notifications import notify_requests_approved
+from stock import adjust_for_requests
+
+DONOR_LOCK_COLUMNS = [
+    Donor.id, Donor.status, Donor.blood_group, Donor.city, Donor.latitude, Donor.longitude,
+    Donor.is_eligible, Donor.age, Donor.last_donation_date,
+]
+
+REQUEST_LOCK_COLUMNS = [
+    BloodRequest.id, BloodRequest.status, BloodRequest.blood_group, BloodRequest.units,
+    BloodRequest.contact, BloodRequest.hospital_name,
+]
+
+
+class ModerationError(ValueError):
+    pass
+
+
+class ConcurrentModification(Exception):
+    pass
+
+
+def select_targets(model, fields, data):
+    """Ids to moderate from a JSON body: ``{"ids": [...]}`` or ``{"filter": {...}}``.
+
+    A filter matches exactly on ``fields`` and selects at most
+    ``MODERATION_MAX_IDS`` rows by id. Returns ``(ids, has_more)``; repeat
+    the call to work through larger matches.
+    """
+    data = data or {}
+    ids, filters = data.get('ids'), data.get('filter')
+    if (ids is None) == (filters is None):
+        raise ModerationError('Provide either ids or filter')
+
+    if ids is not None:
+        if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            raise ModerationError('ids must be a list of integers')
+        if len(ids) > Config.MODERATION_MAX_IDS:
+            raise ModerationError(f'At most {Config.MODERATION_MAX_IDS} ids per call')
+        return list(dict.fromkeys(ids)), False
+
+    if not isinstance(filters, dict):
+        raise ModerationError('filter must be an object')
+    unknown = set(filters) - set(fields)
+    if unknown:
+        raise ModerationError(f"Unknown filter field(s): {', '.join(sorted(unknown))}")
+    conditions = filter_conditions(model, fields, filters)
+    if not conditions:
+        raise ModerationError(f"filter needs at least one of: {', '.join(fields)}")
+
+    ids = db.session.execute(
+        select(model.id).where(*conditions).order_by(model.id).limit(Config.MODERATION_MAX_IDS + 1)
+    ).scalars().all()
+    return ids[:Config.MODERATION_MAX_IDS], len(ids) > Config.MODERATION_MAX_IDS
+
+
+def summarize(results):
+    """Response body for ``{id: (result, error)}``: per-result counts and per-id results."""
+    return {
+        'counts': dict(Counter(result for result, _ in results.values())),
+        'results': [
+            {'id': target_id, 'result': result, **({'error': error} if error else {})}
+            for target_id, (result, error) in results.items()
+        ],
+    }
+
+
+def _chunks(ids):
+    for start in range(0, len(ids), Config.BULK_CHUNK_SIZE):
+        yield ids[start:start + Config.BULK_CHUNK_SIZE]
+
+
+def _lock(columns, model, chunk):
+    rows = db.session.execute(select(*columns).where(model.id.in_(chunk)).with_for_update()).all()
+    return {row.id: row for row in rows}
+
+
+def moderate_donors(ids, status):
+    """Move many donors to ``status`` ('approved' or 'rejected').
+
+    Each chunk of ``BULK_CHUNK_SIZE`` ids is locked with one SELECT and
+    written with one UPDATE; counters, ``eligible_from`` and the match index
+    are kept in step. Returns ``{id: (result, error)}`` where result is the
+    new status, 'unchanged' or 'not_found'. The caller commits.
+    """
+    donors = Donor.__table__
+    now = datetime.utcnow()
+    results = {}
+
+    for chunk in _chunks(ids):
+        rows = _lock(DONOR_LOCK_COLUMNS, Donor, chunk)
+        changing = []
+        for donor_id in chunk:
+            row = rows.get(donor_id)
+            if row is None:
+                results[donor_id] = ('not_found', None)
+            elif row.status == status:
+                results[donor_id] = ('unchanged', None)
+            else:
+                results[donor_id] = (status, None)
+                changing.append(row)
+        if not changing:
+            continue
+
+        result = db.session.execute(
+            donors.update()
+            .where(donors.c.id.in_([row.id for row in changing]), donors.c.status != status)
+            .values(status=status, eligible_from=eligible_from_expression(donors, status=status), updated_at=now),
+            execution_options={'synchronize_session': False}
+        )
+        if result.rowcount != len(changing):
+            raise ConcurrentModification('Donors were modified concurrently')
+
+        record_donor_status_changes(
+            db.session.connection(), Counter((row.status, row.blood_group) for row in changing), status
+        )
+        record_index_changes(db.session, rows=[
+            {
+                'id': row.id, 'blood_group': row.blood_group, 'city': row.city,
+                'latitude': row.latitude, 'longitude': row.longitude,
+                'eligible_from': eligible_from_for(status, row.is_eligible, row.age, row.last_donation_date),
+                'last_donation_date': row.last_donation_date,
+            }
+            for row in changing
+        ])
+
+    return results
+
+
+def _transition_requests(rows, from_statuses, to_status, now):
+    table = BloodRequest.__table__
+    result = db.session.execute(
+        table.update()
+        .where(table.c.id.in_([row.id for row in rows]), table.c.status.in_(from_statuses))
+        .values(status=to_status, updated_at=now),
+        execution_options={'synchronize_session': False}
+    )
+    if result.rowcount != len(rows):
+        raise ConcurrentModification('Requests were modified concurrently')
+
+    connection = db.session.connection()
+    for old_status, count in sorted(Counter(row.status for row in rows).items()):
+        record_status_change(connection, 'requests_status', old_status, to_status, count)
+
+
+def _units_by_group(rows):
+    groups = {}
+    for row in rows:
+        groups.setdefault(row.blood_group, {})[row.id] = row.units
+    return groups
+
+
+def approve_requests(ids):
+    """Approve many pending requests and reserve their units.
+
+    Stock is checked per blood group in aggregate: requests are granted in
+    the order given while the group's available units last, and each
+    group's total is then reserved with one conditional UPDATE. Returns
+    ``{id: (result, error)}`` with 'approved', 'unchanged',
+    'insufficient_stock', 'invalid_transition' or 'not_found'. The caller
+    commits.
+    """
+    now = datetime.utcnow()
+    results = {}
+
+    for chunk in _chunks(ids):
+        rows = _lock(REQUEST_LOCK_COLUMNS, BloodRequest, chunk)
+        pending = []
+        for request_id in chunk:
+            row = rows.get(request_id)
+            if row is None:
+                results[request_id] = ('not_found', None)
+            elif row.status == 'approved':
+                results[request_id] = ('unchanged', None)
+            elif row.status != 'pending':
+                results[request_id] = ('invalid_transition', f"Cannot move a request from '{row.status}' to 'approved'")
+            else:
+                pending.append(row)
+        if not pending:
+            continue
+
+        groups = sorted({row.blood_group for row in pending})
+        available = dict(db.session.execute(
+            select(BloodStock.blood_group, BloodStock.units_available)
+            .where(BloodStock.blood_group.in_(groups))
+            .with_for_update()
+        ).all())
+        approved = []
+        for row in pending:
+            if row.units <= available.get(row.blood_group, 0):
+                available[row.blood_group] -= row.units
+                results[row.id] = ('approved', None)
+                approved.append(row)
+            else:
+                results[row.id] = ('insufficient_stock', f'Insufficient {row.blood_group} stock')
+        if not approved:
+            continue
+
+        _transition_requests(approved, ('pending',), 'approved', now)
+        for group, units_by_request in sorted(_units_by_group(approved).items()):
+            adjust_for_requests(group, 'reserve', units_by_request)
+        notify_requests_approved(approved)
+
+    return {request_id: results[request_id] for request_id in ids}
+
+
+def reject_requests(ids):
+    """Reject many pending or approved requests, releasing reserved units.
+
+    Returns ``{id: (result, error)}`` with 'rejected', 'unchanged',
+    'invalid_transition' or 'not_found'. The caller commits.
+    """
+    now = datetime.utcnow()
+    results = {}
+
+    for chunk in _chunks(ids):
+        rows = _lock(REQUEST_LOCK_COLUMNS, BloodRequest, chunk)
+        rejecting = []
+        for request_id in chunk:
+            row = rows.get(request_id)
+            if row is None:
+                results[request_id] = ('not_found', None)
+            elif row.status == 'rejected':
+                results[request_id] = ('unchanged', None)
+            elif row.status not in ('pending', 'approved'):
+                results[request_id] = ('invalid_transition', f"Cannot move a request from '{row.status}' to 'rejected'")
+            else:
+                results[request_id] = ('rejected', None)
+                rejecting.append(row)
+        if not rejecting:
+            continue
+
+        _transition_requests(rejecting, ('pending', 'approved'), 'rejected', now)
+        reserved = [row for row in rejecting if row.status == 'approved']
+        for group, units_by_request in sorted(_units_by_group(reserved).items()):
+            adjust_for_requests(group, 'release', units_by_request)
+
+    return results
@@ -0,0 +1,296 @@
+import importlib
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from config import Config
+from models import db, BloodRequest, Notification
+
+log = logging.getLogger('bloodlink.notifications')
+
+# Internal channel: a single row written on the request path that the worker
+# expands into one notification per matched donor and channel.
+FANOUT = 'fanout'
+
+PRUNE_INTERVAL = 3600
+
+NOTIFICATION_COLUMNS = [
+    Notification.id, Notification.channel, Notification.kind, Notification.recipient,
+    Notification.subject, Notification.body, Notification.request_id, Notification.attempts,
+]
+
+
+class Sender:
+    """Delivers notifications for the worker.
+
+    ``send`` gets every claimed notification of one channel at once, so an
+    implementation can use a provider's batch API. It returns ``{id: error}``
+    for the ones that failed; raising fails the whole batch. Either way the
+    failures are retried with backoff.
+    """
+
+    def send(self, channel, notifications):
+        raise NotImplementedError
+
+
+class ConsoleSender(Sender):
+    """Logs every notification; the default for development."""
+
+    def send(self, channel, notifications):
+        for n in notifications:
+            log.info('[%s] to %s: %s %s', channel, n.recipient, n.subject or '', n.body)
+        return {}
+
+
+class FileSender(Sender):
+    """Appends notifications as JSON lines to ``NOTIFY_FILE_PATH``; for tests."""
+
+    def __init__(self, path=None):
+        self.path = path or Config.NOTIFY_FILE_PATH
+        self._lock = threading.Lock()
+
+    def send(self, channel, notifications):
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            for n in notifications:
+                f.write(json.dumps({
+                    'id': n.id, 'channel': channel, 'kind': n.kind, 'recipient': n.recipient,
+                    'subject': n.subject, 'body': n.body,
+                }) + '\n')
+        return {}
+
+
+SENDERS = {'console': ConsoleSender, 'file': FileSender}
+
+
+def load_sender(name=None):
+    """A sender by short name, or any ``package.module:Class`` implementing ``Sender``."""
+    name = name or Config.NOTIFY_SENDER
+    if name in SENDERS:
+        return SENDERS[name]()
+    module, _, attribute = name.partition(':')
+    return getattr(importlib.import_module(module), attribute)()
+
+
+def _row(channel, kind, recipient=None, subject=None, body=None, request_id=None):
+    return {
+        'channel': channel, 'kind': kind, 'recipient': recipient, 'subject': subject, 'body': body,
+        'request_id': request_id, 'status': 'pending', 'attempts': 0,
+        'next_attempt_at': datetime.utcnow(), 'created_at': datetime.utcnow(),
+    }
+
+
+def enqueue(rows):
+    """Add notifications to the current transaction; sent after it commits."""
+    if Config.NOTIFY_ENABLED and rows:
+        db.session.execute(Notification.__table__.insert(), rows)
+
+
+def _describe(blood_request):
+    return f'{blood_request.units} unit(s) of {blood_request.blood_group} blood at {blood_request.hospital_name}'
+
+
+def notify_request_created(blood_request):
+    """Confirm a new request to the contact number it was made with."""
+    if 'sms' in Config.NOTIFY_CHANNELS:
+        enqueue([_row(
+            'sms', 'request_received', blood_request.contact,
+            body=f'BloodLink: your request for {_describe(blood_request)} was received (#{blood_request.id}).',
+            request_id=blood_request.id,
+        )])
+
+
+def notify_request_approved(blood_request):
+    """Tell the requester, and queue a call for donors matched off the request path."""
+    notify_requests_approved([blood_request])
+
+
+def notify_requests_approved(blood_requests):
+    """``notify_request_approved`` for many requests in one INSERT."""
+    rows = []
+    for blood_request in blood_requests:
+        rows.append(_row(FANOUT, 'donor_call', request_id=blood_request.id))
+        if 'sms' in Config.NOTIFY_CHANNELS:
+            rows.append(_row(
+                'sms', 'request_approved', blood_request.contact,
+                body=f'BloodLink: your request for {_describe(blood_request)} was approved (#{blood_request.id}).',
+                request_id=blood_request.id,
+            ))
+    enqueue(rows)
+
+
+def _donor_call(blood_request, donor):
+    subject = f'{blood_request.blood_group} blood needed in {blood_request.city}'
+    body = (f'Hi {donor.full_name}, a patient in {blood_request.city} '
+            f'needs {_describe(blood_request)}. You are eligible to donate; please contact '
+            f'the hospital if you can help.')
+    rows = []
+    if 'email' in Config.NOTIFY_CHANNELS and donor.email:
+        rows.append(_row('email', 'donor_call', donor.email, subject, body, blood_request.id))
+    if 'sms' in Config.NOTIFY_CHANNELS and donor.contact:
+        rows.append(_row('sms', 'donor_call', donor.contact, None, f'BloodLink: {subject}. {body}', blood_request.id))
+    return rows
+
+
+def backoff(attempts):
+    """Delay before retry number ``attempts``: exponential, capped, with jitter."""
+    delay = min(Config.NOTIFY_BACKOFF_SECONDS * 2 ** (attempts - 1), Config.NOTIFY_BACKOFF_MAX_SECONDS)
+    return timedelta(seconds=delay / 2 + random.uniform(0, delay / 2))
+
+
+class NotificationWorker:
+    """Drains the notification outbox in batches.
+
+    Each batch is claimed with a conditional UPDATE that leases the rows for
+    ``NOTIFY_LEASE_SECONDS`` and stamps them with a fresh claim token, so
+    several workers can run side by side and a crashed worker's rows come due
+    again. No transaction is held while the
+    sender runs. Failures are retried with exponential backoff and are
+    dead-lettered (``status = 'dead'``) after ``NOTIFY_MAX_ATTEMPTS``.
+    """
+
+    def __init__(self, sender=None):
+        self.sender = sender or load_sender()
+        self._thread = None
+        self._stop = threading.Event()
+        self._pruned_at = 0.0
+
+    def claim(self, now):
+        table = Notification.__table__
+        candidates = db.session.execute(
+            select(table.c.id)
+            .where(table.c.status == 'pending', table.c.next_attempt_at <= now)
+            .order_by(table.c.next_attempt_at, table.c.id)
+            .limit(Config.NOTIFY_BATCH_SIZE)
+        ).scalars().all()
+        if not candidates:
+            db.session.rollback()
+            return []
+
+        # Rows are read back by token rather than by lease, which a
+        # whole-second DATETIME column (MySQL) would not store exactly.
+        token = str(uuid.uuid4())
+        lease = now + timedelta(seconds=Config.NOTIFY_LEASE_SECONDS)
+        db.session.execute(
+            table.update()
+            .where(table.c.id.in_(candidates), table.c.status == 'pending', table.c.next_attempt_at <= now)
+            .values(attempts=table.c.attempts + 1, next_attempt_at=lease, claim_token=token),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+
+        claimed = db.session.execute(
+            select(*NOTIFICATION_COLUMNS)
+            .where(table.c.id.in_(candidates), table.c.claim_token == token)
+            .order_by(table.c.id)
+        ).all()
+        db.session.rollback()
+        return claimed
+
+    def fan_out(self, notifications):
+        """Expand donor calls into per-donor notifications, each in one transaction."""
+        from matching import find_matches
+
+        table = Notification.__table__
+        errors = {}
+        for n in notifications:
+            try:
+                blood_request = db.session.get(BloodRequest, n.request_id) if n.request_id else None
+                rows = []
+                # A request rejected or fulfilled since approval needs no donors.
+                if blood_request is not None and blood_request.status == 'approved':
+                    for donor in find_matches(blood_request, limit=Config.NOTIFY_MAX_DONORS):
+                        rows.extend(_donor_call(blood_request, donor))
+                if rows:
+                    db.session.execute(table.insert(), rows)
+                db.session.execute(
+                    table.update().where(table.c.id == n.id)
+                    .values(status='sent', sent_at=datetime.utcnow(), next_attempt_at=datetime.utcnow())
+                )
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                errors[n.id] = str(e)
+        return errors
+
+    def record(self, claimed, errors, now):
+        table = Notification.__table__
+        sent = [n.id for n in claimed if n.id not in errors]
+        if sent:
+            db.session.execute(
+                table.update().where(table.c.id.in_(sent), table.c.status == 'pending')
+                .values(status='sent', sent_at=now, next_attempt_at=now, last_error=None)
+            )
+        for n in claimed:
+            if n.id not in errors:
+                continue
+            if n.attempts >= Config.NOTIFY_MAX_ATTEMPTS:
+                values = {'status': 'dead', 'next_attempt_at': now}
+                log.warning('Notification %s dead after %s attempts: %s', n.id, n.attempts, errors[n.id])
+            else:
+                values = {'next_attempt_at': now + backoff(n.attempts)}
+            db.session.execute(
+                table.update().where(table.c.id == n.id).values(last_error=errors[n.id][:500], **values)
+            )
+        db.session.commit()
+
+    def run_once(self, now=None):
+        """Claim, deliver and record one batch; returns how many were claimed."""
+        now = now or datetime.utcnow()
+        claimed = self.claim(now)
+        if not claimed:
+            return 0
+
+        by_channel = {}
+        for n in claimed:
+            by_channel.setdefault(n.channel, []).append(n)
+
+        errors = {}
+        for channel, batch in by_channel.items():
+            try:
+                if channel == FANOUT:
+                    errors.update(self.fan_out(batch))
+                else:
+                    errors.update(self.sender.send(channel, batch) or {})
+            except Exception as e:
+                db.session.rollback()
+                errors.update((n.id, f'{type(e).__name__}: {e}') for n in batch)
+
+        self.record(claimed, errors, datetime.utcnow())
+        return len(claimed)
+
+    def prune(self):
+        """Delete sent notifications older than ``NOTIFY_RETENTION_DAYS``."""
+        table = Notification.__table__
+        cutoff = datetime.utcnow() - timedelta(days=Config.NOTIFY_RETENTION_DAYS)
+        result = db.session.execute(
+            table.delete().where(table.c.status == 'sent', table.c.next_attempt_at < cutoff)
+        )
+        db.session.commit()
+        return result.rowcount
+
+    def run(self, app):
+        """Process batches until ``stop()``; sleeps only when the outbox is drained."""
+        while not self._stop.is_set():
+            processed = 0
+            try:
+                with app.app_context():
+                    processed = self.run_once()
+                    if time.monotonic() - self._pruned_at >= PRUNE_INTERVAL:
+                        self._pruned_at = time.monotonic()
+                        self.prune()
+            except Exception:
+                log.exception('Notification batch failed')
+            if processed < Config.NOTIFY_BATCH_SIZE:
+                self._stop.wait(Config.NOTIFY_POLL_INTERVAL)
+
+    def start(self, app):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, args=(app,), name='notifications', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
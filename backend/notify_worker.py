@@ -0,0 +1,35 @@
+from app import create_app
+from notifications import NotificationWorker
+from models import db
+import logging
+import sys
+
+def work():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(message)s')
+    app = create_app()
+    worker = NotificationWorker()
+
+    if '--once' not in sys.argv:
+        print("Delivering notifications (Ctrl+C to stop)...")
+        try:
+            worker.run(app)
+        except KeyboardInterrupt:
+            worker.stop()
+        return
+
+    with app.app_context():
+        try:
+            total = 0
+            while True:
+                processed = worker.run_once()
+                total += processed
+                if processed == 0:
+                    break
+            print(f"Notification outbox drained ({total} notification(s) processed)")
+        except Exception as e:
+            print(f"\nError delivering notifications: {e}")
+            db.session.rollback()
+            sys.exit(1)
+
+if __name__ == '__main__':
+    work()
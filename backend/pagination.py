@@ -0,0 +1,125 @@
+import base64
+import json
+from datetime import datetime
+from flask import request
+from sqlalchemy import or_, and_, text
+from config import Config
+from models import db
+
+
+class CursorError(ValueError):
+    pass
+
+
+def encode_values(*values):
+    payload = json.dumps(list(values))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_values(cursor, count):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except ValueError:
+        raise CursorError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != count:
+        raise CursorError('Invalid cursor')
+    return values
+
+
+def encode_cursor(created_at, row_id):
+    return encode_values(created_at.isoformat() if created_at else None, row_id)
+
+
+def decode_cursor(cursor):
+    created_at, row_id = decode_values(cursor, 2)
+    try:
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise CursorError('Invalid cursor')
+
+
+def get_page_limit(args=None):
+    args = request.args if args is None else args
+    try:
+        limit = int(args.get('limit') or 0)
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        return Config.PAGE_SIZE_DEFAULT
+    return min(limit, Config.PAGE_SIZE_MAX)
+
+
+def wants_total(args=None):
+    args = request.args if args is None else args
+    return args.get('include_total', '').lower() in ('1', 'true', 'yes')
+
+
+def keyset_condition(model, cursor):
+    created_at, row_id = decode_cursor(cursor)
+    return or_(
+        model.created_at < created_at,
+        and_(model.created_at == created_at, model.id < row_id)
+    )
+
+
+def keyset_order(model):
+    return model.created_at.desc(), model.id.desc()
+
+
+def build_page(rows, limit, total=None):
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+
+    page = {
+        'next_cursor': next_cursor,
+        'limit': limit
+    }
+    if total is not None:
+        page['total'] = total
+
+    return rows, page
+
+
+def approximate_total(model, query, filtered):
+    # For an unfiltered MySQL table the InnoDB row estimate avoids a full
+    # index scan; everything else falls back to an exact count.
+    if not filtered and db.engine.dialect.name == 'mysql':
+        estimate = db.session.execute(
+            text(
+                "SELECT table_rows FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = :name"
+            ),
+            {'name': model.__tablename__}
+        ).scalar()
+        if estimate is not None:
+            return int(estimate)
+    return query.order_by(None).count()
+
+
+def page_statement(statement, model, limit, cursor=None):
+    """``statement`` (a Query or select) narrowed to one page, plus one row.
+
+    The extra row tells ``build_page`` whether there is a next page.
+    """
+    if cursor:
+        statement = statement.where(keyset_condition(model, cursor))
+    return statement.order_by(*keyset_order(model)).limit(limit + 1)
+
+
+def paginate(query, model, filtered=False):
+    """Return one keyset page of ``query`` ordered newest first.
+
+    Pages are ordered by ``(created_at, id)`` descending and resume from the
+    opaque ``cursor`` query argument, so each page is an index range read no
+    matter how deep the client has paged.
+    """
+    limit = get_page_limit()
+
+    total = approximate_total(model, query, filtered) if wants_total() else None
+
+    rows = page_statement(query, model, limit, request.args.get('cursor')).all()
+    return build_page(rows, limit, total)
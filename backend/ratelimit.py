@@ -0,0 +1,164 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from flask import request
+from config import Config
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after):
+        super().__init__('Too many attempts, please try again later')
+        self.retry_after = retry_after
+
+
+def parse_limit(value):
+    """``'20/60'`` -> ``(20, 60.0)``: at most 20 attempts per 60 seconds."""
+    count, _, seconds = str(value).partition('/')
+    count, seconds = int(count), float(seconds or 60)
+    if count < 1 or seconds <= 0:
+        raise ValueError(f'Invalid rate limit: {value!r}')
+    return count, seconds
+
+
+class MemoryStore:
+    """Process-local token buckets: a few numbers per key.
+
+    Buckets that have refilled completely carry no information and are
+    swept every ``RATE_LIMIT_SWEEP_SECONDS``; at most ``RATE_LIMIT_MAX_KEYS``
+    are kept, least recently used first out, so a spray of addresses
+    cannot grow memory without bound.
+    """
+
+    def __init__(self, max_keys):
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+        self._swept_at = time.monotonic()
+        self.max_keys = max_keys
+
+    def hit(self, key, capacity, rate, now=None):
+        """Take a token from ``key``'s bucket: ``(allowed, retry_after_seconds)``."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if now - self._swept_at >= Config.RATE_LIMIT_SWEEP_SECONDS:
+                self._sweep(now)
+
+            tokens, stamp, _ = self._buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - stamp) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            # (tokens, last hit, when the bucket is full again)
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+    def _sweep(self, now):
+        self._buckets = OrderedDict((key, bucket) for key, bucket in self._buckets.items() if bucket[2] > now)
+        self._swept_at = now
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def size(self):
+        return len(self._buckets)
+
+
+class RedisStore:
+    """Token buckets shared by all workers; requires the redis package."""
+
+    SCRIPT = """
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'stamp')
+    local capacity, rate, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+    local tokens = tonumber(bucket[1]) or capacity
+    local stamp = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(now - stamp, 0) * rate)
+    local allowed = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'stamp', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url, prefix='bloodlink:ratelimit:'):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+        self._prefix = prefix
+
+    def hit(self, key, capacity, rate, now=None):
+        allowed, tokens = self._script(
+            keys=[self._prefix + key], args=[capacity, rate, time.time() if now is None else now]
+        )
+        return bool(allowed), 0.0 if allowed else (1 - float(tokens)) / rate
+
+    def reset(self, key):
+        self._client.delete(self._prefix + key)
+
+    def size(self):
+        return None
+
+
+class RateLimiter:
+    """Token-bucket limits on named actions, keyed by client address or account.
+
+    A rule named ``login_ip`` uses ``Config.RATE_LIMIT_LOGIN_IP``, e.g.
+    ``'20/60'``: bursts of up to 20, refilled at 20 per 60 seconds. Checks
+    touch only the store, so throttled calls are refused before any
+    database or bcrypt work.
+    """
+
+    def __init__(self):
+        self._store = None
+        self._lock = threading.Lock()
+        self.limited = 0
+
+    @property
+    def store(self):
+        if self._store is None:
+            if Config.RATE_LIMIT_BACKEND == 'redis':
+                self._store = RedisStore(Config.RATE_LIMIT_REDIS_URL)
+            else:
+                self._store = MemoryStore(Config.RATE_LIMIT_MAX_KEYS)
+        return self._store
+
+    def check(self, *rules):
+        """Take a token for each ``(name, key)``; raises RateLimited if any is empty."""
+        if not Config.RATE_LIMIT_ENABLED:
+            return
+        for name, key in rules:
+            if not key:
+                continue
+            capacity, seconds = parse_limit(getattr(Config, f'RATE_LIMIT_{name.upper()}'))
+            allowed, retry_after = self.store.hit(f'{name}:{key}', capacity, capacity / seconds)
+            if not allowed:
+                with self._lock:
+                    self.limited += 1
+                raise RateLimited(max(1, math.ceil(retry_after)))
+
+    def reset(self, name, key):
+        if Config.RATE_LIMIT_ENABLED and key:
+            self.store.reset(f'{name}:{key}')
+
+
+rate_limiter = RateLimiter()
+
+
+def client_ip():
+    """The caller's address, trusting ``RATE_LIMIT_TRUSTED_PROXIES`` X-Forwarded-For hops."""
+    hops = Config.RATE_LIMIT_TRUSTED_PROXIES
+    if hops > 0:
+        forwarded = [part.strip() for part in request.headers.get('X-Forwarded-For', '').split(',') if part.strip()]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return request.remote_addr or 'unknown'
+
+
+def normalize_email(value):
+    return str(value or '').strip().lower()
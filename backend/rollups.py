@@ -0,0 +1,306 @@
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, func, delete, literal, event, inspect, and_, or_, not_, true
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from config import Config
+from models import db, Donor, BloodRequest, Donation, DailyRollup, RollupState, RollupDirtyDay
+
+log = logging.getLogger('bloodlink.rollups')
+
+GRANULARITIES = ('day', 'week', 'month')
+
+REQUEST_DIMENSIONS = {
+    'status': BloodRequest.status,
+    'urgency': BloodRequest.urgency,
+    'blood_group': BloodRequest.blood_group,
+    'city': BloodRequest.city,
+}
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+def _day_bounds(start, end):
+    return datetime.combine(start, datetime.min.time()), datetime.combine(end + timedelta(days=1), datetime.min.time())
+
+
+def _rows(query, metric, dimension_name=None):
+    for day, dimension, value in query:
+        if dimension_name:
+            # DailyRollup.dimension is wide enough for the longest source
+            # column, so distinct values never collide in the primary key.
+            dimension = f'{dimension_name}:{dimension}'
+        yield {'day': _as_date(day), 'metric': metric, 'dimension': dimension or '', 'value': int(value or 0)}
+
+
+def _aggregate_donors(start, end):
+    lower, upper = _day_bounds(start, end)
+    day = func.date(Donor.created_at)
+    query = db.session.execute(
+        select(day, literal(''), func.count(Donor.id))
+        .where(Donor.created_at >= lower, Donor.created_at < upper)
+        .group_by(day)
+    )
+    yield from _rows(query, 'donors')
+
+
+def _aggregate_requests(start, end):
+    lower, upper = _day_bounds(start, end)
+    day = func.date(BloodRequest.created_at)
+    window = (BloodRequest.created_at >= lower, BloodRequest.created_at < upper)
+
+    yield from _rows(db.session.execute(
+        select(day, literal(''), func.count(BloodRequest.id)).where(*window).group_by(day)
+    ), 'requests')
+
+    for name, column in REQUEST_DIMENSIONS.items():
+        yield from _rows(db.session.execute(
+            select(day, column, func.count(BloodRequest.id)).where(*window).group_by(day, column)
+        ), 'requests', name)
+
+
+def _aggregate_donations(start, end):
+    lower, upper = _day_bounds(start, end)
+    day = func.date(Donation.created_at)
+    window = (Donation.created_at >= lower, Donation.created_at < upper)
+
+    yield from _rows(db.session.execute(
+        select(day, literal(''), func.count(Donation.id)).where(*window).group_by(day)
+    ), 'donations')
+
+    yield from _rows(db.session.execute(
+        select(day, literal(''), func.sum(Donation.units)).where(*window).group_by(day)
+    ), 'donation_units')
+
+    yield from _rows(db.session.execute(
+        select(day, Donor.blood_group, func.sum(Donation.units))
+        .join(Donor, Donor.id == Donation.donor_id)
+        .where(*window).group_by(day, Donor.blood_group)
+    ), 'donation_units', 'blood_group')
+
+    yield from _rows(db.session.execute(
+        select(day, Donation.location, func.sum(Donation.units)).where(*window).group_by(day, Donation.location)
+    ), 'donation_units', 'location')
+
+
+# source -> (day expression, change-tracking column, metrics, aggregate function)
+SOURCES = {
+    'donors': (func.date(Donor.created_at), Donor.updated_at, ['donors'], _aggregate_donors),
+    'requests': (func.date(BloodRequest.created_at), BloodRequest.updated_at, ['requests'], _aggregate_requests),
+    'donations': (func.date(Donation.created_at), Donation.created_at, ['donations', 'donation_units'], _aggregate_donations),
+}
+
+
+# model -> (source, attribute holding the day the row is counted on)
+DAY_ATTRIBUTES = {
+    Donor: ('donors', 'created_at'),
+    BloodRequest: ('requests', 'created_at'),
+    Donation: ('donations', 'created_at'),
+}
+
+
+@event.listens_for(Session, 'after_flush')
+def _mark_vacated_days(session, flush_context):
+    # A deleted row, or one moved to another day, leaves nothing behind for
+    # the updated_at high-water mark to find, so note the day it left.
+    rows = []
+    for obj in session.deleted:
+        if type(obj) in DAY_ATTRIBUTES:
+            source, attr = DAY_ATTRIBUTES[type(obj)]
+            history = inspect(obj).attrs[attr].history
+            rows.append((source, history.deleted[0] if history.deleted else getattr(obj, attr)))
+    for obj in session.dirty:
+        if type(obj) in DAY_ATTRIBUTES:
+            source, attr = DAY_ATTRIBUTES[type(obj)]
+            rows.extend((source, day) for day in inspect(obj).attrs[attr].history.deleted)
+
+    rows = {(source, _as_date(day)) for source, day in rows if day is not None}
+    if rows:
+        session.connection().execute(
+            RollupDirtyDay.__table__.insert(), [{'source': source, 'day': day} for source, day in sorted(rows)]
+        )
+
+
+def _runs(days):
+    """Group sorted days into contiguous (start, end) ranges."""
+    runs = []
+    for day in sorted(days):
+        if runs and day == runs[-1][1] + timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return runs
+
+
+def _changed_days(name, state):
+    """Days of ``name`` changed since ``state`` was refreshed: what the next refresh recomputes."""
+    day_expr, change_column, _, _ = SOURCES[name]
+    dirty = RollupDirtyDay.__table__
+    days = db.session.execute(select(dirty.c.day).where(dirty.c.source == name)).scalars().all()
+    days += db.session.execute(select(day_expr).distinct().where(change_column > state.high_water)).scalars().all()
+    return {_as_date(day) for day in days if day is not None}
+
+
+def refresh_source(name, full=False):
+    day_expr, change_column, metrics, aggregate = SOURCES[name]
+    now = datetime.utcnow()
+
+    state = db.session.query(RollupState).filter_by(source=name).with_for_update().first()
+    if state is None:
+        try:
+            with db.session.begin_nested():
+                db.session.add(RollupState(source=name, high_water=datetime.min, refreshed_at=now))
+        except IntegrityError:
+            # Another process created the row first; its refresh covers this run.
+            db.session.rollback()
+            return 0
+        state = db.session.query(RollupState).filter_by(source=name).with_for_update().one()
+        full = True
+
+    dirty = RollupDirtyDay.__table__
+    marked = db.session.execute(select(dirty.c.id, dirty.c.day).where(dirty.c.source == name)).all()
+
+    query = select(day_expr).distinct()
+    if not full:
+        query = query.where(change_column > state.high_water)
+    days = {_as_date(day) for day in db.session.execute(query).scalars() if day is not None}
+
+    if full:
+        db.session.execute(delete(DailyRollup).where(DailyRollup.metric.in_(metrics)))
+    else:
+        days.update(_as_date(day) for _, day in marked)
+    if marked:
+        db.session.execute(delete(dirty).where(dirty.c.source == name, dirty.c.id <= max(i for i, _ in marked)))
+
+    for start, end in _runs(days):
+        if not full:
+            db.session.execute(delete(DailyRollup).where(
+                DailyRollup.metric.in_(metrics), DailyRollup.day >= start, DailyRollup.day <= end
+            ))
+        rows = [row for row in aggregate(start, end) if row['value']]
+        if rows:
+            db.session.execute(DailyRollup.__table__.insert(), rows)
+
+    # Rows committed late by slow transactions are picked up on the next run
+    # because the high-water mark trails the refresh time.
+    state.high_water = now - timedelta(seconds=Config.ROLLUP_LAG_SECONDS)
+    state.refreshed_at = now
+    db.session.commit()
+    return len(days)
+
+
+def refresh_rollups(full=False):
+    return {name: refresh_source(name, full=full) for name in SOURCES}
+
+
+class RollupRefresher:
+    """Runs at most one refresh at a time, ``ROLLUP_REFRESH_INTERVAL`` apart, off the request path."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._finished_at = None
+
+    def trigger(self, app):
+        """Start a refresh if one is due; returns whether one was started."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            if self._finished_at is not None and time.monotonic() - self._finished_at < Config.ROLLUP_REFRESH_INTERVAL:
+                return False
+            self._thread = threading.Thread(target=self._run, args=(app,), name='rollups', daemon=True)
+            self._thread.start()
+            return True
+
+    def _run(self, app):
+        try:
+            with app.app_context():
+                refresh_rollups()
+        except Exception:
+            log.exception('Rollup refresh failed')
+        finally:
+            with self._lock:
+                self._finished_at = time.monotonic()
+
+    def join(self, timeout=None):
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+
+rollup_refresher = RollupRefresher()
+
+
+def period_key(day, granularity):
+    if granularity == 'week':
+        return (day - timedelta(days=day.weekday())).isoformat()
+    if granularity == 'month':
+        return day.strftime('%Y-%m')
+    return day.isoformat()
+
+
+def _live_rows(start, end):
+    """Live rows for days the rollups do not reflect yet, and filters for the rollups they replace."""
+    rows, stale = [], []
+    # Read before the rollups: a refresh in between only makes more of them current.
+    states = {state.source: state for state in db.session.query(RollupState)}
+    for name, (_, _, metrics, aggregate) in SOURCES.items():
+        if name in states:
+            days = {day for day in _changed_days(name, states[name]) if start <= day <= end}
+        else:
+            days = {start + timedelta(days=i) for i in range((end - start).days + 1)}
+        for run_start, run_end in _runs(days):
+            rows.extend(aggregate(run_start, run_end))
+        if days:
+            stale.append(and_(DailyRollup.metric.in_(metrics), DailyRollup.day.in_(sorted(days))))
+    return rows, stale
+
+
+def build_report(start, end, granularity='day'):
+    """Summarize activity between ``start`` and ``end`` (inclusive)."""
+    live, stale = _live_rows(start, end)
+    window = (DailyRollup.day >= start, DailyRollup.day <= end, not_(or_(*stale)) if stale else true())
+
+    series = {}
+    daily = db.session.execute(
+        select(DailyRollup.day, DailyRollup.metric, DailyRollup.value).where(*window, DailyRollup.dimension == '')
+    ).all()
+    for day, metric, value in daily + [(r['day'], r['metric'], r['value']) for r in live if not r['dimension']]:
+        period = series.setdefault(period_key(_as_date(day), granularity), {
+            'new_donors': 0, 'new_requests': 0, 'new_donations': 0, 'donation_units': 0
+        })
+        key = {'donors': 'new_donors', 'requests': 'new_requests', 'donations': 'new_donations'}.get(metric, metric)
+        period[key] += value
+
+    breakdown = {}
+    grouped = db.session.execute(
+        select(DailyRollup.metric, DailyRollup.dimension, func.sum(DailyRollup.value))
+        .where(*window, DailyRollup.dimension != '')
+        .group_by(DailyRollup.metric, DailyRollup.dimension)
+    ).all()
+    for metric, dimension, value in grouped + [(r['metric'], r['dimension'], r['value']) for r in live if r['dimension']]:
+        name, _, key = dimension.partition(':')
+        counts = breakdown.setdefault(metric, {}).setdefault(name, {})
+        counts[key] = counts.get(key, 0) + int(value)
+
+    totals = {'new_donors': 0, 'new_requests': 0, 'new_donations': 0, 'donation_units': 0}
+    for period in series.values():
+        for key in totals:
+            totals[key] += period[key]
+
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'granularity': granularity,
+        'totals': totals,
+        'series': [{'period': key, **values} for key, values in sorted(series.items())],
+        'breakdown': breakdown,
+    }
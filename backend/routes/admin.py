@@ -1,88 +1,152 @@
-from flask import Blueprint, request, jsonify
-from models import db, Admin, Donor, BloodRequest, BloodStock, Donation
+from flask import Blueprint, request, jsonify, Response, stream_with_context, g, current_app
+from models import db, Admin, Donor, BloodRequest, BloodStock, Donation, StockLedger, Notification
 from datetime import datetime, timedelta
+from config import Config
+from pagination import paginate, get_page_limit, CursorError
+from token_auth import authenticate
+from stock import (reserve_for_request, fulfil_request, reject_request as release_request,
+                   record_adjustment, InsufficientStock, InvalidTransition)
+from serializers import DONOR_COLUMNS, REQUEST_COLUMNS, rows_to_dicts
+from conditional import ResultValidator
+from listing import stats_response, stock_body, DASHBOARD_STATS, STOCK_VERSION_STATEMENT, STOCK_ROWS_STATEMENT
+from export import stream_export, DATASETS, FORMATS
+from rollups import rollup_refresher, build_report, GRANULARITIES
+from cache import cached_aggregate, aggregate_cache
+from triage import next_requests, claim_requests, release_claim, QueueError
+from notifications import notify_request_approved
+from filters import REQUEST_FILTERS
+from moderation import (approve_requests, reject_requests, select_targets, summarize,
+                        ModerationError, ConcurrentModification)
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 
+# Read-only aggregates served to the public analytics page.
+PUBLIC_ENDPOINTS = {'admin.get_dashboard_stats'}
+
+@admin_bp.before_request
+def require_admin():
+    if request.method == 'OPTIONS' or request.endpoint in PUBLIC_ENDPOINTS:
+        return None
+    return authenticate(['admin'])
+
+
 @admin_bp.route('/dashboard/stats', methods=['GET'])
+@cached_aggregate(DASHBOARD_STATS.name, tags=DASHBOARD_STATS.tags)
 def get_dashboard_stats():
     try:
-        total_donors = Donor.query.count()
-        total_requests = BloodRequest.query.count()
-        approved_requests = BloodRequest.query.filter_by(status='approved').count()
-        pending_requests = BloodRequest.query.filter_by(status='pending').count()
-        total_donations = Donation.query.count()
+        return stats_response(DASHBOARD_STATS)
 
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        recent_donors = Donor.query.filter(Donor.created_at >= thirty_days_ago).count()
-        recent_requests = BloodRequest.query.filter(BloodRequest.created_at >= thirty_days_ago).count()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        blood_groups_count = db.session.query(
-            Donor.blood_group,
-            db.func.count(Donor.id)
-        ).filter_by(status='approved').group_by(Donor.blood_group).all()
+
+@admin_bp.route('/donors/pending', methods=['GET'])
+def get_pending_donors():
+    try:
+        query = Donor.query.with_entities(*DONOR_COLUMNS).filter_by(status='pending')
+        donors, page = paginate(query, Donor, filtered=True)
 
         return jsonify({
-            'total_donors': total_donors,
-            'total_requests': total_requests,
-            'approved_requests': approved_requests,
-            'pending_requests': pending_requests,
-            'total_donations': total_donations,
-            'recent_donors': recent_donors,
-            'recent_requests': recent_requests,
-            'blood_group_distribution': {group: count for group, count in blood_groups_count}
+            'donors': rows_to_dicts(donors),
+            **page
         }), 200
 
+    except CursorError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
-@admin_bp.route('/donors/pending', methods=['GET'])
-def get_pending_donors():
+@admin_bp.route('/requests/pending', methods=['GET'])
+def get_pending_requests():
     try:
-        donors = Donor.query.filter_by(status='pending').order_by(
-            Donor.created_at.desc()
-        ).all()
+        query = BloodRequest.query.with_entities(*REQUEST_COLUMNS).filter_by(status='pending')
+        requests, page = paginate(query, BloodRequest, filtered=True)
 
         return jsonify({
-            'donors': [donor.to_dict() for donor in donors]
+            'requests': rows_to_dicts(requests),
+            **page
         }), 200
 
+    except CursorError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
-@admin_bp.route('/requests/pending', methods=['GET'])
-def get_pending_requests():
+def _queue_entries(rows, priorities):
+    return [{**row._asdict(), 'priority': priority} for row, priority in zip(rows, priorities)]
+
+
+@admin_bp.route('/requests/queue', methods=['GET'])
+def get_request_queue():
     try:
-        requests = BloodRequest.query.filter_by(status='pending').order_by(
-            BloodRequest.created_at.desc()
-        ).all()
+        rows, priorities = next_requests(get_page_limit(request.args))
 
         return jsonify({
-            'requests': [req.to_dict() for req in requests]
+            'requests': _queue_entries(rows, priorities)
         }), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@admin_bp.route('/requests/queue/claim', methods=['POST'])
+def claim_from_queue():
+    try:
+        data = request.get_json(silent=True) or {}
+        count = data.get('count', 1)
+        if not isinstance(count, int) or isinstance(count, bool) or not 1 <= count <= Config.QUEUE_CLAIM_MAX:
+            return jsonify({'error': f'count must be between 1 and {Config.QUEUE_CLAIM_MAX}'}), 400
+
+        rows, priorities, until = claim_requests(g.auth['user_id'], count)
+
+        return jsonify({
+            'requests': _queue_entries(rows, priorities),
+            'claimed_until': until.isoformat()
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_bp.route('/requests/<int:request_id>/release', methods=['POST'])
+def release_from_queue(request_id):
+    try:
+        if not release_claim(request_id, g.auth['user_id']):
+            return jsonify({'error': 'Request not found'}), 404
+
+        return jsonify({'message': 'Request returned to the queue'}), 200
+
+    except QueueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
 @admin_bp.route('/blood-stock', methods=['GET'])
 def get_blood_stock():
     try:
-        stock = BloodStock.query.all()
+        last_modified, count = db.session.execute(STOCK_VERSION_STATEMENT).one()
 
-        if not stock:
+        if not count:
             blood_groups = ['A+', 'A-', 'B+', 'B-', 'O+', 'O-', 'AB+', 'AB-']
             for group in blood_groups:
                 new_stock = BloodStock(blood_group=group, units_available=0)
                 db.session.add(new_stock)
             db.session.commit()
-            stock = BloodStock.query.all()
+            last_modified, count = db.session.execute(STOCK_VERSION_STATEMENT).one()
 
-        return jsonify({
-            'stock': [s.to_dict() for s in stock]
-        }), 200
+        validator = ResultValidator('blood-stock', last_modified, count, count=count)
+        if validator.not_modified():
+            return validator.not_modified_response()
+
+        stock = db.session.execute(STOCK_ROWS_STATEMENT).all()
+
+        return validator.apply(jsonify(stock_body(stock))), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -98,11 +162,20 @@ def update_blood_stock(stock_id):
 
         data = request.get_json()
 
+        available_before = stock.units_available or 0
+        reserved_before = stock.units_reserved or 0
+
         if 'units_available' in data:
             stock.units_available = data['units_available']
         if 'units_reserved' in data:
             stock.units_reserved = data['units_reserved']
 
+        record_adjustment(
+            stock,
+            stock.units_available - available_before,
+            stock.units_reserved - reserved_before
+        )
+
         stock.last_updated = datetime.utcnow()
 
         db.session.commit()
@@ -120,25 +193,44 @@ def update_blood_stock(stock_id):
 @admin_bp.route('/requests/<int:request_id>/approve', methods=['POST'])
 def approve_request(request_id):
     try:
-        blood_request = BloodRequest.query.get(request_id)
-
-        if not blood_request:
+        if not reserve_for_request(request_id):
             return jsonify({'error': 'Request not found'}), 404
 
-        blood_request.status = 'approved'
-        blood_request.updated_at = datetime.utcnow()
+        notify_request_approved(db.session.get(BloodRequest, request_id))
+        db.session.commit()
 
-        stock = BloodStock.query.filter_by(blood_group=blood_request.blood_group).first()
-        if stock and stock.units_available >= blood_request.units:
-            stock.units_available -= blood_request.units
+        return jsonify({
+            'message': 'Request approved successfully',
+            'request': BloodRequest.query.get(request_id).to_dict()
+        }), 200
+
+    except InsufficientStock as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 409
+    except InvalidTransition as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_bp.route('/requests/<int:request_id>/fulfil', methods=['POST'])
+def fulfil_blood_request(request_id):
+    try:
+        if not fulfil_request(request_id):
+            return jsonify({'error': 'Request not found'}), 404
 
         db.session.commit()
 
         return jsonify({
-            'message': 'Request approved successfully',
-            'request': blood_request.to_dict()
+            'message': 'Request fulfilled',
+            'request': BloodRequest.query.get(request_id).to_dict()
         }), 200
 
+    except (InsufficientStock, InvalidTransition) as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -147,19 +239,120 @@ def approve_request(request_id):
 @admin_bp.route('/requests/<int:request_id>/reject', methods=['POST'])
 def reject_request(request_id):
     try:
-        blood_request = BloodRequest.query.get(request_id)
-
-        if not blood_request:
+        if not release_request(request_id):
             return jsonify({'error': 'Request not found'}), 404
 
-        blood_request.status = 'rejected'
-        blood_request.updated_at = datetime.utcnow()
-
         db.session.commit()
 
         return jsonify({
             'message': 'Request rejected',
-            'request': blood_request.to_dict()
+            'request': BloodRequest.query.get(request_id).to_dict()
+        }), 200
+
+    except (InsufficientStock, InvalidTransition) as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+def bulk_moderate(moderate, status):
+    try:
+        ids, has_more = select_targets(BloodRequest, REQUEST_FILTERS, request.get_json(silent=True))
+        results = moderate(ids)
+        db.session.commit()
+
+        summary = summarize(results)
+        return jsonify({
+            'message': f"{summary['counts'].get(status, 0)} of {len(ids)} requests {status}",
+            **summary,
+            'has_more': has_more
+        }), 200
+
+    except ModerationError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except ConcurrentModification as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 409
+    except InsufficientStock as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_bp.route('/requests/bulk/approve', methods=['POST'])
+def bulk_approve_requests():
+    return bulk_moderate(approve_requests, 'approved')
+
+
+@admin_bp.route('/requests/bulk/reject', methods=['POST'])
+def bulk_reject_requests():
+    return bulk_moderate(reject_requests, 'rejected')
+
+
+@admin_bp.route('/blood-stock/ledger', methods=['GET'])
+def get_stock_ledger():
+    try:
+        query = StockLedger.query
+
+        blood_group = request.args.get('blood_group')
+        if blood_group:
+            query = query.filter_by(blood_group=blood_group)
+
+        limit = min(request.args.get('limit', 100, type=int), 1000)
+        entries = query.order_by(StockLedger.id.desc()).limit(limit).all()
+
+        return jsonify({
+            'entries': [entry.to_dict() for entry in entries]
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_bp.route('/notifications', methods=['GET'])
+def get_notifications():
+    try:
+        status = request.args.get('status', 'dead')
+        if status not in ('pending', 'sent', 'dead'):
+            return jsonify({'error': 'status must be pending, sent or dead'}), 400
+
+        limit = max(1, min(request.args.get('limit', 100, type=int), 1000))
+        notifications = (
+            Notification.query.filter_by(status=status)
+            .order_by(Notification.next_attempt_at.desc(), Notification.id.desc())
+            .limit(limit).all()
+        )
+
+        return jsonify({
+            'notifications': [n.to_dict() for n in notifications]
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_bp.route('/notifications/<int:notification_id>/retry', methods=['POST'])
+def retry_notification(notification_id):
+    try:
+        notification = db.session.get(Notification, notification_id)
+        if notification is None:
+            return jsonify({'error': 'Notification not found'}), 404
+        if notification.status != 'dead':
+            return jsonify({'error': 'Only dead notifications can be retried'}), 409
+
+        notification.status = 'pending'
+        notification.attempts = 0
+        notification.next_attempt_at = datetime.utcnow()
+        db.session.commit()
+
+        return jsonify({
+            'message': 'Notification queued for retry',
+            'notification': notification.to_dict()
         }), 200
 
     except Exception as e:
@@ -167,22 +360,89 @@ def reject_request(request_id):
         return jsonify({'error': str(e)}), 500
 
 
+@admin_bp.route('/export/<dataset>', methods=['GET'])
+def export_dataset(dataset):
+    try:
+        if dataset not in DATASETS:
+            return jsonify({'error': f'Unknown dataset: {dataset}'}), 404
+
+        fmt = request.args.get('format', 'ndjson')
+        if fmt not in FORMATS:
+            return jsonify({'error': 'format must be ndjson or csv'}), 400
+
+        model, columns, fields = DATASETS[dataset]
+        timestamp = datetime.utcnow().strftime('%Y%m%d%H%M%S')
+
+        return Response(
+            stream_with_context(stream_export(model, columns, fields, fmt)),
+            mimetype=FORMATS[fmt],
+            headers={
+                'Content-Disposition': f'attachment; filename={dataset}-{timestamp}.{fmt}',
+                'X-Accel-Buffering': 'no'
+            }
+        )
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @admin_bp.route('/reports/monthly', methods=['GET'])
+@cached_aggregate('monthly_report', tags=['donors', 'blood_requests', 'donations', 'daily_rollups'])
 def get_monthly_report():
     try:
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+        rollup_refresher.trigger(current_app._get_current_object())
 
-        new_donors = Donor.query.filter(Donor.created_at >= thirty_days_ago).count()
-        new_requests = BloodRequest.query.filter(BloodRequest.created_at >= thirty_days_ago).count()
-        new_donations = Donation.query.filter(Donation.created_at >= thirty_days_ago).count()
+        today = datetime.utcnow().date()
+        report = build_report(today - timedelta(days=30), today)
 
         return jsonify({
             'period': '30_days',
-            'new_donors': new_donors,
-            'new_requests': new_requests,
-            'new_donations': new_donations,
+            'new_donors': report['totals']['new_donors'],
+            'new_requests': report['totals']['new_requests'],
+            'new_donations': report['totals']['new_donations'],
             'generated_at': datetime.utcnow().isoformat()
         }), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+
+@admin_bp.route('/reports', methods=['GET'])
+@cached_aggregate('range_report', tags=['donors', 'blood_requests', 'donations', 'daily_rollups'])
+def get_report():
+    try:
+        today = datetime.utcnow().date()
+        try:
+            end = datetime.strptime(request.args.get('end', today.isoformat()), '%Y-%m-%d').date()
+            start = datetime.strptime(
+                request.args.get('start', (end - timedelta(days=30)).isoformat()), '%Y-%m-%d'
+            ).date()
+        except ValueError:
+            return jsonify({'error': 'start and end must be YYYY-MM-DD'}), 400
+
+        granularity = request.args.get('granularity', 'day')
+        if granularity not in GRANULARITIES:
+            return jsonify({'error': 'granularity must be day, week or month'}), 400
+        if start > end:
+            return jsonify({'error': 'start must not be after end'}), 400
+        if (end - start).days > Config.REPORT_MAX_DAYS:
+            return jsonify({'error': f'Range is limited to {Config.REPORT_MAX_DAYS} days'}), 400
+
+        rollup_refresher.trigger(current_app._get_current_object())
+
+        return jsonify({
+            **build_report(start, end, granularity),
+            'generated_at': datetime.utcnow().isoformat()
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_bp.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    try:
+        return jsonify({'aggregate_cache': aggregate_cache.stats()}), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -3,12 +3,29 @@ from models import db, Donor, Admin
 import jwt
 from datetime import datetime, timedelta
 from config import Config
+from hashing import HashingBusy
+from geo import parse_coordinates, GeoError
+from token_auth import get_request_token, verify_token, revoke_token, TokenError
+from ratelimit import rate_limiter, client_ip, normalize_email, RateLimited
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
+def busy_response():
+    response = jsonify({'error': 'Server is busy, please try again shortly'})
+    response.headers['Retry-After'] = str(Config.BCRYPT_RETRY_AFTER)
+    return response, 503
+
+
+def limited_response(error):
+    response = jsonify({'error': str(error)})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 429
+
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     try:
+        rate_limiter.check(('register_ip', client_ip()))
         data = request.get_json()
 
         required_fields = ['fullName', 'age', 'gender', 'bloodGroup', 'contact', 'email', 'city', 'password']
@@ -16,12 +33,24 @@ def register():
             if field not in data:
                 return jsonify({'error': f'Missing required field: {field}'}), 400
 
+        rate_limiter.check(('register_email', normalize_email(data['email'])))
+
+        try:
+            age = int(data['age'])
+        except (TypeError, ValueError):
+            return jsonify({'error': 'age must be a whole number'}), 400
+
+        try:
+            point = parse_coordinates(data)
+        except GeoError as e:
+            return jsonify({'error': str(e)}), 400
+
         if Donor.query.filter_by(email=data['email']).first():
             return jsonify({'error': 'Email already registered'}), 400
 
         new_donor = Donor(
             full_name=data['fullName'],
-            age=data['age'],
+            age=age,
             gender=data['gender'],
             blood_group=data['bloodGroup'],
             contact=data['contact'],
@@ -29,6 +58,8 @@ def register():
             city=data['city'],
             status='pending'
         )
+        if point:
+            new_donor.latitude, new_donor.longitude = point
         new_donor.set_password(data['password'])
 
         db.session.add(new_donor)
@@ -39,6 +70,11 @@ def register():
             'donor': new_donor.to_dict()
         }), 201
 
+    except RateLimited as e:
+        return limited_response(e)
+    except HashingBusy:
+        db.session.rollback()
+        return busy_response()
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -47,11 +83,15 @@ def register():
 @auth_bp.route('/login', methods=['POST'])
 def login():
     try:
+        rate_limiter.check(('login_ip', client_ip()))
         data = request.get_json()
 
         if not data.get('email') or not data.get('password'):
             return jsonify({'error': 'Email and password are required'}), 400
 
+        email = normalize_email(data['email'])
+        rate_limiter.check(('login_email', email))
+
         role = data.get('role', 'user')
 
         if role == 'admin':
@@ -64,9 +104,19 @@ def login():
         if not user or not user.check_password(data['password']):
             return jsonify({'error': 'Invalid credentials'}), 401
 
+        # Only failed attempts should count against the account.
+        rate_limiter.reset('login_email', email)
+
         if user_type == 'donor' and user.status != 'approved':
             return jsonify({'error': 'Your account is pending approval'}), 403
 
+        if user.password_needs_rehash():
+            try:
+                user.set_password(data['password'])
+                db.session.commit()
+            except HashingBusy:
+                db.session.rollback()
+
         token = jwt.encode({
             'user_id': user.id,
             'email': user.email,
@@ -81,21 +131,23 @@ def login():
             'type': user_type
         }), 200
 
+    except RateLimited as e:
+        return limited_response(e)
+    except HashingBusy:
+        db.session.rollback()
+        return busy_response()
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @auth_bp.route('/verify', methods=['GET'])
-def verify_token():
+def verify():
     try:
-        token = request.headers.get('Authorization')
+        token = get_request_token()
         if not token:
             return jsonify({'error': 'No token provided'}), 401
 
-        if token.startswith('Bearer '):
-            token = token[7:]
-
-        payload = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=['HS256'])
+        payload = verify_token(token)
 
         return jsonify({
             'valid': True,
@@ -103,9 +155,24 @@ def verify_token():
             'type': payload['type']
         }), 200
 
-    except jwt.ExpiredSignatureError:
-        return jsonify({'error': 'Token expired'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'error': 'Invalid token'}), 401
+    except TokenError as e:
+        return jsonify({'error': str(e)}), 401
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@auth_bp.route('/logout', methods=['POST'])
+def logout():
+    try:
+        token = get_request_token()
+        if not token:
+            return jsonify({'error': 'No token provided'}), 401
+
+        revoke_token(token)
+
+        return jsonify({'message': 'Logged out successfully'}), 200
+
+    except TokenError as e:
+        return jsonify({'error': str(e)}), 401
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1,10 +1,19 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
 from models import db, BloodRequest, Donor
 from datetime import datetime
+from pagination import get_page_limit, CursorError
+from serializers import REQUEST_COLUMNS, rows_to_dicts
+from listing import list_response, REQUEST_LIST
+from token_auth import auth_required, auth_optional
+from stock import reject_request as release_request
+from matching import find_matches, COMPATIBLE_DONORS
+from geo import nearby_donors, parse_coordinates, parse_radius, GeoError
+from notifications import notify_request_created
 
 blood_request_bp = Blueprint('blood_requests', __name__, url_prefix='/api/blood-requests')
 
 @blood_request_bp.route('/', methods=['POST'])
+@auth_optional
 def create_request():
     try:
         data = request.get_json()
@@ -14,6 +23,11 @@ def create_request():
             if field not in data:
                 return jsonify({'error': f'Missing required field: {field}'}), 400
 
+        try:
+            point = parse_coordinates(data)
+        except GeoError as e:
+            return jsonify({'error': str(e)}), 400
+
         new_request = BloodRequest(
             name=data['name'],
             contact=data['contact'],
@@ -22,10 +36,17 @@ def create_request():
             hospital_name=data['hospitalName'],
             city=data['city'],
             message=data.get('message', ''),
+            urgency=data.get('urgency') or 'normal',
             status='pending'
         )
+        if point:
+            new_request.latitude, new_request.longitude = point
+        if g.auth and g.auth.get('type') == 'donor':
+            new_request.donor_id = g.auth.get('user_id')
 
         db.session.add(new_request)
+        db.session.flush()
+        notify_request_created(new_request)
         db.session.commit()
 
         return jsonify({
@@ -39,43 +60,91 @@ def create_request():
 
 
 @blood_request_bp.route('/', methods=['GET'])
+@auth_optional
 def get_all_requests():
     try:
-        status = request.args.get('status')
-        blood_group = request.args.get('blood_group')
+        return list_response(REQUEST_LIST)
+
+    except CursorError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 
-        query = BloodRequest.query
+@blood_request_bp.route('/<int:request_id>', methods=['GET'])
+@auth_required('admin', 'donor')
+def get_request(request_id):
+    try:
+        blood_request = BloodRequest.query.get(request_id)
 
-        if status:
-            query = query.filter_by(status=status)
-        if blood_group:
-            query = query.filter_by(blood_group=blood_group)
+        if not blood_request:
+            return jsonify({'error': 'Request not found'}), 404
+
+        # Donors may only read requests linked to their own account.
+        if g.auth.get('type') != 'admin' and blood_request.donor_id != g.auth.get('user_id'):
+            return jsonify({'error': 'Not authorized'}), 403
+
+        return jsonify({'request': blood_request.to_dict()}), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        requests = query.order_by(BloodRequest.created_at.desc()).all()
+
+@blood_request_bp.route('/<int:request_id>/matches', methods=['GET'])
+@auth_required('admin')
+def get_request_matches(request_id):
+    try:
+        blood_request = BloodRequest.query.get(request_id)
+
+        if not blood_request:
+            return jsonify({'error': 'Request not found'}), 404
+
+        limit = request.args.get('limit')
+        if limit is not None and not (limit.isdigit() and int(limit) > 0):
+            return jsonify({'error': 'limit must be a positive integer'}), 400
+        donors = find_matches(blood_request, limit=get_page_limit())
 
         return jsonify({
-            'requests': [req.to_dict() for req in requests]
+            'request': blood_request.to_dict(),
+            'matches': [donor.to_dict() for donor in donors],
+            'total': len(donors)
         }), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
-@blood_request_bp.route('/<int:request_id>', methods=['GET'])
-def get_request(request_id):
+@blood_request_bp.route('/<int:request_id>/nearby', methods=['GET'])
+@auth_required('admin')
+def get_nearby_donors(request_id):
     try:
         blood_request = BloodRequest.query.get(request_id)
 
         if not blood_request:
             return jsonify({'error': 'Request not found'}), 404
+        if blood_request.latitude is None or blood_request.longitude is None:
+            return jsonify({'error': 'Request location is unknown; set its latitude and longitude'}), 400
 
-        return jsonify({'request': blood_request.to_dict()}), 200
+        radius = parse_radius(request.args)
+        rows, distances = nearby_donors(
+            blood_request.latitude, blood_request.longitude, radius,
+            COMPATIBLE_DONORS.get(blood_request.blood_group, []), get_page_limit()
+        )
+
+        return jsonify({
+            'request': blood_request.to_dict(),
+            'donors': [{**row._asdict(), 'distance_km': round(km, 2)} for row, km in zip(rows, distances)],
+            'radius_km': radius
+        }), 200
 
+    except GeoError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @blood_request_bp.route('/<int:request_id>', methods=['PUT'])
+@auth_required('admin')
 def update_request(request_id):
     try:
         blood_request = BloodRequest.query.get(request_id)
@@ -89,6 +158,9 @@ def update_request(request_id):
             blood_request.status = data['status']
         if 'urgency' in data:
             blood_request.urgency = data['urgency']
+        point = parse_coordinates(data)
+        if point:
+            blood_request.latitude, blood_request.longitude = point
 
         blood_request.updated_at = datetime.utcnow()
 
@@ -99,12 +171,16 @@ def update_request(request_id):
             'request': blood_request.to_dict()
         }), 200
 
+    except GeoError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 
 @blood_request_bp.route('/<int:request_id>', methods=['DELETE'])
+@auth_required('admin')
 def delete_request(request_id):
     try:
         blood_request = BloodRequest.query.get(request_id)
@@ -112,6 +188,10 @@ def delete_request(request_id):
         if not blood_request:
             return jsonify({'error': 'Request not found'}), 404
 
+        if blood_request.status == 'approved':
+            release_request(request_id)
+            db.session.refresh(blood_request)
+
         db.session.delete(blood_request)
         db.session.commit()
 
@@ -123,14 +203,15 @@ def delete_request(request_id):
 
 
 @blood_request_bp.route('/donor/<int:donor_id>', methods=['GET'])
+@auth_required('admin', owner_arg='donor_id')
 def get_donor_requests(donor_id):
     try:
-        requests = BloodRequest.query.filter_by(donor_id=donor_id).order_by(
+        requests = BloodRequest.query.with_entities(*REQUEST_COLUMNS).filter_by(donor_id=donor_id).order_by(
             BloodRequest.created_at.desc()
         ).all()
 
         return jsonify({
-            'requests': [req.to_dict() for req in requests]
+            'requests': rows_to_dicts(requests)
         }), 200
 
     except Exception as e:
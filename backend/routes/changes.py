@@ -0,0 +1,72 @@
+import threading
+from flask import Blueprint, request, jsonify, Response, g
+from models import db
+from config import Config
+from token_auth import authenticate, auth_required, issue_ticket
+from changefeed import (change_feed, ChangeStream, stream_changes, backlog_statement, oldest_statement, resume,
+                        parse_topics, parse_last_event_id, ChangeFeedError, TICKET_AUDIENCE)
+
+changes_bp = Blueprint('changes', __name__, url_prefix='/api/changes')
+
+# Each stream served by Flask holds a worker thread for its whole life; the
+# ASGI server (asgi.py) serves them as coroutines instead.
+stream_slots = threading.BoundedSemaphore(Config.CHANGE_FEED_SYNC_STREAMS)
+
+
+@changes_bp.route('/ticket', methods=['POST'])
+@auth_required('admin')
+def ticket():
+    return jsonify({
+        'ticket': issue_ticket(g.auth, TICKET_AUDIENCE, Config.CHANGE_FEED_TICKET_SECONDS),
+        'expires_in': Config.CHANGE_FEED_TICKET_SECONDS
+    }), 201
+
+
+@changes_bp.route('/stream', methods=['GET'])
+def stream():
+    error = authenticate(['admin'], ticket_audience=TICKET_AUDIENCE)
+    if error:
+        return error
+
+    try:
+        if not Config.CHANGE_FEED_ENABLED:
+            return jsonify({'error': 'Change feed is disabled'}), 404
+
+        topics = parse_topics(request.args.get('topics'))
+        last_event_id = parse_last_event_id(
+            request.headers.get('Last-Event-ID', request.args.get('last_event_id'))
+        )
+
+        if not stream_slots.acquire(blocking=False):
+            response = jsonify({'error': 'Too many open streams, please try again shortly'})
+            response.headers['Retry-After'] = str(int(Config.CHANGE_FEED_HEARTBEAT_SECONDS))
+            return response, 503
+
+        try:
+            change_feed.start()
+            # Taken before the replay, so nothing committed in between is missed.
+            position = change_feed.position()
+
+            backlog, reset = [], False
+            if last_event_id is not None:
+                oldest = db.session.execute(oldest_statement()).scalar()
+                rows = db.session.execute(backlog_statement(last_event_id, topics)).all()
+                backlog, reset = resume(last_event_id, oldest, rows)
+            # Return the connection before the long-lived response starts.
+            db.session.close()
+        except Exception:
+            stream_slots.release()
+            raise
+
+        response = Response(
+            stream_changes(ChangeStream(position, backlog, reset, topics)),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+        response.call_on_close(stream_slots.release)
+        return response
+
+    except ChangeFeedError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
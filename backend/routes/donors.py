@@ -1,37 +1,97 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
 from models import db, Donor, Donation
 from datetime import datetime
+from pagination import get_page_limit, wants_total, CursorError
+from serializers import DONOR_COLUMNS, DONATION_COLUMNS, rows_to_dicts
+from filters import DONOR_FILTERS
+from listing import list_response, stats_response, DONOR_LIST, DONOR_STATS
+from token_auth import auth_required, auth_optional
+from ingest import ingest_donations, IngestError
+from cache import cached_aggregate
+from counters import BLOOD_GROUPS
+from search import search_donors, SearchError
+from geo import gazetteer, nearby_donors, parse_coordinates, parse_radius, GeoError
+from moderation import moderate_donors, select_targets, summarize, ModerationError, ConcurrentModification
 
 donors_bp = Blueprint('donors', __name__, url_prefix='/api/donors')
 
+# Fields a donor cannot change on their own profile.
+ADMIN_ONLY_FIELDS = ('status', 'is_eligible', 'blood_group')
+
 @donors_bp.route('/', methods=['GET'])
+@auth_optional
 def get_all_donors():
     try:
-        status = request.args.get('status')
-        blood_group = request.args.get('blood_group')
-        city = request.args.get('city')
+        return list_response(DONOR_LIST)
+
+    except CursorError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@donors_bp.route('/search', methods=['GET'])
+@auth_required('admin')
+def search():
+    try:
+        limit = get_page_limit()
+        ranked, next_cursor, total, truncated = search_donors(request.args.get('q', ''), limit, request.args.get('cursor'))
+
+        rows = {}
+        if ranked:
+            rows = {
+                row.id: row for row in Donor.query.with_entities(*DONOR_COLUMNS)
+                .filter(Donor.id.in_([donor_id for donor_id, _ in ranked]))
+            }
+
+        donors = []
+        for donor_id, score in ranked:
+            if donor_id in rows:
+                donors.append({**rows[donor_id]._asdict(), 'score': score})
 
-        query = Donor.query
+        page = {'next_cursor': next_cursor, 'limit': limit, 'truncated': truncated}
+        if wants_total():
+            page['total'] = total
 
-        if status:
-            query = query.filter_by(status=status)
-        if blood_group:
-            query = query.filter_by(blood_group=blood_group)
-        if city:
-            query = query.filter_by(city=city)
+        return jsonify({'donors': donors, **page}), 200
+
+    except (SearchError, CursorError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        donors = query.order_by(Donor.created_at.desc()).all()
+
+@donors_bp.route('/nearby', methods=['GET'])
+@auth_required('admin')
+def nearby():
+    try:
+        point = parse_coordinates(request.args)
+        if point is None and request.args.get('city'):
+            point = gazetteer.resolve(request.args['city'])
+            if point is None:
+                return jsonify({'error': f"Unknown city: {request.args['city']}"}), 400
+        if point is None:
+            return jsonify({'error': 'latitude and longitude, or city, are required'}), 400
+
+        radius = parse_radius(request.args)
+        groups = [request.args['blood_group']] if request.args.get('blood_group') else BLOOD_GROUPS
+        rows, distances = nearby_donors(point[0], point[1], radius, groups, get_page_limit())
 
         return jsonify({
-            'donors': [donor.to_dict() for donor in donors],
-            'total': len(donors)
+            'donors': [{**row._asdict(), 'distance_km': round(km, 2)} for row, km in zip(rows, distances)],
+            'latitude': point[0],
+            'longitude': point[1],
+            'radius_km': radius
         }), 200
 
+    except GeoError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @donors_bp.route('/<int:donor_id>', methods=['GET'])
+@auth_required('admin', owner_arg='donor_id')
 def get_donor(donor_id):
     try:
         donor = Donor.query.get(donor_id)
@@ -46,6 +106,7 @@ def get_donor(donor_id):
 
 
 @donors_bp.route('/<int:donor_id>', methods=['PUT'])
+@auth_required('admin', owner_arg='donor_id')
 def update_donor(donor_id):
     try:
         donor = Donor.query.get(donor_id)
@@ -55,10 +116,18 @@ def update_donor(donor_id):
 
         data = request.get_json()
 
+        if g.auth.get('type') != 'admin':
+            privileged = sorted(set(data) & set(ADMIN_ONLY_FIELDS))
+            if privileged:
+                return jsonify({'error': f"Only an admin can change: {', '.join(privileged)}"}), 403
+
         if 'full_name' in data:
             donor.full_name = data['full_name']
         if 'age' in data:
-            donor.age = data['age']
+            try:
+                donor.age = int(data['age'])
+            except (TypeError, ValueError):
+                return jsonify({'error': 'age must be a whole number'}), 400
         if 'gender' in data:
             donor.gender = data['gender']
         if 'blood_group' in data:
@@ -71,6 +140,9 @@ def update_donor(donor_id):
             donor.status = data['status']
         if 'is_eligible' in data:
             donor.is_eligible = data['is_eligible']
+        point = parse_coordinates(data)
+        if point:
+            donor.latitude, donor.longitude = point
 
         donor.updated_at = datetime.utcnow()
 
@@ -81,12 +153,16 @@ def update_donor(donor_id):
             'donor': donor.to_dict()
         }), 200
 
+    except GeoError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 
 @donors_bp.route('/<int:donor_id>/approve', methods=['POST'])
+@auth_required('admin')
 def approve_donor(donor_id):
     try:
         donor = Donor.query.get(donor_id)
@@ -110,6 +186,7 @@ def approve_donor(donor_id):
 
 
 @donors_bp.route('/<int:donor_id>/reject', methods=['POST'])
+@auth_required('admin')
 def reject_donor(donor_id):
     try:
         donor = Donor.query.get(donor_id)
@@ -132,7 +209,44 @@ def reject_donor(donor_id):
         return jsonify({'error': str(e)}), 500
 
 
+def bulk_moderate(status):
+    try:
+        ids, has_more = select_targets(Donor, DONOR_FILTERS, request.get_json(silent=True))
+        results = moderate_donors(ids, status)
+        db.session.commit()
+
+        summary = summarize(results)
+        return jsonify({
+            'message': f"{summary['counts'].get(status, 0)} of {len(ids)} donors {status}",
+            **summary,
+            'has_more': has_more
+        }), 200
+
+    except ModerationError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except ConcurrentModification as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@donors_bp.route('/bulk/approve', methods=['POST'])
+@auth_required('admin')
+def bulk_approve_donors():
+    return bulk_moderate('approved')
+
+
+@donors_bp.route('/bulk/reject', methods=['POST'])
+@auth_required('admin')
+def bulk_reject_donors():
+    return bulk_moderate('rejected')
+
+
 @donors_bp.route('/<int:donor_id>/donations', methods=['GET'])
+@auth_required('admin', owner_arg='donor_id')
 def get_donor_donations(donor_id):
     try:
         donor = Donor.query.get(donor_id)
@@ -140,12 +254,12 @@ def get_donor_donations(donor_id):
         if not donor:
             return jsonify({'error': 'Donor not found'}), 404
 
-        donations = Donation.query.filter_by(donor_id=donor_id).order_by(
+        donations = Donation.query.with_entities(*DONATION_COLUMNS).filter_by(donor_id=donor_id).order_by(
             Donation.donation_date.desc()
         ).all()
 
         return jsonify({
-            'donations': [donation.to_dict() for donation in donations],
+            'donations': rows_to_dicts(donations),
             'total_donations': donor.total_donations
         }), 200
 
@@ -154,6 +268,7 @@ def get_donor_donations(donor_id):
 
 
 @donors_bp.route('/<int:donor_id>/donations', methods=['POST'])
+@auth_required('admin')
 def add_donation(donor_id):
     try:
         donor = Donor.query.get(donor_id)
@@ -171,8 +286,9 @@ def add_donation(donor_id):
             notes=data.get('notes', '')
         )
 
-        donor.total_donations += 1
-        donor.last_donation_date = new_donation.donation_date
+        donor.total_donations = Donor.total_donations + 1
+        if not donor.last_donation_date or new_donation.donation_date > donor.last_donation_date:
+            donor.last_donation_date = new_donation.donation_date
 
         db.session.add(new_donation)
         db.session.commit()
@@ -187,26 +303,30 @@ def add_donation(donor_id):
         return jsonify({'error': str(e)}), 500
 
 
-@donors_bp.route('/stats', methods=['GET'])
-def get_donor_stats():
+@donors_bp.route('/donations/bulk', methods=['POST'])
+@auth_required('admin')
+def bulk_add_donations():
     try:
-        total_donors = Donor.query.count()
-        approved_donors = Donor.query.filter_by(status='approved').count()
-        pending_donors = Donor.query.filter_by(status='pending').count()
-
-        blood_groups = db.session.query(
-            Donor.blood_group,
-            db.func.count(Donor.id)
-        ).filter_by(status='approved').group_by(Donor.blood_group).all()
-
-        blood_group_distribution = {group: count for group, count in blood_groups}
+        result = ingest_donations(request.stream, request.content_type or '')
 
         return jsonify({
-            'total_donors': total_donors,
-            'approved_donors': approved_donors,
-            'pending_donors': pending_donors,
-            'blood_group_distribution': blood_group_distribution
+            'message': f"Ingested {result['inserted']} donations",
+            **result
         }), 200
 
+    except IngestError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@donors_bp.route('/stats', methods=['GET'])
+@auth_optional
+@cached_aggregate(DONOR_STATS.name, tags=DONOR_STATS.tags)
+def get_donor_stats():
+    try:
+        return stats_response(DONOR_STATS)
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
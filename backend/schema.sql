@@ -15,17 +15,30 @@ CREATE TABLE IF NOT EXISTS donors (
     contact VARCHAR(20) NOT NULL,
     email VARCHAR(100) UNIQUE NOT NULL,
     city VARCHAR(50) NOT NULL,
+    latitude DOUBLE NULL,
+    longitude DOUBLE NULL,
+    geohash VARCHAR(12) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NULL,
     password_hash VARCHAR(255) NOT NULL,
     status VARCHAR(20) DEFAULT 'pending',
     is_eligible BOOLEAN DEFAULT TRUE,
     last_donation_date DATE NULL,
     total_donations INT DEFAULT 0,
+    eligible_from DATE NULL,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     INDEX idx_email (email),
     INDEX idx_blood_group (blood_group),
     INDEX idx_status (status),
-    INDEX idx_city (city)
+    INDEX idx_city (city),
+    INDEX ix_donors_created_at (created_at, id),
+    INDEX ix_donors_status_created_at (status, created_at, id),
+    INDEX ix_donors_status_group_created_at (status, blood_group, created_at, id),
+    INDEX ix_donors_status_group_city_created_at (status, blood_group, city, created_at, id),
+    INDEX ix_donors_group_created_at (blood_group, created_at, id),
+    INDEX ix_donors_city_created_at (city, created_at, id),
+    INDEX ix_donors_updated_at (updated_at),
+    INDEX ix_donors_eligible_from (eligible_from),
+    INDEX ix_donors_status_group_geohash (status, blood_group, geohash, eligible_from)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- Blood requests table
@@ -37,16 +50,30 @@ CREATE TABLE IF NOT EXISTS blood_requests (
     units INT NOT NULL,
     hospital_name VARCHAR(100) NOT NULL,
     city VARCHAR(50) NOT NULL,
+    latitude DOUBLE NULL,
+    longitude DOUBLE NULL,
     message TEXT NULL,
     status VARCHAR(20) DEFAULT 'pending',
     urgency VARCHAR(20) DEFAULT 'normal',
     donor_id INT NULL,
+    priority_at DATETIME NULL,
+    claimed_by INT NULL,
+    claimed_until DATETIME NULL,
+    claim_token VARCHAR(36) NULL,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     INDEX idx_blood_group (blood_group),
     INDEX idx_status (status),
     INDEX idx_donor_id (donor_id),
-    FOREIGN KEY (donor_id) REFERENCES donors(id) ON DELETE SET NULL
+    INDEX ix_blood_requests_created_at (created_at, id),
+    INDEX ix_blood_requests_status_created_at (status, created_at, id),
+    INDEX ix_blood_requests_status_group_created_at (status, blood_group, created_at, id),
+    INDEX ix_blood_requests_group_created_at (blood_group, created_at, id),
+    INDEX ix_blood_requests_donor_created_at (donor_id, created_at),
+    INDEX ix_blood_requests_updated_at (updated_at),
+    INDEX ix_blood_requests_queue (status, blood_group, priority_at, id, claimed_until),
+    FOREIGN KEY (donor_id) REFERENCES donors(id) ON DELETE SET NULL,
+    FOREIGN KEY (claimed_by) REFERENCES admins(id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- Donations table
@@ -60,7 +87,9 @@ CREATE TABLE IF NOT EXISTS donations (
     notes TEXT NULL,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     INDEX idx_donor_id (donor_id),
-    INDEX idx_donation_date (donation_date),
+    INDEX ix_donations_donation_date (donation_date),
+    INDEX ix_donations_donor_date (donor_id, donation_date),
+    INDEX ix_donations_created_at (created_at),
     FOREIGN KEY (donor_id) REFERENCES donors(id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -87,6 +116,89 @@ CREATE TABLE IF NOT EXISTS blood_stock (
     INDEX idx_blood_group (blood_group)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Stock ledger table (append-only record of every stock movement)
+CREATE TABLE IF NOT EXISTS stock_ledger (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    blood_group VARCHAR(5) NOT NULL,
+    action VARCHAR(20) NOT NULL,
+    available_change INT NOT NULL DEFAULT 0,
+    reserved_change INT NOT NULL DEFAULT 0,
+    request_id INT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_blood_group (blood_group),
+    FOREIGN KEY (request_id) REFERENCES blood_requests(id) ON DELETE SET NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Statistics counters table (maintained by the application on every write)
+CREATE TABLE IF NOT EXISTS stat_counters (
+    name VARCHAR(64) PRIMARY KEY,
+    value BIGINT NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Donor search tokens (maintained by the application on every donor write)
+CREATE TABLE IF NOT EXISTS donor_search_tokens (
+    token VARCHAR(64) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL,
+    donor_id INT NOT NULL,
+    field VARCHAR(10) NOT NULL,
+    PRIMARY KEY (token, donor_id, field),
+    INDEX ix_donor_search_tokens_donor (donor_id, token, field),
+    FOREIGN KEY (donor_id) REFERENCES donors(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Change feed outbox (written in the same transaction as each tracked write)
+CREATE TABLE IF NOT EXISTS change_events (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    topic VARCHAR(20) NOT NULL,
+    action VARCHAR(10) NOT NULL,
+    entity_id INT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX ix_change_events_created_at (created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Notification outbox (drained by notify_worker.py)
+CREATE TABLE IF NOT EXISTS notifications (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    channel VARCHAR(10) NOT NULL,
+    kind VARCHAR(30) NOT NULL,
+    recipient VARCHAR(100) NULL,
+    subject VARCHAR(200) NULL,
+    body TEXT NULL,
+    request_id INT NULL,
+    status VARCHAR(10) NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    next_attempt_at DATETIME NOT NULL,
+    last_error VARCHAR(500) NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    sent_at DATETIME NULL,
+    claim_token VARCHAR(36) NULL,
+    INDEX ix_notifications_status_next_attempt (status, next_attempt_at, id),
+    FOREIGN KEY (request_id) REFERENCES blood_requests(id) ON DELETE SET NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Daily rollups for reporting (refreshed incrementally from rollup_state)
+CREATE TABLE IF NOT EXISTS daily_rollups (
+    day DATE NOT NULL,
+    metric VARCHAR(32) NOT NULL,
+    dimension VARCHAR(128) NOT NULL DEFAULT '',
+    value BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, metric, dimension)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS rollup_state (
+    source VARCHAR(32) PRIMARY KEY,
+    high_water DATETIME NOT NULL,
+    refreshed_at DATETIME NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Days that lost a row (delete, or a donation moved to another date); the
+-- high-water mark on updated_at cannot see these
+CREATE TABLE IF NOT EXISTS rollup_dirty_days (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    source VARCHAR(32) NOT NULL,
+    day DATE NOT NULL,
+    INDEX ix_rollup_dirty_days_source_id (source, id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- Insert default admin user
 -- Password: admin123 (hashed with bcrypt)
 INSERT INTO admins (username, email, password_hash, full_name, role)
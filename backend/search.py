@@ -0,0 +1,184 @@
+import re
+import unicodedata
+from sqlalchemy import and_, event, func, inspect, select
+from sqlalchemy.orm import Session, aliased
+from config import Config
+from models import db, Donor, DonorSearchToken
+from pagination import encode_values, decode_values, CursorError
+
+SEARCH_FIELDS = ('full_name', 'email', 'city', 'contact')
+
+# Per-term score of a match in each field; an exact token match counts double.
+FIELD_WEIGHTS = {'full_name': 4, 'email': 3, 'contact': 3, 'city': 1}
+
+TOKEN_LENGTH = 64
+
+_separators = re.compile(r'[\W_]+')
+
+
+class SearchError(ValueError):
+    pass
+
+
+def normalize(text):
+    """Lowercase, strip accents and split on anything that is not a letter or digit."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return [word[:TOKEN_LENGTH] for word in _separators.split(text.casefold()) if word]
+
+
+def donor_tokens(values):
+    """(field, token) pairs indexed for a donor, from a mapping of SEARCH_FIELDS."""
+    tokens = set()
+    for field in ('full_name', 'email', 'city'):
+        tokens.update((field, word) for word in normalize(values.get(field)))
+
+    # Every digit suffix of the number, so "4567" finds "+1 555-123-4567".
+    digits = ''.join(char for char in (values.get('contact') or '') if char.isdigit())[:TOKEN_LENGTH]
+    for start in range(max(len(digits) - Config.SEARCH_MIN_TERM_LENGTH + 1, 0)):
+        tokens.add(('contact', digits[start:]))
+    return tokens
+
+
+def _token_rows(donor_id, values):
+    return [{'token': token, 'donor_id': donor_id, 'field': field} for field, token in donor_tokens(values)]
+
+
+def prefix_range(column, term):
+    """Condition matching every token that starts with ``term``, as an index range."""
+    upper = term[:-1] + chr(ord(term[-1]) + 1)
+    return and_(column >= term, column < upper)
+
+
+def parse_query(query):
+    terms = list(dict.fromkeys(normalize(query)))[:Config.SEARCH_MAX_TERMS]
+    if not terms or max(len(term) for term in terms) < Config.SEARCH_MIN_TERM_LENGTH:
+        raise SearchError(
+            f'Search query needs a term of at least {Config.SEARCH_MIN_TERM_LENGTH} characters'
+        )
+    return terms
+
+
+def range_size(term):
+    """Tokens starting with ``term``, counted up to one past the candidate cap."""
+    matches = (
+        select(DonorSearchToken.donor_id)
+        .where(prefix_range(DonorSearchToken.token, term))
+        .limit(Config.SEARCH_MAX_CANDIDATES + 1)
+        .subquery()
+    )
+    return db.session.execute(select(func.count()).select_from(matches)).scalar()
+
+
+def order_terms(terms):
+    # The rarest term drives the join; the others are probed per candidate.
+    drivers = [term for term in terms if len(term) >= Config.SEARCH_MIN_TERM_LENGTH]
+    if len(terms) > 1:
+        drivers.sort(key=lambda term: (range_size(term), -len(term)))
+    return drivers[:1] + [term for term in terms if term != drivers[0]]
+
+
+def match_statement(terms):
+    """One row per combination of tokens matching every term for a donor."""
+    tables = [aliased(DonorSearchToken, name=f't{i}') for i in range(len(terms))]
+    first = tables[0]
+    columns = [first.donor_id]
+    for table in tables:
+        columns += [table.field, table.token]
+
+    query = select(*columns).where(prefix_range(first.token, terms[0]))
+    for table, term in zip(tables[1:], terms[1:]):
+        query = query.join(table, and_(table.donor_id == first.donor_id, prefix_range(table.token, term)))
+    # Exact matches sort first, so the cap drops the longest completions.
+    return query.order_by(first.token).limit(Config.SEARCH_MAX_CANDIDATES + 1)
+
+
+def score_matches(terms, rows):
+    """Sum over terms of each donor's best-weighted token for that term."""
+    best = {}
+    for row in rows:
+        donor_id = row[0]
+        for i, term in enumerate(terms):
+            field, token = row[1 + 2 * i], row[2 + 2 * i]
+            score = FIELD_WEIGHTS[field] * (2 if token == term else 1)
+            if score > best.get((donor_id, i), 0):
+                best[donor_id, i] = score
+
+    scores = {}
+    for (donor_id, _), score in best.items():
+        scores[donor_id] = scores.get(donor_id, 0) + score
+    return scores
+
+
+def search_donors(query, limit, cursor=None):
+    """One page of ``(donor_id, score)`` for ``query``: ``(ranked, next_cursor, total, truncated)``."""
+    terms = order_terms(parse_query(query))
+    rows = db.session.execute(match_statement(terms)).all()
+    truncated = len(rows) > Config.SEARCH_MAX_CANDIDATES
+    scores = score_matches(terms, rows[:Config.SEARCH_MAX_CANDIDATES])
+
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+    if cursor:
+        after_score, after_id = decode_values(cursor, 2)
+        if not isinstance(after_score, int) or not isinstance(after_id, int):
+            raise CursorError('Invalid cursor')
+        ranked = [(donor_id, score) for donor_id, score in ranked
+                  if (score, donor_id) < (after_score, after_id)]
+
+    next_cursor = None
+    if len(ranked) > limit:
+        ranked = ranked[:limit]
+        next_cursor = encode_values(ranked[-1][1], ranked[-1][0])
+    return ranked, next_cursor, len(scores), truncated
+
+
+def rebuild_search_index():
+    """Recreate every donor's tokens from the donors table; returns donors indexed."""
+    tokens = DonorSearchToken.__table__
+    db.session.execute(tokens.delete())
+    db.session.commit()
+
+    columns = [Donor.id] + [getattr(Donor, field) for field in SEARCH_FIELDS]
+    last_id = 0
+    indexed = 0
+    while True:
+        donors = db.session.execute(
+            select(*columns).where(Donor.id > last_id).order_by(Donor.id).limit(Config.BULK_CHUNK_SIZE)
+        ).all()
+        if not donors:
+            break
+        rows = [row for donor in donors for row in _token_rows(donor.id, donor._mapping)]
+        if rows:
+            db.session.execute(tokens.insert(), rows)
+        db.session.commit()
+        last_id = donors[-1].id
+        indexed += len(donors)
+    return indexed
+
+
+def _search_fields_changed(donor):
+    state = inspect(donor)
+    return any(state.attrs[field].history.has_changes() for field in SEARCH_FIELDS)
+
+
+@event.listens_for(Session, 'after_flush')
+def _sync_search_tokens(session, flush_context):
+    stale = set()
+    fresh = []
+    for obj in session.new:
+        if isinstance(obj, Donor):
+            fresh.extend(_token_rows(obj.id, {field: getattr(obj, field) for field in SEARCH_FIELDS}))
+    for obj in session.dirty:
+        if isinstance(obj, Donor) and _search_fields_changed(obj):
+            stale.add(obj.id)
+            fresh.extend(_token_rows(obj.id, {field: getattr(obj, field) for field in SEARCH_FIELDS}))
+    for obj in session.deleted:
+        if isinstance(obj, Donor):
+            stale.add(obj.id)
+
+    tokens = DonorSearchToken.__table__
+    connection = session.connection()
+    if stale:
+        connection.execute(tokens.delete().where(tokens.c.donor_id.in_(stale)))
+    if fresh:
+        connection.execute(tokens.insert(), fresh)
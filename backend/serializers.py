@@ -0,0 +1,113 @@
+import json
+import re
+from datetime import date, datetime
+from decimal import Decimal
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import Date, func, literal
+from models import Donor, BloodRequest, Donation, BloodStock, ALWAYS_ELIGIBLE
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Column projections matching each model's to_dict() keys, so list endpoints
+# can fetch plain row tuples instead of hydrating ORM objects.
+DONOR_COLUMNS = [
+    Donor.id, Donor.full_name, Donor.age, Donor.gender, Donor.blood_group,
+    Donor.contact, Donor.email, Donor.city, Donor.latitude, Donor.longitude, Donor.status, Donor.is_eligible,
+    Donor.last_donation_date, Donor.total_donations,
+    # The never-donated sentinel reads as null, as in Donor.to_dict().
+    func.nullif(Donor.eligible_from, literal(ALWAYS_ELIGIBLE, Date()), type_=Date()).label('eligible_from'),
+    Donor.created_at,
+]
+
+REQUEST_COLUMNS = [
+    BloodRequest.id, BloodRequest.name, BloodRequest.contact, BloodRequest.blood_group,
+    BloodRequest.units, BloodRequest.hospital_name, BloodRequest.city, BloodRequest.latitude,
+    BloodRequest.longitude, BloodRequest.message,
+    BloodRequest.status, BloodRequest.urgency, BloodRequest.donor_id, BloodRequest.claimed_by,
+    BloodRequest.claimed_until, BloodRequest.created_at,
+]
+
+DONATION_COLUMNS = [
+    Donation.id, Donation.donor_id, Donation.location, Donation.units, Donation.status,
+    Donation.donation_date, Donation.notes, Donation.created_at,
+]
+
+STOCK_COLUMNS = [
+    BloodStock.id, BloodStock.blood_group, BloodStock.units_available,
+    BloodStock.units_reserved, BloodStock.last_updated,
+]
+
+
+def rows_to_dicts(rows):
+    return [row._asdict() for row in rows]
+
+
+def _default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        # As Flask's provider does; MySQL returns SUM()/AVG() as Decimal.
+        return str(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+# What json.dumps(ensure_ascii=True) escapes that orjson writes raw.
+_NON_ASCII = re.compile('[\x7f-\U0010ffff]')
+
+
+def _escape(match):
+    code = ord(match.group())
+    if code > 0xFFFF:
+        code -= 0x10000
+        return '\\u{:04x}\\u{:04x}'.format(0xD800 | (code >> 10), 0xDC00 | (code & 0x3FF))
+    return '\\u{:04x}'.format(code)
+
+
+def dumps(obj, sort_keys=True, indent=None, ensure_ascii=True):
+    """Encode ``obj`` to a JSON string, using orjson when it is installed.
+
+    Dates and datetimes are written as ISO 8601, matching ``to_dict()``, and
+    Decimals as strings. orjson always writes UTF-8, so with ``ensure_ascii``
+    non-ASCII characters are escaped afterwards to give the same bytes as the
+    stdlib encoder; ASCII-only output skips that pass.
+
+    orjson writes floats needing an exponent without the ``+`` (``1e16``, not
+    ``1e+16``) and NaN/Infinity as ``null``; integers beyond 64 bits fall back
+    to the stdlib encoder.
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            output = orjson.dumps(obj, default=_default, option=option).decode('utf-8')
+        except orjson.JSONEncodeError:
+            output = None
+        if output is not None:
+            if ensure_ascii and not output.isascii():
+                output = _NON_ASCII.sub(_escape, output)
+            return output
+
+    separators = None if indent else (',', ':')
+    return json.dumps(
+        obj, default=_default, sort_keys=sort_keys, indent=indent,
+        separators=separators, ensure_ascii=ensure_ascii
+    )
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        # response() asks for compact separators or indent=2; other layouts
+        # (plain flask.json.dumps uses ", ") go to the stdlib encoder.
+        indent = kwargs.get('indent')
+        if indent not in (None, 2) or (indent is None and kwargs.get('separators') != (',', ':')):
+            return super().dumps(obj, **kwargs)
+        return dumps(
+            obj, sort_keys=kwargs.get('sort_keys', self.sort_keys), indent=indent,
+            ensure_ascii=kwargs.get('ensure_ascii', self.ensure_ascii)
+        )
@@ -0,0 +1,133 @@
+from datetime import datetime
+from models import db, BloodRequest, BloodStock, StockLedger
+from counters import record_status_change
+
+
+class StockError(Exception):
+    pass
+
+
+class InsufficientStock(StockError):
+    pass
+
+
+class InvalidTransition(StockError):
+    pass
+
+
+def _move(blood_group, available_change, reserved_change):
+    """One conditional UPDATE of a group's stock row; False if it would go negative."""
+    table = BloodStock.__table__
+    result = db.session.execute(
+        table.update()
+        .where(
+            table.c.blood_group == blood_group,
+            table.c.units_available + available_change >= 0,
+            table.c.units_reserved + reserved_change >= 0
+        )
+        .values(
+            units_available=table.c.units_available + available_change,
+            units_reserved=table.c.units_reserved + reserved_change,
+            last_updated=datetime.utcnow()
+        )
+    )
+    return result.rowcount == 1
+
+
+def _adjust(blood_group, available_change, reserved_change, action, request_id=None):
+    """Apply a stock movement with one conditional UPDATE and log it.
+
+    The WHERE clause refuses any movement that would drive either column
+    negative, so concurrent callers can never oversell; only the single
+    ``blood_stock`` row for the group is locked.
+    """
+    if not _move(blood_group, available_change, reserved_change):
+        raise InsufficientStock(f'Insufficient {blood_group} stock')
+
+    db.session.add(StockLedger(
+        blood_group=blood_group,
+        action=action,
+        available_change=available_change,
+        reserved_change=reserved_change,
+        request_id=request_id
+    ))
+
+
+def adjust_for_requests(blood_group, action, units_by_request):
+    """Reserve (``action='reserve'``) or release units for many requests of one group.
+
+    The group's total moves in a single conditional UPDATE; the ledger still
+    gets one row per request, as if each had been moved on its own.
+    """
+    sign = -1 if action == 'reserve' else 1
+    total = sum(units_by_request.values())
+    if not _move(blood_group, sign * total, -sign * total):
+        raise InsufficientStock(f'Insufficient {blood_group} stock')
+
+    now = datetime.utcnow()
+    db.session.execute(StockLedger.__table__.insert(), [
+        {
+            'blood_group': blood_group, 'action': action, 'available_change': sign * units,
+            'reserved_change': -sign * units, 'request_id': request_id, 'created_at': now
+        }
+        for request_id, units in units_by_request.items()
+    ])
+
+
+def _transition(request_id, from_statuses, to_status):
+    table = BloodRequest.__table__
+    row = db.session.execute(
+        db.select(table.c.status, table.c.blood_group, table.c.units)
+        .where(table.c.id == request_id)
+        .with_for_update()
+    ).first()
+    if row is None:
+        return None
+    if row.status not in from_statuses:
+        raise InvalidTransition(f"Cannot move a request from '{row.status}' to '{to_status}'")
+
+    result = db.session.execute(
+        table.update()
+        .where(table.c.id == request_id, table.c.status == row.status)
+        .values(status=to_status, updated_at=datetime.utcnow())
+    )
+    if result.rowcount != 1:
+        raise InvalidTransition('Request was modified concurrently')
+
+    connection = db.session.connection()
+    record_status_change(connection, 'requests_status', row.status, to_status)
+    return row
+
+
+def reserve_for_request(request_id):
+    """Approve a pending request and move its units from available to reserved."""
+    row = _transition(request_id, ('pending',), 'approved')
+    if row is not None:
+        _adjust(row.blood_group, -row.units, row.units, 'reserve', request_id)
+    return row
+
+
+def fulfil_request(request_id):
+    """Mark an approved request fulfilled and consume its reserved units."""
+    row = _transition(request_id, ('approved',), 'fulfilled')
+    if row is not None:
+        _adjust(row.blood_group, 0, -row.units, 'fulfil', request_id)
+    return row
+
+
+def reject_request(request_id):
+    """Reject a request, returning any reserved units to available stock."""
+    row = _transition(request_id, ('pending', 'approved'), 'rejected')
+    if row is not None and row.status == 'approved':
+        _adjust(row.blood_group, row.units, -row.units, 'release', request_id)
+    return row
+
+
+def record_adjustment(stock, available_change, reserved_change):
+    if available_change or reserved_change:
+        db.session.add(StockLedger(
+            blood_group=stock.blood_group,
+            action='adjust',
+            available_change=available_change,
+            reserved_change=reserved_change
+        ))
@@ -0,0 +1,72 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from app import create_app
+from cache import aggregate_cache
+from matching import donor_index
+from models import db, Admin
+from token_auth import token_cache
+
+
+@pytest.fixture
+def config(monkeypatch):
+    """Override ``Config`` attributes for one test: ``config(CACHE_TTL=5)``."""
+    def override(**settings):
+        for name, value in settings.items():
+            monkeypatch.setattr(Config, name, value)
+    return override
+
+
+@pytest.fixture
+def app(config, tmp_path):
+    """An app on an empty database: ``DATABASE_URL`` if set, else a throwaway SQLite file."""
+    if not os.getenv('DATABASE_URL'):
+        config(SQLALCHEMY_DATABASE_URI='sqlite:///' + str(tmp_path / 'test.db'), SQLALCHEMY_ENGINE_OPTIONS={})
+    config(BCRYPT_WORKERS=0, BCRYPT_ROUNDS=4, RATE_LIMIT_ENABLED=False, NOTIFY_WORKER_IN_PROCESS=False)
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        # Per-process state would otherwise carry over from the last test.
+        token_cache.clear()
+        aggregate_cache.backend.clear()
+        donor_index.rebuild()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin_headers(client):
+    admin = Admin(username='admin', email='admin@example.com', full_name='Test Admin')
+    admin.set_password('admin')
+    db.session.add(admin)
+    db.session.commit()
+    token = client.post('/api/auth/login', json={
+        'email': 'admin@example.com', 'password': 'admin', 'role': 'admin'
+    }).get_json()['token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+@pytest.fixture
+def register(client):
+    """Register a donor through the API and return its id."""
+    def register(number, blood_group='O+', city='Springfield', **fields):
+        response = client.post('/api/auth/register', json={
+            'fullName': f'Donor {number}', 'age': 30, 'gender': 'female', 'bloodGroup': blood_group,
+            'contact': f'555{number:07d}', 'email': f'donor{number}@example.com', 'city': city,
+            'password': 'secret', **fields
+        })
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()['donor']['id']
+    return register
@@ -0,0 +1,12 @@
+def test_stats_are_cached_until_a_write_to_donors(client, register):
+    register(1)
+
+    assert client.get('/api/donors/stats').headers['X-Cache'] == 'MISS'
+    hit = client.get('/api/donors/stats')
+    assert hit.headers['X-Cache'] == 'HIT'
+    assert hit.get_json()['total_donors'] == 1
+
+    register(2)
+    fresh = client.get('/api/donors/stats')
+    assert fresh.headers['X-Cache'] == 'MISS'
+    assert fresh.get_json()['total_donors'] == 2
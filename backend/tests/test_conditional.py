@@ -0,0 +1,12 @@
+def test_list_etag_answers_304_until_the_page_changes(client, admin_headers, register):
+    donor_id = register(1)
+
+    first = client.get('/api/donors/')
+    etag = first.headers['ETag']
+    assert client.get('/api/donors/', headers={'If-None-Match': etag}).status_code == 304
+
+    client.post(f'/api/donors/{donor_id}/approve', headers=admin_headers)
+    changed = client.get('/api/donors/', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert changed.get_json()['donors'][0]['status'] == 'approved'
@@ -0,0 +1,21 @@
+from counters import rebuild_counters
+
+
+def test_counters_follow_writes_and_match_a_rebuild(client, admin_headers, register, config):
+    config(CACHE_ENABLED=False)
+    ids = [register(i, blood_group=group) for i, group in enumerate(['O+', 'O+', 'A-'])]
+    client.post(f'/api/donors/{ids[0]}/approve', headers=admin_headers)
+    client.post(f'/api/donors/{ids[2]}/approve', headers=admin_headers)
+    client.post(f'/api/donors/{ids[0]}/donations', json={'location': 'Camp'}, headers=admin_headers)
+
+    stats = client.get('/api/donors/stats').get_json()
+    assert stats == {
+        'total_donors': 3, 'approved_donors': 2, 'pending_donors': 1,
+        'blood_group_distribution': {'O+': 1, 'A-': 1},
+    }
+    dashboard = client.get('/api/admin/dashboard/stats').get_json()
+    assert (dashboard['total_donors'], dashboard['recent_donors'], dashboard['total_donations']) == (3, 3, 1)
+
+    rebuild_counters()
+    assert client.get('/api/donors/stats').get_json() == stats
+    assert client.get('/api/admin/dashboard/stats').get_json() == dashboard
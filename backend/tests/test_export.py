@@ -0,0 +1,16 @@
+import json
+
+
+def test_export_applies_list_filters(client, admin_headers, register):
+    approved = register(1, blood_group='A+')
+    register(2, blood_group='A+')
+    client.post(f'/api/donors/{approved}/approve', headers=admin_headers)
+
+    response = client.get('/api/admin/export/donors?status=approved&blood_group=A%2B', headers=admin_headers)
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [(row['id'], row['eligible_from']) for row in rows] == [(approved, None)]
+
+    csv_lines = client.get('/api/admin/export/donors?format=csv&status=pending', headers=admin_headers) \
+        .get_data(as_text=True).splitlines()
+    assert len(csv_lines) == 2 and csv_lines[0].startswith('id,full_name')
@@ -0,0 +1,80 @@
+"""Notification worker check against a whole-second DATETIME column.
+
+MySQL's DATETIME keeps whole seconds, so a lease written with microseconds is
+not stored exactly. On SQLite (the default) the same loss is reproduced by
+rounding the datetimes that UPDATE statements write; set ``DATABASE_URL`` to
+run against a real MySQL database instead.
+
+    python -m pytest tests/test_notifications.py
+    DATABASE_URL=mysql+pymysql://... python -m pytest tests/test_notifications.py
+"""
+import re
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from config import Config
+from models import db, Notification
+from notifications import NotificationWorker, Sender
+
+_FRACTIONAL = re.compile(r'\d{4}-\d\d-\d\d \d\d:\d\d:\d\d\.\d{6}')
+
+
+def _whole_seconds(value):
+    if isinstance(value, str) and _FRACTIONAL.fullmatch(value):
+        value = datetime.fromisoformat(value)
+        value = value.replace(microsecond=0) + timedelta(seconds=value.microsecond >= 500000)
+        return value.strftime('%Y-%m-%d %H:%M:%S.000000')
+    return value
+
+
+def _store_whole_seconds(conn, cursor, statement, parameters, context, executemany):
+    # SQLite stores what it is given: round written datetimes like DATETIME(0).
+    if statement.lstrip().upper().startswith('UPDATE') and not executemany:
+        parameters = tuple(_whole_seconds(value) for value in parameters)
+    return statement, parameters
+
+
+class RecordingSender(Sender):
+    def __init__(self):
+        self.sent = []
+
+    def send(self, channel, notifications):
+        self.sent.extend(n.id for n in notifications)
+        return {}
+
+
+@pytest.fixture
+def whole_seconds(app):
+    if db.engine.dialect.name != 'sqlite':
+        yield
+        return
+    event.listen(db.engine, 'before_cursor_execute', _store_whole_seconds, retval=True)
+    yield
+    event.remove(db.engine, 'before_cursor_execute', _store_whole_seconds)
+
+
+def test_expired_leases_are_reclaimed(client, config, whole_seconds):
+    config(NOTIFY_ENABLED=True, NOTIFY_CHANNELS=['sms'])
+    # Each new request queues an SMS confirmation to its contact number.
+    for i in range(3):
+        client.post('/api/blood-requests/', json={
+            'name': f'Patient {i}', 'contact': f'555000000{i}', 'bloodGroup': 'A+', 'units': 1,
+            'hospitalName': 'General', 'city': 'Springfield'
+        })
+    ids = sorted(db.session.execute(db.select(Notification.id)).scalars())
+    assert len(ids) == 3
+
+    sender = RecordingSender()
+    worker = NotificationWorker(sender)
+    # Mid-second, so the lease carries microseconds the column drops.
+    now = datetime.utcnow().replace(microsecond=0) + timedelta(seconds=1, microseconds=700000)
+
+    assert [n.id for n in worker.claim(now)] == ids
+    assert not worker.claim(now), 'a second claim took rows already leased'
+
+    # Once the lease runs out the rows come due again and are delivered.
+    worker.run_once(now + timedelta(seconds=Config.NOTIFY_LEASE_SECONDS + 1))
+    assert sorted(sender.sent) == ids
+    assert set(db.session.execute(db.select(Notification.status)).scalars()) == {'sent'}
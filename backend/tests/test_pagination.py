@@ -0,0 +1,18 @@
+def test_cursor_walks_every_donor_once(client, register):
+    ids = [register(i) for i in range(7)]
+
+    seen, cursor = [], None
+    while True:
+        query = {'limit': 3, **({'cursor': cursor} if cursor else {})}
+        page = client.get('/api/donors/', query_string=query).get_json()
+        assert len(page['donors']) <= 3
+        seen.extend(donor['id'] for donor in page['donors'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+
+    assert seen == sorted(ids, reverse=True)
+
+
+def test_bad_cursor_is_rejected(client):
+    assert client.get('/api/donors/?cursor=not-a-cursor').status_code == 400
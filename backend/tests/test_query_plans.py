@@ -0,0 +1,166 @@
+"""Query-plan regression check for the list and stats endpoints.
+
+Seeds a database, calls each endpoint through the Flask test client while
+recording the SQL it issues, then runs EXPLAIN on every SELECT and fails if
+a plan falls back to a full table scan or a filesort.
+
+    python -m pytest tests/test_query_plans.py                      # throwaway SQLite database
+    DATABASE_URL=mysql+pymysql://... python -m pytest tests/test_query_plans.py
+"""
+import re
+from datetime import datetime, timedelta, date
+
+from sqlalchemy import event, text
+from models import db, Admin, Donor, BloodRequest, Donation, BloodStock
+from counters import rebuild_counters
+from eligibility import recompute_eligibility
+from search import rebuild_search_index
+from triage import recompute_priorities
+from geo import encode_geohash
+
+# Tables small enough that scanning them is the right plan. stat_counters is
+# a primary-key lookup, but with only a few hundred rows SQLite's planner may
+# prefer to read it whole.
+SMALL_TABLES = {'blood_stock', 'admins', 'rollup_state', 'stat_counters'}
+
+BLOOD_GROUPS = ['A+', 'A-', 'B+', 'B-', 'O+', 'O-', 'AB+', 'AB-']
+
+ENDPOINTS = [
+    '/api/donors/',
+    '/api/donors/?include_total=true',
+    '/api/donors/?status=approved',
+    '/api/donors/?blood_group=O%2B',
+    '/api/donors/?city=City%203',
+    '/api/donors/?status=approved&blood_group=A%2B',
+    '/api/donors/?status=approved&city=City%203',
+    '/api/donors/?status=approved&blood_group=A%2B&city=City%203',
+    '/api/donors/?blood_group=A%2B&city=City%203',
+    '/api/donors/stats',
+    '/api/donors/search?q=donor%2012',
+    '/api/donors/search?q=city%203',
+    '/api/donors/search?q=5550001',
+    '/api/donors/nearby?latitude=41.5&longitude=-73&radius_km=25',
+    '/api/donors/nearby?latitude=41.5&longitude=-73&radius_km=100&blood_group=O%2B',
+    '/api/donors/1',
+    '/api/donors/1/donations',
+    '/api/blood-requests/',
+    '/api/blood-requests/?status=pending',
+    '/api/blood-requests/?blood_group=B%2B',
+    '/api/blood-requests/?status=pending&blood_group=B%2B',
+    '/api/blood-requests/1',
+    '/api/blood-requests/1/matches',
+    '/api/blood-requests/1/nearby?radius_km=50',
+    '/api/blood-requests/donor/1',
+    '/api/admin/dashboard/stats',
+    '/api/admin/donors/pending',
+    '/api/admin/requests/pending',
+    '/api/admin/requests/queue?limit=20',
+    '/api/admin/blood-stock',
+    '/api/admin/notifications?status=dead',
+]
+
+
+def location(i):
+    # Spread over roughly 400 km x 400 km so radius searches hit a few cells.
+    latitude, longitude = 40 + (i * 37 % 400) / 100, -75 + (i * 53 % 500) / 100
+    return {'latitude': latitude, 'longitude': longitude, 'geohash': encode_geohash(latitude, longitude)}
+
+
+def seed(donors=3000, requests=1500, donations=4000):
+    now = datetime.utcnow()
+    db.session.execute(Donor.__table__.insert(), [{
+        'full_name': f'Donor {i}', 'age': 18 + i % 50, 'gender': 'female' if i % 2 else 'male',
+        'blood_group': BLOOD_GROUPS[i % 8], 'contact': f'555{i:07d}', 'email': f'donor{i}@example.com',
+        'city': f'City {i % 25}', 'password_hash': 'x',
+        **location(i),
+        'status': ['approved', 'pending', 'rejected'][i % 3], 'is_eligible': True,
+        'last_donation_date': None, 'total_donations': 0,
+        'created_at': now - timedelta(minutes=i), 'updated_at': now - timedelta(minutes=i),
+    } for i in range(donors)])
+    db.session.execute(BloodRequest.__table__.insert(), [{
+        'name': f'Patient {i}', 'contact': '0000000000', 'blood_group': BLOOD_GROUPS[i % 8],
+        'units': 1 + i % 3, 'hospital_name': 'General Hospital', 'city': f'City {i % 25}',
+        'latitude': location(i)['latitude'], 'longitude': location(i)['longitude'],
+        'status': ['pending', 'approved', 'rejected'][i % 3], 'urgency': ['normal', 'urgent', 'critical'][i // 3 % 3],
+        'donor_id': 1 + i % donors, 'created_at': now - timedelta(minutes=i), 'updated_at': now,
+    } for i in range(requests)])
+    db.session.execute(Donation.__table__.insert(), [{
+        'donor_id': 1 + i % donors, 'location': f'Camp {i % 10}', 'units': 1, 'status': 'completed',
+        'donation_date': date(2024, 1, 1) + timedelta(days=i % 500), 'notes': '', 'created_at': now,
+    } for i in range(donations)])
+    for group in BLOOD_GROUPS:
+        db.session.add(BloodStock(blood_group=group, units_available=100, units_reserved=0))
+    admin = Admin(username='planner', email='planner@example.com', full_name='Plan Checker')
+    admin.set_password('planner')
+    db.session.add(admin)
+    db.session.commit()
+    rebuild_counters()
+    recompute_eligibility()
+    rebuild_search_index()
+    recompute_priorities()
+
+    if db.engine.dialect.name == 'sqlite':
+        db.session.execute(text('ANALYZE'))
+    db.session.commit()
+
+
+def explain_problems(connection, statement, parameters):
+    dialect = connection.dialect.name
+    problems = []
+
+    if dialect == 'sqlite':
+        for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters):
+            detail = row[-1]
+            match = re.match(r'SCAN (\w+)$', detail)
+            # anon_N is a bounded subquery SQLAlchemy named, not a table.
+            if match and match.group(1) not in SMALL_TABLES and not match.group(1).startswith('anon_'):
+                problems.append(f'full scan: {detail}')
+            if 'TEMP B-TREE FOR ORDER BY' in detail:
+                problems.append(f'filesort: {detail}')
+    elif dialect == 'mysql':
+        result = connection.exec_driver_sql('EXPLAIN ' + statement, parameters)
+        for row in result.mappings():
+            if row['type'] == 'ALL' and row['table'] not in SMALL_TABLES and not row['table'].startswith('<derived'):
+                problems.append(f"full scan of {row['table']}")
+            if 'filesort' in (row['Extra'] or ''):
+                problems.append(f"filesort on {row['table']}")
+    return problems
+
+
+def test_query_plans(app, client, config):
+    config(CACHE_ENABLED=False)
+    seed()
+
+    token = client.post('/api/auth/login', json={
+        'email': 'planner@example.com', 'password': 'planner', 'role': 'admin'
+    }).get_json()['token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            captured.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    failures = []
+
+    try:
+        for url in ENDPOINTS:
+            captured.clear()
+            response = client.get(url, headers=headers)
+            statements = list(captured)
+            captured.clear()
+
+            if response.status_code >= 400:
+                failures.append(f'{url}: HTTP {response.status_code}')
+                continue
+
+            with db.engine.connect() as connection:
+                for statement, parameters in statements:
+                    for problem in explain_problems(connection, statement, parameters):
+                        failures.append(f"{url}: {problem}\n     {' '.join(statement.split())}")
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+
+    assert not failures, '\n'.join(failures)
@@ -0,0 +1,12 @@
+def test_login_is_throttled_per_email(client, admin_headers, config):
+    config(RATE_LIMIT_ENABLED=True, RATE_LIMIT_LOGIN_EMAIL='3/300', RATE_LIMIT_LOGIN_IP='100/60')
+    attempt = {'email': 'admin@example.com', 'password': 'wrong', 'role': 'admin'}
+
+    assert [client.post('/api/auth/login', json=attempt).status_code for _ in range(3)] == [401] * 3
+    response = client.post('/api/auth/login', json=attempt)
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) > 0
+
+    # Other accounts are unaffected.
+    other = {'email': 'someone@example.com', 'password': 'wrong'}
+    assert client.post('/api/auth/login', json=other).status_code == 401
@@ -0,0 +1,16 @@
+def test_search_matches_prefixes_and_follows_updates(client, admin_headers, register):
+    register(1, fullName='Alice Walker', city='Boston')
+    bob = register(2, fullName='Bob Stone', city='Denver')
+
+    def found(query):
+        response = client.get('/api/donors/search', query_string={'q': query}, headers=admin_headers)
+        assert response.status_code == 200
+        return [donor['full_name'] for donor in response.get_json()['donors']]
+
+    assert found('ali') == ['Alice Walker']
+    assert found('denv') == ['Bob Stone']
+    assert found('donor2@') == ['Bob Stone']
+
+    client.put(f'/api/donors/{bob}', json={'city': 'Boulder'}, headers=admin_headers)
+    assert found('denv') == []
+    assert found('boul') == ['Bob Stone']
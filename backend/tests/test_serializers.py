@@ -0,0 +1,58 @@
+"""Byte-for-byte comparison of serializers.dumps with Flask's JSON provider.
+
+    python -m pytest tests/test_serializers.py
+"""
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from serializers import FastJSONProvider, dumps
+
+PAYLOADS = [
+    {'donors': [
+        {'id': 1, 'full_name': 'Zoë Núñez', 'city': 'São Paulo', 'age': 30, 'latitude': 12.971599,
+         'longitude': -77.594566, 'is_eligible': True, 'last_donation_date': None,
+         'created_at': '2024-01-01T10:00:00'},
+        {'id': 2, 'full_name': '李小龍', 'city': '東京', 'age': 41, 'latitude': None,
+         'longitude': None, 'is_eligible': False, 'last_donation_date': '2024-03-01',
+         'created_at': '2024-01-02T11:30:00.250000'},
+    ], 'next_cursor': 'eyJpZCI6IDJ9', 'total': 2},
+    {'message': 'Ahmed 🩸 needs "O-" \\ urgently\n', 'control': '\x00\x1f\x7f'},
+    {'units': Decimal('12'), 'average': Decimal('3.50'), 'ratio': 0.1, 'negative': -0.0},
+    {'counts': {'O+': 3, 'AB-': 0, 'A+': 10 ** 12}, 'empty': {}, 'list': []},
+    {'big': 2 ** 70},
+    [1, 2.5, 'three', None, True, False],
+]
+
+
+APP = Flask(__name__)
+
+
+def _providers(**attributes):
+    flask_json, fast_json = DefaultJSONProvider(APP), FastJSONProvider(APP)
+    for provider in (flask_json, fast_json):
+        for name, value in attributes.items():
+            setattr(provider, name, value)
+    return flask_json, fast_json
+
+
+def test_responses_match_flask_provider():
+    for attributes in ({}, {'sort_keys': False}, {'ensure_ascii': False}, {'compact': False}):
+        flask_json, fast_json = _providers(**attributes)
+        for payload in PAYLOADS:
+            assert fast_json.response(payload).get_data() == flask_json.response(payload).get_data()
+
+
+def test_dumps_matches_flask_provider():
+    flask_json, fast_json = _providers()
+    for payload in PAYLOADS:
+        for options in ({}, {'separators': (',', ':')}, {'indent': 2}, {'indent': 4}):
+            assert fast_json.dumps(payload, **options) == flask_json.dumps(payload, **options)
+
+
+def test_dates_match_to_dict():
+    # Projected rows carry date objects; to_dict() writes them as ISO 8601.
+    assert dumps({'at': datetime(2024, 1, 2, 3, 4, 5), 'on': date(2024, 1, 2)}) == \
+        '{"at":"2024-01-02T03:04:05","on":"2024-01-02"}'
@@ -0,0 +1,28 @@
+from models import db, BloodStock, StockLedger
+
+
+def create_request(client, units):
+    response = client.post('/api/blood-requests/', json={
+        'name': 'Patient', 'contact': '5550000000', 'bloodGroup': 'B+', 'units': units,
+        'hospitalName': 'General', 'city': 'Springfield'
+    })
+    return response.get_json()['request']['id']
+
+
+def test_approval_reserves_units_and_refuses_to_oversell(client, admin_headers):
+    db.session.add(BloodStock(blood_group='B+', units_available=5, units_reserved=0))
+    db.session.commit()
+    first, second = create_request(client, 4), create_request(client, 2)
+
+    assert client.post(f'/api/admin/requests/{first}/approve', headers=admin_headers).status_code == 200
+    assert client.post(f'/api/admin/requests/{second}/approve', headers=admin_headers).status_code == 409
+    stock = db.session.execute(db.select(BloodStock).filter_by(blood_group='B+')).scalar_one()
+    assert (stock.units_available, stock.units_reserved) == (1, 4)
+
+    assert client.post(f'/api/admin/requests/{first}/reject', headers=admin_headers).status_code == 200
+    assert client.post(f'/api/admin/requests/{second}/approve', headers=admin_headers).status_code == 200
+    db.session.refresh(stock)
+    assert (stock.units_available, stock.units_reserved) == (3, 2)
+
+    ledger = db.session.execute(db.select(StockLedger.action, StockLedger.request_id).order_by(StockLedger.id)).all()
+    assert [tuple(row) for row in ledger] == [('reserve', first), ('release', first), ('reserve', second)]
@@ -0,0 +1,187 @@
+import hashlib
+import heapq
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+import jwt
+from flask import request, jsonify, g
+from config import Config
+
+
+class TokenError(Exception):
+    pass
+
+
+class TokenCache:
+    """Verified JWT claims keyed by token digest, each kept until its ``exp``.
+
+    Revoked digests are remembered until their own expiry. Both are
+    per-process: a token revoked in one worker is still accepted by others.
+    """
+
+    def __init__(self, max_size):
+        self._lock = threading.Lock()
+        self._claims = {}
+        self._revoked = {}
+        # (exp, digest) heap of revocations, so expired ones are dropped on insert.
+        self._revocations = []
+        self.max_size = max_size
+
+    def _prune(self, now):
+        expired = [key for key, (_, exp) in self._claims.items() if exp <= now]
+        for key in expired:
+            del self._claims[key]
+
+    def get(self, digest, now):
+        with self._lock:
+            if digest in self._revoked:
+                raise TokenError('Token revoked')
+            entry = self._claims.get(digest)
+        if entry and entry[1] > now:
+            return entry[0]
+        return None
+
+    def put(self, digest, claims, exp, now):
+        with self._lock:
+            if len(self._claims) >= self.max_size:
+                self._prune(now)
+                while len(self._claims) >= self.max_size:
+                    del self._claims[next(iter(self._claims))]
+            self._claims[digest] = (claims, exp)
+
+    def revoke(self, digest, exp, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            while self._revocations and self._revocations[0][0] <= now:
+                _, expired = heapq.heappop(self._revocations)
+                if self._revoked.get(expired, now + 1) <= now:
+                    del self._revoked[expired]
+            self._claims.pop(digest, None)
+            self._revoked[digest] = exp
+            heapq.heappush(self._revocations, (exp, digest))
+
+    def clear(self):
+        with self._lock:
+            self._claims.clear()
+            self._revoked.clear()
+            self._revocations.clear()
+
+
+token_cache = TokenCache(Config.TOKEN_CACHE_SIZE)
+
+
+def token_digest(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def get_request_token():
+    token = request.headers.get('Authorization')
+    if token and token.startswith('Bearer '):
+        token = token[7:]
+    return token or None
+
+
+def verify_token(token):
+    now = time.time()
+    digest = token_digest(token)
+
+    claims = token_cache.get(digest, now)
+    if claims is not None:
+        return claims
+
+    try:
+        claims = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=['HS256'])
+    except jwt.ExpiredSignatureError:
+        raise TokenError('Token expired')
+    except jwt.InvalidTokenError:
+        raise TokenError('Invalid token')
+
+    token_cache.put(digest, claims, claims.get('exp', now), now)
+    return claims
+
+
+def revoke_token(token):
+    claims = verify_token(token)
+    token_cache.revoke(token_digest(token), claims.get('exp', time.time()))
+
+
+def issue_ticket(claims, audience, seconds):
+    """A short-lived token accepted only where ``audience`` is expected.
+
+    For clients that cannot send headers (``EventSource``) and so have to put
+    a credential in the URL. ``verify_token`` rejects it: it carries ``aud``.
+    """
+    return jwt.encode({
+        'user_id': claims['user_id'],
+        'type': claims['type'],
+        'aud': audience,
+        'exp': datetime.utcnow() + timedelta(seconds=seconds)
+    }, Config.JWT_SECRET_KEY, algorithm='HS256')
+
+
+def verify_ticket(ticket, audience):
+    try:
+        return jwt.decode(ticket, Config.JWT_SECRET_KEY, algorithms=['HS256'], audience=audience)
+    except jwt.ExpiredSignatureError:
+        raise TokenError('Ticket expired')
+    except jwt.InvalidTokenError:
+        raise TokenError('Invalid ticket')
+
+
+def authenticate(user_types=None, owner_arg=None, optional=False, view_args=None, ticket_audience=None):
+    """Verify the request's bearer token and store its claims on ``g.auth``.
+
+    With ``ticket_audience`` a ``?ticket=`` from ``issue_ticket`` is accepted
+    instead. Returns an error response tuple, or ``None`` when the request
+    may proceed.
+    """
+    g.auth = None
+    token = get_request_token()
+    ticket = request.args.get('ticket') if ticket_audience and not token else None
+
+    if not token and not ticket:
+        if optional:
+            return None
+        return jsonify({'error': 'No token provided'}), 401
+
+    try:
+        g.auth = verify_ticket(ticket, ticket_audience) if ticket else verify_token(token)
+    except TokenError as e:
+        if optional:
+            return None
+        return jsonify({'error': str(e)}), 401
+
+    if not user_types or g.auth.get('type') in user_types:
+        return None
+
+    if owner_arg and g.auth.get('type') == 'donor':
+        if (view_args or {}).get(owner_arg) == g.auth.get('user_id'):
+            return None
+
+    return jsonify({'error': 'Not authorized'}), 403
+
+
+def auth_required(*user_types, owner_arg=None):
+    """Require a valid token, optionally of one of ``user_types``.
+
+    With ``owner_arg`` a donor may also access the view when the named URL
+    argument is their own id.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            error = authenticate(user_types, owner_arg=owner_arg, view_args=kwargs)
+            if error:
+                return error
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def auth_optional(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        authenticate(optional=True)
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,169 @@
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import DateTime, case, event, inspect, literal, or_, select, union_all
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.functions import FunctionElement
+from config import Config
+from counters import BLOOD_GROUPS
+from models import db, BloodRequest, BloodStock
+from serializers import REQUEST_COLUMNS
+
+
+class QueueError(ValueError):
+    pass
+
+
+class hours_before(FunctionElement):
+    """``datetime - hours`` for a DATETIME expression, compiled per dialect."""
+    type = DateTime()
+    name = 'hours_before'
+    inherit_cache = True
+
+
+@compiles(hours_before)
+def _hours_before(element, compiler, **kw):
+    moment, hours = element.clauses
+    return f"({compiler.process(moment, **kw)} - {compiler.process(hours, **kw)} * INTERVAL '1 hour')"
+
+
+@compiles(hours_before, 'mysql')
+def _hours_before_mysql(element, compiler, **kw):
+    moment, hours = element.clauses
+    return f'DATE_SUB({compiler.process(moment, **kw)}, INTERVAL ({compiler.process(hours, **kw)} * 3600) SECOND)'
+
+
+@compiles(hours_before, 'sqlite')
+def _hours_before_sqlite(element, compiler, **kw):
+    moment, hours = element.clauses
+    return (f"strftime('%Y-%m-%d %H:%M:%f', {compiler.process(moment, **kw)}, "
+            f"'-' || {compiler.process(hours, **kw)} || ' hours')")
+
+
+def priority_at_for(urgency, created_at):
+    """Queue position of a request: its arrival, moved earlier by its urgency."""
+    return created_at - timedelta(hours=Config.QUEUE_URGENCY_HOURS.get(urgency, 0))
+
+
+def recompute_priorities():
+    """Recompute ``priority_at`` for every pending request in one UPDATE; returns the rows updated."""
+    table = BloodRequest.__table__
+    hours = case(
+        *((table.c.urgency == urgency, literal(weight)) for urgency, weight in Config.QUEUE_URGENCY_HOURS.items()),
+        else_=literal(0)
+    )
+    result = db.session.execute(
+        table.update()
+        .where(table.c.status == 'pending')
+        .values(priority_at=hours_before(table.c.created_at, hours)),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def scarcity_boosts():
+    """Hours of priority per blood group, falling linearly from empty stock to ``QUEUE_LOW_STOCK_UNITS``."""
+    available = dict(db.session.execute(select(BloodStock.blood_group, BloodStock.units_available)).all())
+    boosts = {}
+    for group in BLOOD_GROUPS:
+        shortfall = 1 - (available.get(group) or 0) / max(Config.QUEUE_LOW_STOCK_UNITS, 1)
+        boosts[group] = timedelta(hours=Config.QUEUE_SCARCITY_HOURS * min(max(shortfall, 0), 1))
+    return boosts
+
+
+def claimable(now):
+    return or_(BloodRequest.claimed_until.is_(None), BloodRequest.claimed_until < now)
+
+
+def next_requests(limit, now=None):
+    """``(rows, priorities)`` for the ``limit`` unclaimed pending requests to work on next.
+
+    Reads the head of each blood group's index range and merges them here.
+    """
+    now = now or datetime.utcnow()
+    heads = [
+        select(*REQUEST_COLUMNS, BloodRequest.priority_at).where(
+            BloodRequest.status == 'pending',
+            BloodRequest.blood_group == group,
+            claimable(now),
+        ).order_by(BloodRequest.priority_at, BloodRequest.id).limit(limit).subquery()
+        for group in BLOOD_GROUPS
+    ]
+    rows = db.session.execute(union_all(*(select(head) for head in heads))).all()
+    if not rows:
+        return [], []
+
+    boosts = scarcity_boosts()
+    ranked = sorted(
+        ((row.priority_at or row.created_at) - boosts[row.blood_group], row.id, row) for row in rows
+    )[:limit]
+    return (
+        [row for _, _, row in ranked],
+        [round((now - effective_at).total_seconds() / 3600, 2) for effective_at, _, _ in ranked],
+    )
+
+
+def claim_requests(admin_id, count, now=None, attempts=3):
+    """Lease up to ``count`` of the next requests to ``admin_id``: ``(rows, priorities, until)``."""
+    now = now or datetime.utcnow()
+    until = now + timedelta(seconds=Config.QUEUE_CLAIM_SECONDS)
+    table = BloodRequest.__table__
+    claimed, priorities = [], []
+
+    for _ in range(attempts):
+        rows, hours = next_requests(count - len(claimed), now)
+        if not rows:
+            break
+        candidates = {row.id: priority for row, priority in zip(rows, hours)}
+        # Won rows are read back by token, as in NotificationWorker.claim.
+        token = str(uuid.uuid4())
+        db.session.execute(
+            table.update()
+            .where(
+                table.c.id.in_(candidates),
+                table.c.status == 'pending',
+                or_(table.c.claimed_until.is_(None), table.c.claimed_until < now),
+            )
+            .values(claimed_by=admin_id, claimed_until=until, claim_token=token, updated_at=now),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+
+        won = set(db.session.execute(
+            select(table.c.id).where(table.c.id.in_(candidates), table.c.claim_token == token)
+        ).scalars())
+        for row in rows:
+            if row.id in won:
+                claimed.append(row)
+                priorities.append(candidates[row.id])
+        if len(claimed) >= count:
+            break
+
+    return claimed, priorities, until
+
+
+def release_claim(request_id, admin_id):
+    """Return a request claimed by ``admin_id`` to the queue; False if it does not exist."""
+    table = BloodRequest.__table__
+    result = db.session.execute(
+        table.update()
+        .where(table.c.id == request_id, table.c.claimed_by == admin_id)
+        .values(claimed_by=None, claimed_until=None, updated_at=datetime.utcnow()),
+        execution_options={'synchronize_session': False}
+    )
+    if result.rowcount == 1:
+        db.session.commit()
+        return True
+    if db.session.get(BloodRequest, request_id) is None:
+        return False
+    raise QueueError('Request is not claimed by you')
+
+
+@event.listens_for(Session, 'before_flush')
+def _stamp_priority_at(session, flush_context, instances):
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, BloodRequest):
+            state = inspect(obj)
+            if obj.priority_at is None or state.attrs.urgency.history.has_changes():
+                obj.priority_at = priority_at_for(obj.urgency, obj.created_at or datetime.utcnow())
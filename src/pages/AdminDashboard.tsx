@@ -91,12 +91,12 @@ export default function AdminDashboard() {
       setStats(statsResult.data);
     }
 
-    const donorsResult = await api.admin.getPendingDonors();
+    const donorsResult = await api.admin.getPendingDonors(3);
     if (donorsResult.data) {
       setDonors(donorsResult.data.donors.slice(0, 3));
     }
 
-    const requestsResult = await api.admin.getPendingRequests();
+    const requestsResult = await api.admin.getPendingRequests(3);
     if (requestsResult.data) {
       setRequests(requestsResult.data.requests.slice(0, 3));
     }
@@ -53,10 +53,9 @@ export default function DonorSearch() {
 
   const loadDonors = async () => {
     setLoading(true);
-    const result = await api.donors.getAll();
+    const result = await api.donors.getAll({ status: 'approved' });
     if (result.data) {
-      const approvedDonors = result.data.donors.filter((d: any) => d.status === 'approved');
-      setDonors(approvedDonors);
+      setDonors(result.data.donors);
     }
     setLoading(false);
   };
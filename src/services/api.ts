@@ -17,6 +17,46 @@ const getAuthHeaders = () => {
   };
 };
 
+// Matches the backend's PAGE_SIZE_MAX.
+const PAGE_SIZE = 500;
+
+// List endpoints return one keyset page at a time: follow next_cursor until
+// the list is complete (or maxRows are loaded), asking for the total once.
+const fetchAllPages = async (
+  path: string,
+  key: string,
+  errorMessage: string,
+  params: Record<string, string> = {},
+  maxRows = Infinity
+): Promise<ApiResponse<any>> => {
+  const rows: any[] = [];
+  let total: number | undefined;
+  let cursor: string | null = null;
+  try {
+    do {
+      const query = new URLSearchParams({ ...params, limit: String(Math.min(PAGE_SIZE, maxRows - rows.length)) });
+      if (cursor) {
+        query.set('cursor', cursor);
+      } else {
+        query.set('include_total', 'true');
+      }
+      const response = await fetch(`${API_BASE_URL}${path}?${query}`, {
+        headers: getAuthHeaders(),
+      });
+      const result = await response.json();
+      if (!response.ok) {
+        return { error: result.error || errorMessage };
+      }
+      rows.push(...result[key]);
+      total = total ?? result.total;
+      cursor = result.next_cursor;
+    } while (cursor && rows.length < maxRows);
+    return { data: { [key]: rows, total } };
+  } catch (error) {
+    return { error: 'Network error. Please check if backend is running.' };
+  }
+};
+
 export const api = {
   auth: {
     register: async (data: {
@@ -68,6 +108,12 @@ export const api = {
     },
 
     logout: () => {
+      if (getAuthToken()) {
+        fetch(`${API_BASE_URL}/auth/logout`, {
+          method: 'POST',
+          headers: getAuthHeaders(),
+        }).catch(() => {});
+      }
       localStorage.removeItem('token');
       localStorage.removeItem('user');
       localStorage.removeItem('userType');
@@ -109,20 +155,8 @@ export const api = {
       }
     },
 
-    getAll: async (): Promise<ApiResponse<any>> => {
-      try {
-        const response = await fetch(`${API_BASE_URL}/blood-requests/`, {
-          headers: getAuthHeaders(),
-        });
-        const result = await response.json();
-        if (!response.ok) {
-          return { error: result.error || 'Failed to fetch requests' };
-        }
-        return { data: result };
-      } catch (error) {
-        return { error: 'Network error. Please check if backend is running.' };
-      }
-    },
+    getAll: async (filters: Record<string, string> = {}): Promise<ApiResponse<any>> =>
+      fetchAllPages('/blood-requests/', 'requests', 'Failed to fetch requests', filters),
 
     getDonorRequests: async (donorId: number): Promise<ApiResponse<any>> => {
       try {
@@ -141,20 +175,8 @@ export const api = {
   },
 
   donors: {
-    getAll: async (): Promise<ApiResponse<any>> => {
-      try {
-        const response = await fetch(`${API_BASE_URL}/donors/`, {
-          headers: getAuthHeaders(),
-        });
-        const result = await response.json();
-        if (!response.ok) {
-          return { error: result.error || 'Failed to fetch donors' };
-        }
-        return { data: result };
-      } catch (error) {
-        return { error: 'Network error. Please check if backend is running.' };
-      }
-    },
+    getAll: async (filters: Record<string, string> = {}): Promise<ApiResponse<any>> =>
+      fetchAllPages('/donors/', 'donors', 'Failed to fetch donors', filters),
 
     getById: async (id: number): Promise<ApiResponse<any>> => {
       try {
@@ -250,35 +272,11 @@ export const api = {
       }
     },
 
-    getPendingDonors: async (): Promise<ApiResponse<any>> => {
-      try {
-        const response = await fetch(`${API_BASE_URL}/admin/donors/pending`, {
-          headers: getAuthHeaders(),
-        });
-        const result = await response.json();
-        if (!response.ok) {
-          return { error: result.error || 'Failed to fetch pending donors' };
-        }
-        return { data: result };
-      } catch (error) {
-        return { error: 'Network error. Please check if backend is running.' };
-      }
-    },
+    getPendingDonors: async (maxRows = Infinity): Promise<ApiResponse<any>> =>
+      fetchAllPages('/admin/donors/pending', 'donors', 'Failed to fetch pending donors', {}, maxRows),
 
-    getPendingRequests: async (): Promise<ApiResponse<any>> => {
-      try {
-        const response = await fetch(`${API_BASE_URL}/admin/requests/pending`, {
-          headers: getAuthHeaders(),
-        });
-        const result = await response.json();
-        if (!response.ok) {
-          return { error: result.error || 'Failed to fetch pending requests' };
-        }
-        return { data: result };
-      } catch (error) {
-        return { error: 'Network error. Please check if backend is running.' };
-      }
-    },
+    getPendingRequests: async (maxRows = Infinity): Promise<ApiResponse<any>> =>
+      fetchAllPages('/admin/requests/pending', 'requests', 'Failed to fetch pending requests', {}, maxRows),
 
     getBloodStock: async (): Promise<ApiResponse<any>> => {
       try {